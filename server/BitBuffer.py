@@ -1,45 +1,48 @@
 import struct
+
+from codec_trace import build_tracing_class
+
+
 class BitBuffer:
-    def __init__(self, debug=True):
-        self.bits = []
-        self.debug = debug
-        self.debug_log = [] if debug else None
+    """
+    MSB-first bit writer.
 
-    def write_method_15(self, flag: bool):
-        self.write_method_11(1 if flag else 0, 1)
-        if self.debug:
-            self.debug_log.append(f"method_15={flag}")
+    Whole bytes go straight into a bytearray, the bits of the byte being
+    filled are kept in a small int accumulator (_acc holds _nacc < 8 bits).
 
-    def to_bytes(self):
-        while len(self.bits) % 8 != 0:
-            self.bits.append(0)
-            if self.debug:
-                self.debug_log.append("pad_to_byte=0")
-        out = bytearray()
-        for i in range(0, len(self.bits), 8):
-            byte = 0
-            for bit in self.bits[i:i + 8]:
-                byte = (byte << 1) | bit
-            out.append(byte)
-        return bytes(out)
+    BitBuffer(debug=True) returns a tracing writer instead (see codec_trace.py),
+    it records (bit_offset, bit_width, method, value) for every write.
+    """
+    debug = False
+    debug_log = None
 
-    def write_method_20(self, bit_count: int, value: int):
-        while bit_count > 0:
-            byte_index = len(self.bits) // 8
-            bit_offset = len(self.bits) & 7
-            bits_left_in_byte = 8 - bit_offset
-            bits_to_write = min(bit_count, bits_left_in_byte)
+    def __new__(cls, debug=False):
+        if debug and cls is BitBuffer:
+            cls = TracingBitBuffer
+        return super().__new__(cls)
 
-            shift = bit_count - bits_to_write
-            mask = (value >> shift) & ((1 << bits_to_write) - 1)
+    def __init__(self, debug=False):
+        self._buf = bytearray()
+        self._acc = 0
+        self._nacc = 0
 
-            for i in range(bits_to_write):
-                self.bits.append((mask >> (bits_to_write - 1 - i)) & 1)
+    def bit_length(self) -> int:
+        """Number of bits written so far."""
+        return len(self._buf) * 8 + self._nacc
 
-            bit_count -= bits_to_write
+    def write_method_15(self, flag: bool):
+        self.write_method_11(1 if flag else 0, 1)
 
-            if self.debug:
-                self.debug_log.append(f"write_method_20: value={value}, bits_written={bits_to_write}")
+    def to_bytes(self):
+        # pads the buffer itself, later writes start on the next byte (same as before)
+        if self._nacc:
+            self._buf.append((self._acc << (8 - self._nacc)) & 0xFF)
+            self._acc = 0
+            self._nacc = 0
+        return bytes(self._buf)
+
+    def write_method_20(self, bit_count: int, value: int):
+        self.write_method_11(value, bit_count)
 
     def write_method_739(self, value: int):
         if value < 0:
@@ -48,8 +51,6 @@ class BitBuffer:
         else:
             self.write_method_11(0, 1)
             self.write_method_91(value)
-        if self.debug:
-            self.debug_log.append(f"method_739={value}")
 
     def write_method_4(self, val: int):
         bits_needed = val.bit_length() if val > 0 else 1
@@ -58,8 +59,6 @@ class BitBuffer:
         assert 0 <= prefix <= 15, f"Value too large for method_4: {val}"
         self.write_method_11(prefix, 4)
         self.write_method_11(val, bits_to_use)
-        if self.debug:
-            self.debug_log.append(f"method_4={val}, prefix={prefix}, bits={bits_to_use}")
 
     def write_method_26(self, val: str):
         if val is None:
@@ -67,15 +66,10 @@ class BitBuffer:
         encoded = val.encode('utf-8')
         length = min(len(encoded), 65535)
         self.write_method_11(length, 16)
-        for byte in encoded[:length]:
-            self.write_method_11(byte, 8)
-        if self.debug:
-            self.debug_log.append(f"method_26={val}, length={length}")
+        self._write_bytes(encoded[:length])
 
     def write_method_6(self, val: int, bit_count: int):
         self.write_method_11(val, bit_count)
-        if self.debug:
-            self.debug_log.append(f"method_6={val}, bits={bit_count}")
 
     def write_method_91(self, val: int):
         bits_needed = val.bit_length() if val > 0 else 1
@@ -83,8 +77,6 @@ class BitBuffer:
         n = (bits_to_use // 2) - 1
         self.write_method_11(n, 3)
         self.write_method_11(val, bits_to_use)
-        if self.debug:
-            self.debug_log.append(f"method_91={val}, n={n}, bits={bits_to_use}")
 
     def write_method_9(self, val: int):
         bitlen = val.bit_length()
@@ -101,14 +93,26 @@ class BitBuffer:
         else:
             self.write_method_11(0, 1)
             self.write_method_4(val)
-        if self.debug:
-            self.debug_log.append(f"method_45={val}, sign={1 if val < 0 else 0}")
 
     def write_method_11(self, value, bit_count):
-        if self.debug:
-            self.debug_log.append(f"write_method_6={value:0{bit_count}b} ({bit_count} bits)")
-        for i in reversed(range(bit_count)):
-            self.bits.append((value >> i) & 1)
+        if bit_count <= 0:
+            return
+        # only the low bit_count bits are written (negative values as two's complement)
+        acc = (self._acc << bit_count) | (value & ((1 << bit_count) - 1))
+        n = self._nacc + bit_count
+        if n >= 8:
+            rem = n & 7
+            self._buf += (acc >> rem).to_bytes(n >> 3, "big")
+            acc &= (1 << rem) - 1
+            n = rem
+        self._acc = acc
+        self._nacc = n
+
+    def _write_bytes(self, data: bytes):
+        if not self._nacc:
+            self._buf += data
+        elif data:
+            self.write_method_11(int.from_bytes(data, "big"), len(data) * 8)
 
     def write_method_393(self, val):
         self.write_method_11(val & 0xFF, 8)
@@ -119,21 +123,14 @@ class BitBuffer:
         length = min(len(encoded), 65535)
 
         self.write_method_11(length, 16)
-        for byte in encoded[:length]:
-            self.write_method_11(byte, 8)
+        self._write_bytes(encoded[:length])
 
-        if self.debug:
-            self.debug_log.append(f"method_13={val}, length={length}")
 
     def write_float(self, val: float):
-        b = struct.pack(">f", val)
-        for byte in b:
-            self.write_method_11(byte, 8)
+        self._write_bytes(struct.pack(">f", val))
 
     def write_method_309(self, val: float):
         self.write_float(val)
-        if self.debug:
-            self.debug_log.append(f"method_309={val}")
 
     def write_method_24(self, val: int):
         """
@@ -143,8 +140,12 @@ class BitBuffer:
         sign = 1 if val < 0 else 0
         self.write_method_11(sign, 1)
         self.write_method_9(abs(val))
-        if self.debug:
-            self.debug_log.append(f"method_24={val}, sign={sign}")
 
     def get_debug_log(self):
         return self.debug_log if self.debug else []
+
+
+# write_method_20(bit_count, value) is the only writer with the value second
+TracingBitBuffer = build_tracing_class(
+    BitBuffer, BitBuffer.bit_length, value_arg={"write_method_20": 1}, extra_methods=("to_bytes",)
+)
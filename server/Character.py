@@ -4,7 +4,8 @@ from BitBuffer import BitBuffer
 from accounts import save_characters
 from bitreader import BitReader
 from constants import GearType, Game, EntType, DyeType, Entity, get_dye_color
-from globals import GS, send_premium_purchase
+from globals import send_premium_purchase
+from interest import interest_sessions
 
 # Hints Do not delete
 """
@@ -250,13 +251,8 @@ def handle_change_look(session, data: bytes) -> None:
 
     send_look_update_packet(session, **pkt_args)
 
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            send_look_update_packet(other, **pkt_args)
+    for other in interest_sessions(session):
+        send_look_update_packet(other, **pkt_args)
 
 
 def _parse_apply_dyes_payload(data: bytes) -> tuple[int, dict[int, tuple[int, int]], bool, int | None, int | None]:
@@ -435,6 +431,6 @@ def send_dye_sync_packet_to_level(session, entity_id: int) -> None:
 
     payload = build_dye_sync_payload(char, entity_id)
 
-    for other in GS.all_sessions:
-        if other.player_spawned and other.current_level == session.current_level:
-            send_dye_sync_packet(other, payload)
+    send_dye_sync_packet(session, payload)
+    for other in interest_sessions(session):
+        send_dye_sync_packet(other, payload)
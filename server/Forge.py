@@ -8,7 +8,7 @@ from bitreader import BitReader
 from constants import class_111, class_8, class_3, class_1, Game, class_64, \
     CHARM_DB, CONSUMABLE_BOOSTS, class_86, MATERIALS_DATA
 from globals import send_consumable_update, send_premium_purchase, send_forge_reroll_packet
-from scheduler import scheduler, schedule_forge
+from scheduler import schedule_forge, cancel_timer
 
 # Hints
 """
@@ -284,12 +284,7 @@ def handle_forge_speed_up_packet(session, data):
     send_premium_purchase(session, "Forge Speed-Up", idols_to_spend)
 
     # Cancel scheduled completion if exists
-    if "schedule_id" in mf:
-        try:
-            scheduler.cancel(mf["schedule_id"])
-        except Exception:
-            pass
-        mf.pop("schedule_id", None)
+    cancel_timer(session.user_id, session.current_character, "forge")
 
 
     mf.update({
@@ -369,6 +364,7 @@ def handle_cancel_forge(session, data):
         None
     )
 
+    cancel_timer(session.user_id, session.current_character, "forge")
     mf = char.setdefault("magicForge", {})
     mf["ReadyTime"]   = 0
     mf["primary"]    = 0
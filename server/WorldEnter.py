@@ -6,7 +6,6 @@ import time
 
 from Forge import resolve_magic_forge_state
 from constants import GearType, CLASS_NAME_TO_ID, class_64, NEWS_EVENTS, SLOT_BIT_WIDTHS, class_119, class_111, class_9, class_66, MASTERCLASS_TO_BUILDING, class_21, Game, Mission, Entity, class_7, class_16, class_118, class_1, class_10
-from globals import all_sessions
 from missions import get_total_mission_defs, get_mission_def
 from socials import find_online_session, find_char_data_from_server_memory, get_live_friend_info
 
@@ -308,7 +307,7 @@ def Player_Data_Packet(char: dict,
             fname = entry["name"]
             is_request = entry.get("isRequest", False)
 
-            friend_sess = find_online_session(all_sessions, fname)
+            friend_sess = find_online_session(fname)
             friend_char = find_char_data_from_server_memory(fname)
 
             info = get_live_friend_info(fname, friend_sess, friend_char)
@@ -1,79 +1,143 @@
+import copy
+import marshal
 import os
-import json
 import struct
+import time
 
-from threading import Lock
+from threading import Lock, RLock, Condition, Thread
 from BitBuffer import BitBuffer
+from save_journal import SaveJournal, read_records, JOURNAL_PATH
+from storage import open_storage
+from name_index import NameIndex
 
-SAVE_PATH_TEMPLATE = "saves/{user_id}.json"
-CHAR_SAVE_DIR = "saves"
-_ACCOUNTS_PATH = "Accounts.json"
-_lock          = Lock()
+STORAGE_BACKEND = "json"    # "json" (Accounts.json + saves/*.json) or "sqlite" (storage.SQLITE_PATH)
+SAVE_FORMAT = "json"        # json backend save files : "json" (indented), "compact" or "binary" (save_codec.py)
 
-def _write_json(path: str, data) -> None:
-    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+SAVE_WRITE_BEHIND = True    # save_characters only marks the user dirty, a background writer saves it
+SAVE_FLUSH_INTERVAL = 2.0   # seconds a dirty save may wait before it is written
+SAVE_FLUSH_THRESHOLD = 64   # dirty users that trigger a write right away
+SAVE_JOURNAL = False        # journal every save (save_journal.py) so the save files can be written rarely
+SAVE_FLUSH_INTERVAL_JOURNALED = 60.0  # SAVE_FLUSH_INTERVAL when the journal is on
 
 
-def load_accounts() -> dict[str, int]:
-    if not os.path.exists(_ACCOUNTS_PATH):
-        
-        with open(_ACCOUNTS_PATH, "w", encoding="utf-8") as f:
-            json.dump([], f)
+#### Per-user locks ####
 
-    with open(_ACCOUNTS_PATH, "r", encoding="utf-8") as f:
-        entries = json.load(f)
+_user_locks = {}
+_user_locks_guard = Lock()
 
-    return {e["email"]: int(e["user_id"]) for e in entries}
 
+def user_lock(user_id) -> RLock:
+    """
+    Held while a user's characters change : around every packet handler of its
+    sessions (server.dispatch_packet) and every scheduler callback for it, and
+    while the save writer / journal copy its characters, so a copy is never
+    taken half way through a change. One lock per user seen since boot.
+    """
+    key = str(user_id)
+    lock = _user_locks.get(key)
+    if lock is None:
+        with _user_locks_guard:
+            lock = _user_locks.setdefault(key, RLock())
+    return lock
+
+
+def copy_characters(char_list):
+    """Deep copy of a character list (JSON data), call with user_lock held."""
+    return marshal.loads(marshal.dumps(char_list))
+
+
+#### Account index ####
+
+class AccountIndex:
+    """
+    email -> user_id held in memory, read from the storage backend once.
+
+    Lookups never touch the disk. Creation goes through one lock (single
+    writer) : ids come from a counter that only grows, the new account is
+    persisted with storage.add_account (one appended line / row, not the whole
+    index) before it is visible to lookups.
+    """
+    def __init__(self):
+        self._accounts = None
+        self._next_id = 1
+        self._lock = Lock()
+
+    def _ensure_loaded(self):
+        if self._accounts is None:
+            accounts = storage.load_accounts()
+            storage.compact_accounts(accounts)
+            self._next_id = max(accounts.values(), default=0) + 1
+            self._accounts = accounts
+
+    def load(self):
+        with self._lock:
+            self._ensure_loaded()
+
+    def get(self, email):
+        accounts = self._accounts
+        if accounts is None:
+            self.load()
+            accounts = self._accounts
+        return accounts.get(email)
+
+    def get_or_create(self, email):
+        user_id = self.get(email)
+        if user_id is not None:
+            return user_id
+        with self._lock:
+            self._ensure_loaded()
+            user_id = self._accounts.get(email)
+            if user_id is not None:
+                return user_id
+            user_id = self._next_id
+            storage.add_account(email, user_id)
+            storage.write_save(user_id, [])
+            self._next_id += 1
+            self._accounts[email] = user_id
+            return user_id
+
+
+
+def find_user_id(email: str) -> int | None:
+    return account_index.get(email.strip().lower())
 
-def save_accounts_index(index: dict[str, int]) -> None:
-    entries = [
-        {"email": email, "user_id": uid}
-        for email, uid in index.items()
-    ]
-    with _lock:
-        _write_json(_ACCOUNTS_PATH, entries)
 
 def get_or_create_user_id(email: str) -> int:
-    email = email.strip().lower()
-    accounts = load_accounts()
+    return account_index.get_or_create(email.strip().lower())
 
-    if email in accounts:
-        return accounts[email]
 
-    user_id = max(accounts.values(), default=0) + 1
+def load_account_index():
+    account_index.load()
 
-    accounts[email] = user_id
-    save_accounts_index(accounts)
+#### Character names (name_index.py) ####
 
-    os.makedirs(CHAR_SAVE_DIR, exist_ok=True)
-    save_path = os.path.join(CHAR_SAVE_DIR, f"{user_id}.json")
-    _write_json(save_path, {"user_id": user_id, "characters": []})
-    return user_id
+def _stored_character_names():
+    # saves not written yet first, their stored save may be older
+    for user_id, characters in save_writer.pending_items():
+        for char in characters:
+            yield char.get("name", ""), user_id
+    yield from storage.iter_character_names()
+
+
+def load_name_index():
+    name_index.load()
+
+
+def reserve_character_name(name: str, user_id: int) -> bool:
+    """Claim a name for a new character, False when it is taken."""
+    return name_index.reserve(name, user_id)
+
+
+def release_character_name(name: str, user_id: int = None) -> bool:
+    return name_index.release(name, user_id)
+
+
+def rename_character_name(old_name: str, new_name: str, user_id: int) -> bool:
+    return name_index.rename(old_name, new_name, user_id)
 
-def is_character_name_taken(name: str) -> bool:
-    """
-    Check if a character name exists in any user's save file.
-    """
-    name = name.strip().lower()
-    accounts = load_accounts()
-    for user_id in accounts.values():
-        save_path = os.path.join(CHAR_SAVE_DIR, f"{user_id}.json")
-        try:
-            with open(save_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                characters = data.get("characters", [])
-                for char in characters:
-                    if char.get("name", "").strip().lower() == name:
-                        return True
-        except (FileNotFoundError, json.JSONDecodeError):
-            continue
-    return False
 
 def build_popup_packet(message: str, disconnect: bool = False) -> bytes:
-    buf = BitBuffer(debug=True)
+    buf = BitBuffer()
     buf.write_method_13(message)
     buf.write_method_6(1 if disconnect else 0, 1)
     payload = buf.to_bytes()
@@ -81,22 +145,174 @@ def build_popup_packet(message: str, disconnect: bool = False) -> bytes:
 
 
 def load_characters(user_id: int) -> list[dict]:
-    path = os.path.join(CHAR_SAVE_DIR, f"{user_id}.json")
-    if not os.path.exists(path):
+    pending = save_writer.pending(user_id)
+    if pending is not None:
+        # not written yet, the stored save is older than this
+        return copy.deepcopy(pending)
+    data = storage.load_save(user_id)
+    if data is None:
         return []
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
     return data.get("characters", [])
 
 
+def write_characters(user_id: int, char_list: list[dict], journal_seq=None):
+    """Store the save now (what save_characters used to do)."""
+    storage.write_save(user_id, char_list, journal_seq)
+
+
 def save_characters(user_id: int, char_list: list[dict]):
-    os.makedirs(CHAR_SAVE_DIR, exist_ok=True)
-    path = os.path.join(CHAR_SAVE_DIR, f"{user_id}.json")
+    if SAVE_WRITE_BEHIND:
+        save_writer.mark_dirty(user_id, char_list)
+        if SAVE_JOURNAL:
+            save_journal.mark(user_id, char_list)
+    else:
+        write_characters(user_id, char_list)
+
+
+def iter_saves():
+    """Every stored save, {"user_id", "characters"} (boot scans, pending saves not included)."""
+    return storage.iter_saves()
+
+
+def flush_saves(user_id=None):
+    """Write pending saves now, for one user or everyone (disconnect, shutdown)."""
+    save_writer.flush(user_id)
+
+
+def replay_save_journal():
+    """
+    Boot : re-apply the journal records newer than their save file (progress
+    saved after the last save file write before a crash), then clear the journal.
+    """
+    latest = {}
+    for record in read_records(JOURNAL_PATH):
+        latest[str(record["user_id"])] = record
+    replayed = 0
+    for record in latest.values():
+        stored = storage.load_save(record["user_id"]) or {}
+        file_seq = stored.get("journal_seq", -1)
+        if record["seq"] > file_seq:
+            write_characters(record["user_id"], record["characters"], record["seq"])
+            replayed += 1
+    if os.path.exists(JOURNAL_PATH):
+        os.remove(JOURNAL_PATH)
+    if latest:
+        print(f"[JOURNAL] Replayed {replayed} of {len(latest)} journaled saves")
+    return replayed
+
+
+#### Write-behind saves ####
+
+class SaveWriter:
+    """
+    Coalescing write-behind for character saves.
+
+    save_characters() only records user_id -> char_list (the list itself, not a
+    copy) and returns. The writer thread writes a user at most once per
+    SAVE_FLUSH_INTERVAL, however many saves happened in between, and sooner when
+    SAVE_FLUSH_THRESHOLD users are waiting. Handlers keep changing the list after
+    saving, so a save marked while its user is being written is written again on
+    the next round.
+
+    The list is copied under user_lock (handlers and callbacks change it with
+    that lock held) and the copy is written. A save stays visible to pending()
+    until its write has finished, so loaders never fall back to the older file
+    in between.
+    """
+    def __init__(self):
+        self._pending = {}          # str(user_id) (the file name) -> (user_id, char_list)
+        self._inflight = {}         # same, taken by a write that has not finished yet
+        self._since = None          # time the oldest pending save was marked
+        self._cond = Condition()
+        self._write_lock = Lock()   # one writer per file at a time (thread vs forced flush)
+        self._thread = None
+        self.stats = {"saves": 0, "writes": 0}
+
+    def pending(self, user_id):
+        key = str(user_id)
+        with self._cond:
+            entry = self._pending.get(key) or self._inflight.get(key)
+        return entry[1] if entry else None
+
+    def pending_items(self):
+        with self._cond:
+            return list({**self._inflight, **self._pending}.values())
+
+    def mark_dirty(self, user_id, char_list):
+        with self._cond:
+            self.stats["saves"] += 1
+            if not self._pending:
+                self._since = time.monotonic()
+            self._pending[str(user_id)] = (user_id, char_list)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+            if len(self._pending) == 1 or len(self._pending) >= SAVE_FLUSH_THRESHOLD:
+                self._cond.notify()
+
+    def _take(self, user_id=None):
+        with self._cond:
+            if user_id is None:
+                batch, self._pending = self._pending, {}
+            else:
+                batch = {}
+                key = str(user_id)
+                if key in self._pending:
+                    batch[key] = self._pending.pop(key)
+            if not self._pending:
+                self._since = None
+            self._inflight.update(batch)
+        return batch
+
+    def _write_one(self, user_id, char_list):
+        seq = None
+        with user_lock(user_id):
+            snapshot = copy_characters(char_list)
+            if SAVE_JOURNAL:
+                # snapshot and sequence number together : journal records up to `seq` are in this file
+                with save_journal.seq_lock:
+                    seq = save_journal.next_seq()
+        write_characters(user_id, snapshot, seq)
+        if seq is not None:
+            save_journal.covered(user_id, seq)
+
+    def _write(self, batch):
+        with self._write_lock:
+            for key, entry in batch.items():
+                user_id, char_list = entry
+                try:
+                    self._write_one(user_id, char_list)
+                    self.stats["writes"] += 1
+                except Exception as e:
+                    print(f"[SAVE] Failed to write saves for user {user_id}: {e}")
+                finally:
+                    with self._cond:
+                        # unless a newer save of the user was taken meanwhile
+                        if self._inflight.get(key) is entry:
+                            del self._inflight[key]
+
+    def flush(self, user_id=None):
+        self._write(self._take(user_id))
+        if SAVE_JOURNAL and user_id is None:
+            save_journal.checkpoint()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # wait for the interval (or threshold) so repeated saves collapse into one write
+                interval = SAVE_FLUSH_INTERVAL_JOURNALED if SAVE_JOURNAL else SAVE_FLUSH_INTERVAL
+                while self._pending and len(self._pending) < SAVE_FLUSH_THRESHOLD:
+                    remaining = self._since + interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self.flush()
 
-    data = {
-        "user_id": user_id,
-        "characters": char_list
-    }
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
\ No newline at end of file
+storage = open_storage(STORAGE_BACKEND, SAVE_FORMAT)
+account_index = AccountIndex()
+save_writer = SaveWriter()
+save_journal = SaveJournal(lock_for=user_lock)
+name_index = NameIndex(source=_stored_character_names)
\ No newline at end of file
@@ -95,6 +95,11 @@ def active_players():
             players.append(s.current_character)
     return jsonify(players)
 
+@app.route("/scheduler_stats", methods=["GET"])
+def scheduler_stats():
+    from scheduler import scheduler
+    return jsonify(scheduler.lag_stats())
+
 # ──────────────────────────────────────────────────────────────
 # Saved packet CRUD
 # ──────────────────────────────────────────────────────────────
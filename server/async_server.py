@@ -0,0 +1,243 @@
+"""
+Optional asyncio engine for the game ports.
+
+The threaded engine in server.py starts one OS thread per client and blocks
+on conn.recv(). This engine runs every client on a single event loop instead:
+the same PacketFramer (framing.py, >HH type/length) feeds the same PACKET_HANDLERS
+dispatch, so handlers do not need to know which engine is running.
+
+Handlers talk to the client through `session.conn.sendall(...)`. On this engine
+`session.conn` is a TransportConnection, a small socket-like adapter around the
+asyncio transport. It is safe to call from other threads too (scheduler
+callbacks, AI loop, admin panel), writes are handed over to the loop thread.
+
+Handlers do blocking work (save and name index writes, flush_saves on
+disconnect), so they do not run on the loop thread : the loop only reads and
+frames, each client's packets are run in order by a pool of handler threads
+(at most one thread per client at a time, like its own thread in the threaded
+engine), and so is the disconnect cleanup once its earlier packets are done.
+A slow disk write only holds up the client that caused it.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from globals import HOST, PORTS, GS
+from outbound import OutboundQueue
+from framing import PacketFramer
+
+IDLE_TIMEOUT = 300  # seconds, same as conn.settimeout(300) in the threaded engine
+ASYNC_HANDLER_WORKERS = 16  # threads running packet handlers for the asyncio engine
+OUTBOUND_TRANSPORT_HIGH_WATER = 64 * 1024  # transport buffer size before we stop writing and queue instead
+
+
+class TransportConnection:
+    """
+    Socket-like adapter so existing handlers can keep calling
+    session.conn.sendall(pkt) / session.conn.close().
+
+    Packets go through an OutboundQueue (see outbound.py), everything queued during
+    one loop iteration is written to the transport with a single write().
+    While the transport is paused (client not reading) packets stay in the queue,
+    so the overflow policy applies to slow clients here as well.
+    """
+    def __init__(self, transport, loop, protocol, addr):
+        self._transport = transport
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        self._protocol = protocol
+        self.queue = OutboundQueue(addr)
+        self._flush_scheduled = False
+        self._lock = threading.Lock()
+        self.paused = False
+
+    def _on_loop_thread(self) -> bool:
+        return threading.get_ident() == self._loop_thread
+
+    def sendall(self, data):
+        if self._transport.is_closing():
+            return
+        if not self.queue.push(data):
+            self.close()
+            return
+        with self._lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        if self._on_loop_thread():
+            self._loop.call_soon(self.flush)
+        else:
+            self._loop.call_soon_threadsafe(self.flush)
+
+    def flush(self):
+        with self._lock:
+            self._flush_scheduled = False
+        if self.paused or self._transport.is_closing():
+            return
+        while (chunk := self.queue.take()) is not None:
+            self._transport.write(chunk)
+
+    def settimeout(self, seconds):
+        self._protocol.idle_timeout = seconds
+
+    def close(self):
+        if self._on_loop_thread():
+            self._transport.close()
+        else:
+            self._loop.call_soon_threadsafe(self._transport.close)
+
+
+class ClientProtocol(asyncio.BufferedProtocol):
+    def __init__(self, session_factory, dispatch):
+        self.session_factory = session_factory
+        self.dispatch = dispatch
+        self.idle_timeout = IDLE_TIMEOUT
+        self.session = None
+        self.transport = None
+        self.conn = None
+        self.framer = PacketFramer()
+        self._idle_handle = None
+        self.loop = None
+        self._inbox = deque()   # (pkt, data) waiting for a handler thread, None = disconnect cleanup
+        self._busy = False      # a handler thread is draining the inbox (only changed on the loop thread)
+        self._failed = False    # a handler raised, the connection is being closed
+
+    def connection_made(self, transport):
+        loop = asyncio.get_running_loop()
+        addr = transport.get_extra_info("peername")
+        self.transport = transport
+        self.loop = loop
+
+        self.conn = TransportConnection(transport, loop, self, addr)
+        transport.set_write_buffer_limits(high=OUTBOUND_TRANSPORT_HIGH_WATER)
+        self.session = self.session_factory(self.conn, addr)
+        GS.all_sessions.append(self.session)
+        print("Connected:", addr)
+        self._reset_idle_timer()
+
+    def _reset_idle_timer(self):
+        if self._idle_handle:
+            self._idle_handle.cancel()
+        if self.idle_timeout:
+            loop = asyncio.get_running_loop()
+            self._idle_handle = loop.call_later(self.idle_timeout, self._on_idle_timeout)
+
+    def _on_idle_timeout(self):
+        print("Session error: timed out")
+        self.transport.close()
+
+    def get_buffer(self, sizehint):
+        # the transport reads straight into the framer's receive buffer
+        return self.framer.get_buffer()
+
+    def buffer_updated(self, nbytes):
+        self._reset_idle_timer()
+        self.framer.buffer_updated(nbytes)
+        try:
+            for pkt, data in self.framer.packets():
+                # copy : the framer reuses its buffer once we return
+                self._inbox.append((pkt, bytes(data)))
+        except Exception as e:
+            print("Session error:", e)
+            self.transport.close()
+        self._run_inbox()
+
+    def _run_inbox(self):
+        if self._busy or not self._inbox:
+            return
+        self._busy = True
+        future = self.loop.run_in_executor(_handler_pool, self._drain_inbox)
+        future.add_done_callback(self._inbox_done)
+
+    def _inbox_done(self, future):
+        self._busy = False
+        self._run_inbox()   # packets that arrived after the thread found the inbox empty
+
+    def _drain_inbox(self):
+        """Handler thread : run this client's queued packets in order."""
+        session = self.session
+        while self._inbox:
+            item = self._inbox.popleft()
+            if item is None:
+                session.stop()
+                continue
+            if self._failed or self.transport.is_closing():
+                continue
+            try:
+                self.dispatch(session, *item)
+            except Exception as e:
+                print("Session error:", e)
+                self._failed = True
+                self.conn.close()
+
+    def pause_writing(self):
+        self.conn.paused = True
+
+    def resume_writing(self):
+        self.conn.paused = False
+        self.conn.flush()
+
+    def eof_received(self):
+        print(f"[{self.session.addr}] Connection closed by client")
+        return False
+
+    def connection_lost(self, exc):
+        if self._idle_handle:
+            self._idle_handle.cancel()
+        print("Disconnect:", self.session.addr)
+        # after the packets still queued, on a handler thread (flush_saves writes to disk)
+        self._inbox.append(None)
+        self._run_inbox()
+
+
+_handler_pool = ThreadPoolExecutor(max_workers=ASYNC_HANDLER_WORKERS, thread_name_prefix="handler")
+
+
+class _ThreadsafeServer:
+    """Lets the main thread close an asyncio server that lives on the engine thread."""
+    def __init__(self, server, loop):
+        self._server = server
+        self._loop = loop
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._server.close)
+
+
+def start_async_servers(session_factory, dispatch, host=HOST, ports=PORTS):
+    """
+    Start the asyncio engine on its own thread and bind every game port on it.
+    Returns [(server, port), ...] just like start_servers() in server.py,
+    port is the real bound port (useful when binding port 0).
+    """
+    loop = asyncio.new_event_loop()
+    servers = []
+
+    async def _bind_all():
+        for port in ports:
+            try:
+                server = await loop.create_server(
+                    lambda: ClientProtocol(session_factory, dispatch), host, port
+                )
+            except PermissionError:
+                print(f"Error: Cannot bind to port {port}. Ports below 1024 require root privileges.")
+                continue
+            except OSError as e:
+                print(f"Error: Cannot bind to port {port}. {e}")
+                continue
+            bound_port = server.sockets[0].getsockname()[1]
+            print(f"Server listening on {host}:{bound_port} (asyncio)")
+            servers.append((_ThreadsafeServer(server, loop), bound_port))
+
+    ready = threading.Event()
+
+    def _run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(_bind_all())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=_run, daemon=True).start()
+    ready.wait()
+    return servers
@@ -0,0 +1,297 @@
+"""
+Old list-of-bits BitBuffer vs the accumulator BitBuffer.
+
+Run from the server folder :
+    python -m benchmarks.bench_bitbuffer [--rounds 200]
+
+First checks that both writers produce byte-identical output (golden check) for :
+  - random sequences of every write_method_* (including the odd cases : negative
+    values, method_9(0), strings crossing byte boundaries, to_bytes() mid-stream)
+  - the big real packets : enter world (Player_Data_Packet, extended),
+    entity spawn (Send_Entity_Data's old hand-written body, player + NPCs) and hatchery (0xE5)
+
+Then reports packets/sec built with each writer for those packets, once with the
+call sites' own debug flag and once with debug logging off.
+LegacyBitBuffer below is a verbatim copy of the old writer, kept only for this check.
+"""
+import argparse
+import json
+import random
+import struct
+import time
+from unittest import mock
+
+import entity
+import globals as globals_mod
+import WorldEnter
+from BitBuffer import BitBuffer
+from benchmarks import bench_schema
+from constants import load_class_template
+
+
+class LegacyBitBuffer:
+    def __init__(self, debug=True):
+        self.bits = []
+        self.debug = debug
+        self.debug_log = [] if debug else None
+
+    def write_method_15(self, flag: bool):
+        self.write_method_11(1 if flag else 0, 1)
+        if self.debug:
+            self.debug_log.append(f"method_15={flag}")
+
+    def to_bytes(self):
+        while len(self.bits) % 8 != 0:
+            self.bits.append(0)
+            if self.debug:
+                self.debug_log.append("pad_to_byte=0")
+        out = bytearray()
+        for i in range(0, len(self.bits), 8):
+            byte = 0
+            for bit in self.bits[i:i + 8]:
+                byte = (byte << 1) | bit
+            out.append(byte)
+        return bytes(out)
+
+    def write_method_20(self, bit_count: int, value: int):
+        while bit_count > 0:
+            byte_index = len(self.bits) // 8
+            bit_offset = len(self.bits) & 7
+            bits_left_in_byte = 8 - bit_offset
+            bits_to_write = min(bit_count, bits_left_in_byte)
+
+            shift = bit_count - bits_to_write
+            mask = (value >> shift) & ((1 << bits_to_write) - 1)
+
+            for i in range(bits_to_write):
+                self.bits.append((mask >> (bits_to_write - 1 - i)) & 1)
+
+            bit_count -= bits_to_write
+
+            if self.debug:
+                self.debug_log.append(f"write_method_20: value={value}, bits_written={bits_to_write}")
+
+    def write_method_739(self, value: int):
+        if value < 0:
+            self.write_method_11(1, 1)
+            self.write_method_91(-value)
+        else:
+            self.write_method_11(0, 1)
+            self.write_method_91(value)
+        if self.debug:
+            self.debug_log.append(f"method_739={value}")
+
+    def write_method_4(self, val: int):
+        bits_needed = val.bit_length() if val > 0 else 1
+        bits_to_use = max(2, (bits_needed + 1) & ~1)
+        prefix = (bits_to_use // 2) - 1
+        assert 0 <= prefix <= 15, f"Value too large for method_4: {val}"
+        self.write_method_11(prefix, 4)
+        self.write_method_11(val, bits_to_use)
+        if self.debug:
+            self.debug_log.append(f"method_4={val}, prefix={prefix}, bits={bits_to_use}")
+
+    def write_method_26(self, val: str):
+        if val is None:
+            val = ""
+        encoded = val.encode('utf-8')
+        length = min(len(encoded), 65535)
+        self.write_method_11(length, 16)
+        for byte in encoded[:length]:
+            self.write_method_11(byte, 8)
+        if self.debug:
+            self.debug_log.append(f"method_26={val}, length={length}")
+
+    def write_method_6(self, val: int, bit_count: int):
+        self.write_method_11(val, bit_count)
+        if self.debug:
+            self.debug_log.append(f"method_6={val}, bits={bit_count}")
+
+    def write_method_91(self, val: int):
+        bits_needed = val.bit_length() if val > 0 else 1
+        bits_to_use = max(2, (bits_needed + 1) & ~1)
+        n = (bits_to_use // 2) - 1
+        self.write_method_11(n, 3)
+        self.write_method_11(val, bits_to_use)
+        if self.debug:
+            self.debug_log.append(f"method_91={val}, n={n}, bits={bits_to_use}")
+
+    def write_method_9(self, val: int):
+        bitlen = val.bit_length()
+        if bitlen % 2:
+            bitlen += 1
+        prefix = (bitlen // 2) - 1
+        self.write_method_11(prefix, 4)
+        self.write_method_11(val, bitlen)
+
+    def write_method_45(self, val: int):
+        if val < 0:
+            self.write_method_11(1, 1)
+            self.write_method_4(-val)
+        else:
+            self.write_method_11(0, 1)
+            self.write_method_4(val)
+        if self.debug:
+            self.debug_log.append(f"method_45={val}, sign={1 if val < 0 else 0}")
+
+    def write_method_11(self, value, bit_count):
+        if self.debug:
+            self.debug_log.append(f"write_method_6={value:0{bit_count}b} ({bit_count} bits)")
+        for i in reversed(range(bit_count)):
+            self.bits.append((value >> i) & 1)
+
+    def write_method_393(self, val):
+        self.write_method_11(val & 0xFF, 8)
+
+    def write_method_13(self, *vals: str):
+        val = " ".join(str(v) for v in vals)
+        encoded = val.encode('utf-8')
+        length = min(len(encoded), 65535)
+
+        self.write_method_11(length, 16)
+        for byte in encoded[:length]:
+            self.write_method_11(byte, 8)
+
+        if self.debug:
+            self.debug_log.append(f"method_13={val}, length={length}")
+
+    def write_float(self, val: float):
+        b = struct.pack(">f", val)
+        for byte in b:
+            self.write_method_11(byte, 8)
+
+    def write_method_309(self, val: float):
+        self.write_float(val)
+        if self.debug:
+            self.debug_log.append(f"method_309={val}")
+
+    def write_method_24(self, val: int):
+        """
+        Write a signed integer as a 1-bit sign flag followed by the magnitude via method_9.
+        - val: Signed integer to write.
+        """
+        sign = 1 if val < 0 else 0
+        self.write_method_11(sign, 1)
+        self.write_method_9(abs(val))
+        if self.debug:
+            self.debug_log.append(f"method_24={val}, sign={sign}")
+
+    def get_debug_log(self):
+        return self.debug_log if self.debug else []
+
+
+def random_ops(rng, count):
+    ops = []
+    for _ in range(count):
+        kind = rng.randrange(12)
+        if kind == 0:
+            ops.append(("write_method_15", rng.random() < 0.5))
+        elif kind == 1:
+            n = rng.randint(0, 40)
+            ops.append(("write_method_20", n, rng.getrandbits(n + 3)))
+        elif kind == 2:
+            ops.append(("write_method_739", rng.randint(-5000, 5000)))
+        elif kind == 3:
+            ops.append(("write_method_4", rng.choice([0, 1, 2, 3, rng.getrandbits(rng.randint(1, 32))])))
+        elif kind == 4:
+            ops.append(("write_method_26", rng.choice([None, "", "Paladin", "héllo wörld", "x" * rng.randint(0, 300)])))
+        elif kind == 5:
+            n = rng.randint(1, 24)
+            ops.append(("write_method_6", rng.getrandbits(n), n))
+        elif kind == 6:
+            ops.append(("write_method_91", rng.getrandbits(rng.randint(0, 16))))
+        elif kind == 7:
+            ops.append(("write_method_9", rng.choice([0, 1, rng.getrandbits(rng.randint(1, 30))])))
+        elif kind == 8:
+            ops.append(("write_method_45", rng.randint(-100000, 100000)))
+        elif kind == 9:
+            ops.append(("write_method_13", rng.choice(["", "BridgeTown", "a b", "ünïcode"])))
+        elif kind == 10:
+            ops.append(("write_method_309", rng.uniform(-1e6, 1e6)))
+        else:
+            ops.append(("write_method_24", rng.randint(-70000, 70000)))
+        if rng.random() < 0.02:
+            ops.append(("to_bytes",))
+    return ops
+
+
+def run_ops(cls, ops):
+    bb = cls(debug=False)
+    for name, *args in ops:
+        getattr(bb, name)(*args)
+    return bb.to_bytes()
+
+
+def build_packets():
+    char = load_class_template("paladin")
+    with open("world_npcs/BridgeTown.json", "r", encoding="utf-8") as f:
+        npcs = json.load(f)
+    player = entity.build_entity_dict(5, char, {"pos_x": 1200, "pos_y": 340})
+    return {
+        "enter world": lambda: WorldEnter.Player_Data_Packet(char, send_extended=True),
+        # Send_Entity_Data is generated by packet_schema now, the writer is measured on its old hand-written body
+        "entity spawn": lambda: [bench_schema.send_entity_data_handwritten(e) for e in [player] + npcs],
+        "hatchery": lambda: globals_mod.build_hatchery_packet([3, 7, 11], 1710000000),
+    }
+
+
+def with_writer(cls, fn):
+    with mock.patch.object(WorldEnter, "BitBuffer", cls), \
+         mock.patch.object(bench_schema, "BitBuffer", cls), \
+         mock.patch.object(globals_mod, "BitBuffer", cls):
+        return fn()
+
+
+def golden_check(packets, seeds=300):
+    for seed in range(seeds):
+        rng = random.Random(seed)
+        ops = random_ops(rng, rng.randint(1, 200))
+        old, new = run_ops(LegacyBitBuffer, ops), run_ops(BitBuffer, ops)
+        assert old == new, f"random corpus seed {seed} differs"
+
+    for name, build in packets.items():
+        # pin the clock, Player_Data_Packet writes the current time
+        with mock.patch("time.time", return_value=1710000000.0):
+            old = with_writer(LegacyBitBuffer, build)
+            new = with_writer(BitBuffer, build)
+        assert old == new, f"{name} packet differs"
+    print(f"golden check ok : {seeds} random sequences + {len(packets)} real packets identical")
+
+
+def _debug_off(cls):
+    return lambda *args, **kwargs: cls(debug=False)
+
+
+def bench(packets, rounds):
+    # "as called" keeps each call site's debug flag (debug_log string building included),
+    # "debug off" measures the writers alone
+    for mode in ("as called", "debug off"):
+        print(f"-- {mode}")
+        for name, build in packets.items():
+            rates = []
+            for cls in (LegacyBitBuffer, BitBuffer):
+                writer = cls if mode == "as called" else _debug_off(cls)
+
+                def run():
+                    t0 = time.perf_counter()
+                    for _ in range(rounds):
+                        out = build()
+                    return time.perf_counter() - t0, out
+                elapsed, out = with_writer(writer, run)
+                rates.append(rounds / elapsed)
+            size = sum(len(p) for p in out) if isinstance(out, list) else len(out)
+            print(f"{name:13s} ({size:5d} bytes)  legacy={rates[0]:9.0f}/s  new={rates[1]:9.0f}/s  x{rates[1] / rates[0]:.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=200)
+    args = ap.parse_args()
+
+    packets = build_packets()
+    golden_check(packets)
+    bench(packets, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Old copying BitReader vs the memoryview BitReader.
+
+Run from the server folder :
+    python -m benchmarks.bench_bitreader [--packets 20000] [--repeat 7]
+
+First checks that both readers return the same values (golden check) for random
+sequences of every read_method_* written with BitBuffer, then reports packets/sec
+parsed for the two high-rate client packets :
+  - 0x07 incremental entity update (movement)
+  - 0x08 full entity update
+using the same read sequence as their handlers. Both readers are timed in
+turns, --repeat times, and the best round of each is reported (single rounds
+vary by tens of percent on a busy machine).
+
+LegacyBitReader below is a verbatim copy of the old reader, kept only for this check.
+"""
+import argparse
+import random
+import struct
+import time
+from typing import List
+
+from BitBuffer import BitBuffer
+from bitreader import BitReader
+from constants import Entity
+
+
+class LegacyBitReader:
+    def __init__(self, data: bytes, debug: bool = False):
+        self.data = bytearray(data)
+        self.bit_index = 0
+        self.debug = debug
+        self.debug_log: List[str] = [] if debug else []
+
+    def align_to_byte(self):
+        remainder = self.bit_index % 8
+        if remainder:
+            skip_bits = 8 - remainder
+            for _ in range(skip_bits):
+                self.read_bit()
+            if self.debug:
+                self.debug_log.append(f"align_to_byte=skipped {skip_bits} bits")
+
+    def remaining_bits(self) -> int:
+        """
+        Server-only helper: return how many unread bits remain in the buffer.
+        The Flash client does not expose an equivalent method; it always knows
+        how many bits to read based on the packet type.
+        """
+        total_bits = len(self.data) * 8
+        return max(0, total_bits - self.bit_index)
+
+    def read_bit(self) -> int:
+        byte_index = self.bit_index // 8
+        bit_offset = self.bit_index & 7
+        if byte_index >= len(self.data):
+            raise ValueError("Not enough data to read bit")
+        bit = (self.data[byte_index] >> (7 - bit_offset)) & 1
+        self.bit_index += 1
+        if self.debug:
+            self.debug_log.append(f"read_bit={bit} at bit_index={self.bit_index-1}")
+        return bit
+
+    def read_method_15(self) -> bool:
+        """Read a single boolean (1 bit) from the bitstream, matching client method_15."""
+        bit = self.read_bit()
+        if self.debug:
+            self.debug_log.append(f"method_15={bool(bit)}")
+        return bool(bit)
+
+    def read_method_20(self, bit_count: int) -> int:
+        """Read bit_count bits across byte boundaries, MSB-first."""
+        val = 0
+        while bit_count > 0:
+            byte_index = self.bit_index // 8
+            bit_offset = self.bit_index & 7
+            bits_left_in_byte = 8 - bit_offset
+            bits_to_read = min(bit_count, bits_left_in_byte)
+
+            mask = (1 << bits_to_read) - 1
+            shift = bits_left_in_byte - bits_to_read
+            current_byte = self.data[byte_index]
+            extracted = (current_byte >> shift) & mask
+
+            val = (val << bits_to_read) | extracted
+            self.bit_index += bits_to_read
+            bit_count -= bits_to_read
+
+            if self.debug:
+                self.debug_log.append(
+                    f"read_method_20: byte_index={byte_index}, bit_offset={bit_offset}, "
+                    f"bits_to_read={bits_to_read}, extracted={extracted}, val={val}"
+                )
+        return val
+
+    def read_method_739(self) -> int:
+        sign = self.read_bit()
+        prefix = self.read_method_20(3)
+        bits_to_use = (prefix + 1) * 2
+        magnitude = self.read_method_20(bits_to_use)
+        return -magnitude if sign else magnitude
+
+    def read_method_4(self) -> int:
+        prefix = self.read_method_20(4)
+        bits_to_use = (prefix + 1) * 2
+        if self.bit_index + bits_to_use > len(self.data) * 8:
+            raise ValueError(f"Not enough data to read {bits_to_use} bits for method_4")
+        value = self.read_method_20(bits_to_use)
+        if self.debug:
+            self.debug_log.append(f"read_method_4={value}, prefix={prefix}, bits={bits_to_use}")
+        return value
+
+    def read_method_26(self) -> str:
+        length = self.read_method_20(16)
+        raw = bytearray(self.read_method_20(8) for _ in range(length))
+        try:
+            return raw.decode('utf-8')
+        except UnicodeDecodeError:
+            return raw.decode('latin-1', errors='replace')
+
+    def read_method_706(self) -> int:
+        is_negative = bool(self.read_bit())
+        prefix = self.read_method_20(3)
+        bit_length = (prefix + 1) * 2
+        value = self.read_method_20(bit_length)
+        return -value if is_negative else value
+
+    def read_method_6(self, bit_count: int) -> int:
+        if self.bit_index + bit_count > len(self.data) * 8:
+            raise ValueError(f"Not enough data to read {bit_count} bits for method_6")
+        value = self.read_method_20(bit_count)
+        if self.debug:
+            self.debug_log.append(f"read_method_6={value}, bits={bit_count}")
+        return value
+
+    def read_method_9(self) -> int:
+        prefix = self.read_method_20(4)
+        n_bits = (prefix + 1) * 2
+        if self.bit_index + n_bits > len(self.data) * 8:
+            raise ValueError(f"Not enough data to read {n_bits} bits for method_9")
+        value = self.read_method_20(n_bits)
+        if self.debug:
+            self.debug_log.append(f"read_method_9={value}, prefix={prefix}, bits={n_bits}")
+        return value
+
+    def read_method_45(self) -> int:
+        sign = self.read_bit()
+        if self.bit_index + 4 > len(self.data) * 8:
+            raise ValueError("Not enough data to read method_4 prefix for method_45")
+        magnitude = self.read_method_4()
+        value = -magnitude if sign else magnitude
+        if self.debug:
+            self.debug_log.append(f"read_method_45={value}, sign={sign}, magnitude={magnitude}")
+        return value
+
+    def read_method_393(self) -> int:
+        value = self.read_method_20(8)
+        if self.debug:
+            self.debug_log.append(f"read_method_393={value}")
+        return value
+
+    def read_method_560(self) -> float:
+        if self.bit_index + 32 > len(self.data) * 8:
+            raise ValueError("Not enough data to read float")
+        bits = self.read_method_20(32)
+        bytes_val = struct.pack('>I', bits)
+        float_val = struct.unpack('>f', bytes_val)[0]
+        if self.debug:
+            self.debug_log.append(f"read_method_560={float_val}")
+        return float_val
+
+    def read_method_13(self) -> str:
+        length = self.read_method_20(16)
+        if self.bit_index + length * 8 > len(self.data) * 8:
+            raise ValueError("Not enough data to read string")
+        result_bytes = bytearray()
+        for _ in range(length):
+            result_bytes.append(self.read_method_20(8))
+        try:
+            return result_bytes.decode('utf-8')
+        except UnicodeDecodeError:
+            return result_bytes.decode('latin1')
+
+    def read_method_24(self) -> int:
+        if self.bit_index + 1 > len(self.data) * 8:
+            raise ValueError("Not enough data to read sign bit for method_24")
+        sign = self.read_bit()
+        magnitude = self.read_method_9()
+        value = -magnitude if sign else magnitude
+        if self.debug:
+            self.debug_log.append(f"read_method_24={value}, sign={sign}, magnitude={magnitude}")
+        return value
+
+    def read_method_309(self) -> float:
+        return self.read_float()
+
+    def read_float(self) -> float:
+        bits = self.read_method_20(32)
+        bytes_val = struct.pack('>I', bits)
+        return struct.unpack('>f', bytes_val)[0]
+
+    def read_method_236(self) -> int:
+        prefix = self.read_method_20(3)
+        bits_to_use = (prefix + 1) * 2
+
+        if self.bit_index + bits_to_use > len(self.data) * 8:
+            raise ValueError("Not enough data to read method_236 value")
+
+        return self.read_method_20(bits_to_use)
+
+    def get_debug_log(self) -> List[str]:
+        return self.debug_log
+
+
+# (writer method, reader method, value generator)
+# method_9 / method_24 never write 0 here : write_method_9(0) emits prefix 15 with no value
+# bits, which no reader can read back (the client never sends it)
+OPS = [
+    ("write_method_15", "read_method_15", lambda r: r.random() < 0.5),
+    ("write_method_739", "read_method_739", lambda r: r.randint(-5000, 5000)),
+    ("write_method_4", "read_method_4", lambda r: r.getrandbits(r.randint(1, 32))),
+    ("write_method_26", "read_method_26", lambda r: r.choice(["", "Paladin", "héllo wörld", "x" * r.randint(0, 300)])),
+    ("write_method_9", "read_method_9", lambda r: r.getrandbits(r.randint(1, 30)) or 1),
+    ("write_method_45", "read_method_45", lambda r: r.randint(-100000, 100000)),
+    ("write_method_13", "read_method_13", lambda r: r.choice(["", "BridgeTown", "ünïcode"])),
+    ("write_method_309", "read_method_309", lambda r: r.uniform(-1e6, 1e6)),
+    ("write_method_24", "read_method_24", lambda r: r.randint(1, 70000) * r.choice((-1, 1))),
+    ("write_method_393", "read_method_393", lambda r: r.getrandbits(8)),
+]
+
+
+def golden_check(seeds=300):
+    for seed in range(seeds):
+        rng = random.Random(seed)
+        bb = BitBuffer(debug=False)
+        plan = []
+        for _ in range(rng.randint(1, 200)):
+            if rng.random() < 0.3:
+                n = rng.randint(0, 40)
+                bb.write_method_6(rng.getrandbits(n) if n else 0, n)
+                plan.append(("read_method_20", n))
+            else:
+                write, read, gen = rng.choice(OPS)
+                getattr(bb, write)(gen(rng))
+                plan.append((read,))
+        payload = bb.to_bytes()
+
+        results = []
+        for cls in (LegacyBitReader, BitReader):
+            br = cls(payload)
+            values = [getattr(br, name)(*args) for name, *args in plan]
+            results.append((values, br.bit_index, br.remaining_bits()))
+        assert results[0] == results[1], f"seed {seed} differs"
+    print(f"golden check ok : {seeds} random sequences read identically")
+
+
+def build_0x07():
+    bb = BitBuffer(debug=False)
+    bb.write_method_4(12345)
+    bb.write_method_45(-37)
+    bb.write_method_45(4)
+    bb.write_method_45(0)
+    bb.write_method_6(3, Entity.const_316)
+    for flag in (True, True, False, False, False):
+        bb.write_method_15(flag)
+    bb.write_method_15(True)
+    bb.write_method_24(-250)
+    body = bb.to_bytes()
+    return struct.pack(">HH", 0x07, len(body)) + body
+
+
+def build_0x08():
+    bb = BitBuffer(debug=False)
+    bb.write_method_9(12345)
+    bb.write_method_24(14809)
+    bb.write_method_24(2139)
+    bb.write_method_24(-3)
+    bb.write_method_26("BanditRogue2")
+    bb.write_method_6(2, Entity.TEAM_BITS)
+    bb.write_method_15(False)
+    bb.write_method_739(-37)
+    bb.write_method_15(True)
+    for text in ("Bandit", "Drama", "Sleep"):
+        bb.write_method_15(True)
+        bb.write_method_13(text)
+    bb.write_method_15(True)
+    bb.write_method_9(777)
+    bb.write_method_15(False)
+    bb.write_method_6(1, Entity.const_316)
+    for flag in (True, False, False, False, False):
+        bb.write_method_15(flag)
+    body = bb.to_bytes()
+    return struct.pack(">HH", 0x08, len(body)) + body
+
+
+def parse_0x07(cls, data):
+    """Read sequence of handle_entity_incremental_update."""
+    br = cls(data[4:])
+    entity_id = br.read_method_4()
+    dx, dy, dvx = br.read_method_45(), br.read_method_45(), br.read_method_45()
+    state = br.read_method_6(Entity.const_316)
+    flags = [br.read_method_15() for _ in range(5)]
+    vy = br.read_method_24() if br.read_method_15() else 0
+    return entity_id, dx, dy, dvx, state, flags, vy
+
+
+def parse_0x08(cls, data):
+    """Read sequence of handle_entity_full_update."""
+    br = cls(data[4:])
+    out = [br.read_method_9(), br.read_method_24(), br.read_method_24(), br.read_method_24(),
+           br.read_method_26(), br.read_method_20(Entity.TEAM_BITS), br.read_method_15(), br.read_method_706()]
+    if br.read_method_15():
+        for _ in range(3):
+            if br.read_method_15():
+                out.append(br.read_method_13())
+    out.append(br.read_method_9() if br.read_method_15() else None)
+    out.append(br.read_method_9() if br.read_method_15() else None)
+    out.append(br.read_method_20(Entity.const_316))
+    out.extend(br.read_method_15() for _ in range(5))
+    return out
+
+
+def best_rate(parse, cls, data, count, rates):
+    t0 = time.perf_counter()
+    for _ in range(count):
+        parse(cls, data)
+    rates[cls] = max(rates.get(cls, 0), count / (time.perf_counter() - t0))
+
+
+def bench(count, repeat):
+    # handlers get a memoryview of the packet from the framer
+    cases = (("0x07 incremental", parse_0x07, memoryview(build_0x07())),
+             ("0x08 full update", parse_0x08, memoryview(build_0x08())))
+    for name, parse, data in cases:
+        assert parse(LegacyBitReader, data) == parse(BitReader, data), name
+        best = {}
+        for _ in range(repeat):
+            for cls in (LegacyBitReader, BitReader):
+                best_rate(parse, cls, data, count, best)
+        rates = [best[LegacyBitReader], best[BitReader]]
+        print(f"{name} ({len(data):3d} bytes)  legacy={rates[0]:9.0f}/s  new={rates[1]:9.0f}/s  x{rates[1] / rates[0]:.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--packets", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=7)
+    args = ap.parse_args()
+
+    golden_check()
+    bench(args.packets, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Cold start : game data from the JSON files vs the precompiled bundle (data_bundle.py).
+
+Run from the server folder :
+    python -m benchmarks.bench_data_bundle [--runs 5]
+
+Builds the bundle when it is stale, then starts fresh interpreters that load
+all the game data the server reads at import and on first use (constants,
+level_config, the mission defs and the three class templates), once with
+DATA_BUNDLE off (JSON, as before) and once with the bundle. Reports the best
+of --runs for the whole import and for the data loading alone, and the time
+to load one class template (character creation).
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import data_bundle
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import data_bundle
+data_bundle.DATA_BUNDLE = {use_bundle}
+loads = [0.0]
+plain_load = data_bundle.load_json
+def timed_load(path):
+    t = time.perf_counter()
+    try:
+        return plain_load(path)
+    finally:
+        loads[0] += time.perf_counter() - t
+data_bundle.load_json = timed_load    # before the loaders import it
+import constants, level_config, missions
+missions.load_mission_defs()
+for class_name in ("paladin", "mage", "rogue"):
+    constants.load_class_template(class_name)
+total = time.perf_counter() - t0
+t = time.perf_counter()
+for _ in range(20):
+    constants.load_class_template("mage")
+template = (time.perf_counter() - t) / 20
+print(json.dumps([total, loads[0], template]))
+"""
+
+
+def cold_start(use_bundle, runs):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", CHILD.format(use_bundle=use_bundle)],
+                             check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return [min(r[i] for r in results) for i in range(3)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    data_bundle.refresh_bundle()
+    for name, use_bundle in (("json  ", False), ("bundle", True)):
+        total, loads, template = cold_start(use_bundle, args.runs)
+        print(f"{name} startup={total * 1e3:7.1f} ms  data={loads * 1e3:7.1f} ms"
+              f"  class template={template * 1e3:6.2f} ms   (best of {args.runs})")
+
+
+if __name__ == "__main__":
+    main()
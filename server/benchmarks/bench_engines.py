@@ -0,0 +1,126 @@
+"""
+Threaded engine vs asyncio engine.
+
+Run from the server folder :
+    python -m benchmarks.bench_engines [--clients 50] [--packets 200] [--connections 500]
+
+Both engines are started in-process on a free port with the real ClientSession
+and dispatch_packet. A test-only echo handler is registered on an unused packet
+type so every ping gets exactly one reply.
+
+Reports :
+  - connections/sec : connect, one ping/pong, disconnect (sequential)
+  - per-packet latency : N concurrent clients doing request/response pings
+"""
+import argparse
+import contextlib
+import io
+import socket
+import statistics
+import struct
+import threading
+import time
+
+from PKTTYPES import PACKET_HANDLERS
+from async_server import start_async_servers
+from globals import HOST
+from server import ClientSession, dispatch_packet, start_server, accept_connections
+
+ECHO_PKT = 0x7FF0
+
+
+def _echo(session, data):
+    session.conn.sendall(data)
+
+
+PACKET_HANDLERS[ECHO_PKT] = _echo
+PING = struct.pack(">HH", ECHO_PKT, 8) + b"pingpong"
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("server closed connection")
+        buf.extend(chunk)
+    return buf
+
+
+def start_threaded():
+    s = start_server(0)
+    port = s.getsockname()[1]
+    threading.Thread(target=accept_connections, args=(s, port), daemon=True).start()
+    return port
+
+
+def start_asyncio():
+    (_, port), = start_async_servers(ClientSession, dispatch_packet, ports=[0])
+    return port
+
+
+def bench_connections(port, count):
+    t0 = time.perf_counter()
+    for _ in range(count):
+        with socket.create_connection((HOST, port)) as c:
+            c.sendall(PING)
+            _recv_exact(c, len(PING))
+    return count / (time.perf_counter() - t0)
+
+
+def bench_latency(port, clients, packets):
+    samples = []
+    lock = threading.Lock()
+    start = threading.Barrier(clients)
+
+    def worker():
+        local = []
+        with socket.create_connection((HOST, port)) as c:
+            c.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            start.wait()
+            for _ in range(packets):
+                t = time.perf_counter()
+                c.sendall(PING)
+                _recv_exact(c, len(PING))
+                local.append(time.perf_counter() - t)
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    return len(samples) / elapsed, statistics.median(samples) * 1e6, p99 * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--packets", type=int, default=200)
+    ap.add_argument("--connections", type=int, default=500)
+    args = ap.parse_args()
+
+    results = []
+    # the server prints a line per connect/disconnect, keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, starter in (("threaded", start_threaded), ("asyncio", start_asyncio)):
+            port = starter()
+            cps = bench_connections(port, args.connections)
+            results.append((name, cps, *bench_latency(port, args.clients, args.packets)))
+
+    for name, cps, pps, p50, p99 in results:
+        print(
+            f"{name:9s} connections/sec={cps:8.0f}   "
+            f"packets/sec={pps:8.0f}   latency p50={p50:7.1f}us p99={p99:7.1f}us "
+            f"({args.clients} clients x {args.packets} pings)"
+        )
+
+
+if __name__ == "__main__":
+    main()
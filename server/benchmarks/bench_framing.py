@@ -0,0 +1,104 @@
+"""
+Old copy-per-packet framing loop vs PacketFramer.
+
+Run from the server folder :
+    python -m benchmarks.bench_framing [--packets 200000] [--payload 12]
+
+A fake connection feeds a pre-built stream of small packets (movement sized by
+default) in 4096-byte recv chunks, like a busy client would. Both loops dispatch
+to a handler that does what most handlers do first : slice off the header.
+
+Reports packets/sec parsed for each loop.
+"""
+import argparse
+import struct
+import time
+
+from framing import PacketFramer
+
+
+class FakeConn:
+    def __init__(self, stream, chunk=4096):
+        self.stream = memoryview(stream)
+        self.pos = 0
+        self.chunk = chunk
+
+    def recv(self, bufsize):
+        n = min(bufsize, self.chunk)
+        out = bytes(self.stream[self.pos:self.pos + n])
+        self.pos += len(out)
+        return out
+
+    def recv_into(self, buffer, nbytes=0):
+        n = min(len(buffer), nbytes or len(buffer), self.chunk, len(self.stream) - self.pos)
+        buffer[:n] = self.stream[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+def handler(pkt, data):
+    return data[4:]
+
+
+def legacy_loop(conn):
+    """The framing loop handle_client used before framing.py."""
+    count = 0
+    buffer = bytearray()
+    while True:
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        while len(buffer) >= 4:
+            pkt    = int.from_bytes(buffer[0:2], byteorder='big')
+            length = int.from_bytes(buffer[2:4], byteorder='big')
+            total  = 4 + length
+            if len(buffer) < total:
+                break
+            data    = bytes(buffer[:total])
+            payload = data[4:]
+            del buffer[:total]
+            if len(payload) != length:
+                print("Length mismatch")
+            handler(pkt, data)
+            count += 1
+    return count
+
+
+def framer_loop(conn):
+    count = 0
+    framer = PacketFramer()
+    while framer.recv_into(conn):
+        for pkt, data in framer.packets():
+            handler(pkt, data)
+            count += 1
+    return count
+
+
+def build_stream(packets, payload_size):
+    pkt = struct.pack(">HH", 0x07, payload_size) + (b"\xAB" * payload_size)
+    return pkt * packets
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--packets", type=int, default=200_000)
+    ap.add_argument("--payload", type=int, default=12)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    stream = build_stream(args.packets, args.payload)
+    for name, loop in (("legacy", legacy_loop), ("framer", framer_loop)):
+        best = 0.0
+        for _ in range(args.rounds):
+            conn = FakeConn(stream)
+            t0 = time.perf_counter()
+            count = loop(conn)
+            elapsed = time.perf_counter() - t0
+            assert count == args.packets, (name, count)
+            best = max(best, count / elapsed)
+        print(f"{name:7s} packets/sec={best:10.0f}   ({args.packets} packets x {4 + args.payload} bytes, 4096-byte chunks)")
+
+
+if __name__ == "__main__":
+    main()
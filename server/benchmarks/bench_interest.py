@@ -0,0 +1,96 @@
+"""
+Level wide movement relay vs interest management (interest.py).
+
+Run from the server folder :
+    python -m benchmarks.bench_interest [--players 100] [--width 20000] [--steps 50]
+
+--players players are spread over a --width px wide level (CraftTown is ~5500,
+JadeCity ~25000) and each one walks back and forth, sending one 13-byte 0x07 per
+step. Both sides count the packets and bytes the server sends and the
+packets/sec relayed, the interest side includes the spawns/destroys sent when
+players come in and out of range.
+"""
+import argparse
+import random
+import time
+
+import interest
+from globals import GS, level_join, level_leave, broadcast_to_level
+
+MOVE = b"\x00\x07\x00\x09" + b"\x00" * 9
+
+
+class FakeConn:
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+
+    def sendall(self, data):
+        self.packets += 1
+        self.bytes += len(data)
+
+
+class FakeSession:
+    def __init__(self, eid, x, y):
+        self.conn = FakeConn()
+        self.player_spawned = False
+        self.indexed_level = None
+        self.current_level = "BenchLevel"
+        self.clientEntID = eid
+        self.entities = {eid: {"pos_x": x, "pos_y": y}}
+        self.interest = frozenset()
+
+
+def fake_spawn_packet(session):
+    return b"\x00\x0f\x00\x40" + b"\x00" * 64
+
+
+def run(players, width, steps, use_interest, seed=1):
+    rng = random.Random(seed)
+    interest.INTEREST_ENABLED = use_interest
+    interest.set_spawn_packet_builder(fake_spawn_packet)
+    sessions = [FakeSession(100 + i, rng.uniform(0, width), rng.uniform(0, 1500)) for i in range(players)]
+    for s in sessions:
+        level_join(s)
+        interest.enter(s)
+    speeds = [rng.choice((-1, 1)) * rng.uniform(20, 60) for _ in sessions]
+
+    t0 = time.perf_counter()
+    for _ in range(steps):
+        for i, s in enumerate(sessions):
+            ent = s.entities[s.clientEntID]
+            x = ent["pos_x"] + speeds[i]
+            if not 0 <= x <= width:
+                speeds[i] = -speeds[i]
+            ent["pos_x"] = x
+            if use_interest:
+                interest.moved(s)
+                interest.broadcast_to_interest(s, MOVE)
+            else:
+                broadcast_to_level(s.current_level, MOVE, exclude=s)
+    elapsed = time.perf_counter() - t0
+
+    sent = sum(s.conn.packets for s in sessions)
+    sent_bytes = sum(s.conn.bytes for s in sessions)
+    for s in sessions:
+        interest.leave(s)
+        level_leave(s)
+    GS.level_registry.clear()
+    return sent, sent_bytes, players * steps / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=100)
+    ap.add_argument("--width", type=int, default=20000)
+    ap.add_argument("--steps", type=int, default=50)
+    args = ap.parse_args()
+
+    for name, use_interest in (("level   ", False), ("interest", True)):
+        sent, sent_bytes, rate = run(args.players, args.width, args.steps, use_interest)
+        print(f"{name} packets out={sent:8d}  bytes out={sent_bytes:9d}  moves/sec={rate:9.0f}"
+              f"   ({args.players} players, {args.width}px level, {args.steps} steps)")
+
+
+if __name__ == "__main__":
+    main()
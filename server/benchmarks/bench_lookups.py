@@ -0,0 +1,97 @@
+"""
+Game data lookups of the handlers : list scans (previous) vs the indexes in constants.py.
+
+Run from the server folder :
+    python -m benchmarks.bench_lookups [--lookups 100000]
+
+Each row is the lookup one handler does per packet, with keys drawn from the
+real data (every ability / building rank, every egg and pet) :
+
+    research  skills.handle_start_skill_training (0xBE) get_ability_info
+    building  buildings.handle_building_upgrade         find_building_data
+    hatch     pets.handle_egg_hatch                     find_egg_def
+    collect   pets.handle_collect_hatched_egg           find_pet_def
+    daily     pets.handle_request_hatchery_eggs         pick_daily_eggs
+
+Reports the mean time per lookup and checks both give the same rows.
+"""
+import argparse
+import random
+import time
+
+from constants import ABILITY_DATA, BUILDING_DATA, EGG_TYPES, PET_TYPES, \
+    get_ability_info, find_building_data, find_egg_def, find_pet_def
+from globals import pick_daily_eggs
+
+
+#### Previous lookups ####
+
+def scan_ability_info(ability_id, rank):
+    key, rank = str(ability_id), str(rank)
+    for e in ABILITY_DATA:
+        if e.get("AbilityID") == key and e.get("Rank") == rank:
+            return {k: int(e.get(k, 0)) for k in ("AbilityID", "Rank", "GoldCost", "IdolCost", "UpgradeTime")}
+    return None
+
+
+def scan_building_data(building_id, rank):
+    bid, rank = int(building_id), int(rank)
+    return next((b for b in BUILDING_DATA
+                 if int(b.get("BuildingID", -1)) == bid and int(b.get("Rank", -1)) == rank), None)
+
+
+def scan_egg_def(egg_id):
+    for e in EGG_TYPES:
+        if e.get("EggID") == egg_id:
+            return e
+    return None
+
+
+def scan_pet_def(pet_id):
+    return next((p for p in PET_TYPES if p.get("PetID") == pet_id), None)
+
+
+def scan_daily_eggs(count=3):
+    valid = [e for e in EGG_TYPES if e.get("EggID", 0) > 0]
+    if len(valid) < count:
+        return [e["EggID"] for e in valid]
+    return [e["EggID"] for e in random.sample(valid, count)]
+
+
+def mean_time(fn, keys):
+    t0 = time.perf_counter()
+    for key in keys:
+        fn(*key)
+    return (time.perf_counter() - t0) / len(keys)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lookups", type=int, default=100_000)
+    args = ap.parse_args()
+
+    rng = random.Random(1)
+    abilities = [(int(e["AbilityID"]), int(e["Rank"])) for e in ABILITY_DATA]
+    buildings = [(int(b["BuildingID"]), int(b["Rank"])) for b in BUILDING_DATA]
+    eggs = [(e["EggID"],) for e in EGG_TYPES]
+    pets = [(p["PetID"],) for p in PET_TYPES]
+    cases = [
+        ("research", scan_ability_info, get_ability_info, abilities),
+        ("building", scan_building_data, find_building_data, buildings),
+        ("hatch   ", scan_egg_def, find_egg_def, eggs),
+        ("collect ", scan_pet_def, find_pet_def, pets),
+        ("daily   ", scan_daily_eggs, pick_daily_eggs, [(3,)]),
+    ]
+    for name, scan, indexed, keys in cases:
+        if scan is not scan_daily_eggs:
+            assert all(scan(*k) == indexed(*k) for k in keys), f"{name.strip()} lookups differ"
+        else:
+            assert sorted(scan_daily_eggs(100)) == sorted(pick_daily_eggs(100)), "daily eggs differ"
+        sample = [rng.choice(keys) for _ in range(args.lookups)]
+        before, after = mean_time(scan, sample), mean_time(indexed, sample)
+        print(f"{name} scan={before * 1e6:8.2f} us  indexed={after * 1e6:6.2f} us  ({before / after:6.1f}x)"
+              f"   ({len(keys)} keys)")
+
+
+if __name__ == "__main__":
+    main()
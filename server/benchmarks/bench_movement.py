@@ -0,0 +1,129 @@
+"""
+Relay on arrival vs tick batched movement (movement_batch.py).
+
+Run from the server folder :
+    python -m benchmarks.bench_movement [--players 20] [--client-hz 30] [--tick 20] [--seconds 5]
+
+--players players stand together in one level (all in each other's interest)
+and each sends --client-hz 0x07 per second through the real
+handle_entity_incremental_update for --seconds of simulated time. The batched
+side flushes a movement tick every 1 / --tick seconds of simulated time.
+
+Reports sendall calls (TCP writes), bytes sent and the server CPU time spent,
+and checks that every peer ends up with the same positions either way.
+"""
+import argparse
+import random
+import time
+
+import interest
+import level_config
+import movement_batch
+from framing import PacketFramer
+from globals import GS, level_join, level_leave
+from packet_schema import ENTITY_INCREMENTAL_UPDATE
+
+
+class FakeConn:
+    def __init__(self):
+        self.writes = 0
+        self.data = bytearray()
+
+    def sendall(self, data):
+        self.writes += 1
+        self.data += data
+
+
+class FakeSession:
+    def __init__(self, eid, x):
+        self.conn = FakeConn()
+        self.addr = ("bench", eid)
+        self.player_spawned = False
+        self.indexed_level = None
+        self.current_level = "BenchLevel"
+        self.current_character = f"p{eid}"
+        self.char_list = []
+        self.clientEntID = eid
+        self.entities = {eid: {"pos_x": x, "pos_y": 500, "velocity_x": 0}}
+        self.interest = frozenset()
+
+
+def make_moves(players, count, seed=1):
+    rng = random.Random(seed)
+    moves = []
+    for _ in range(count):
+        for i in range(players):
+            moves.append((i, ENTITY_INCREMENTAL_UPDATE.build_packet({
+                "entity_id": 100 + i, "delta_x": rng.randint(1, 40), "delta_y": rng.randint(1, 3),
+                "delta_vx": rng.randint(1, 5), "ent_state": 1, "b_left": False, "b_running": True,
+                "b_jumping": False, "b_dropping": False, "b_backpedal": False, "velocity_y": None,
+            })))
+    return moves
+
+
+def final_positions(session):
+    """Entity positions as seen by `session`, replaying the 0x07s it received."""
+    framer = PacketFramer(max_packet_length=len(session.conn.data) + 4)
+    framer._buf[:len(session.conn.data)] = session.conn.data
+    framer.buffer_updated(len(session.conn.data))
+    seen = {}
+    for _, data in framer.packets():
+        fields = ENTITY_INCREMENTAL_UPDATE.decode(data[4:])
+        x, y = seen.get(fields["entity_id"], (0, 0))
+        seen[fields["entity_id"]] = (x + fields["delta_x"], y + fields["delta_y"])
+    return seen
+
+
+def run(args, batching):
+    movement_batch.MOVEMENT_BATCHING = batching
+    movement_batch._thread = True   # the benchmark flushes ticks itself
+    level_config.LEVEL_CONFIG.setdefault("BenchLevel", ("", 1, 1, True))   # dungeon : no save coords
+    sessions = [FakeSession(100 + i, 1000 + 40 * i) for i in range(args.players)]
+    for s in sessions:
+        level_join(s)
+        interest.enter(s)
+    for s in sessions:
+        s.conn = FakeConn()
+
+    per_tick = max(1, round(args.client_hz / args.tick))
+    moves = make_moves(args.players, args.client_hz * args.seconds)
+    t0 = time.perf_counter()
+    for n, (i, pkt) in enumerate(moves):
+        level_config.handle_entity_incremental_update(sessions[i], memoryview(pkt))
+        if batching and (n + 1) % (per_tick * args.players) == 0:
+            movement_batch.flush_all()
+    if batching:
+        movement_batch.flush_all()
+    elapsed = time.perf_counter() - t0
+
+    writes = sum(s.conn.writes for s in sessions)
+    sent = sum(len(s.conn.data) for s in sessions)
+    views = [final_positions(s) for s in sessions]
+    for s in sessions:
+        interest.leave(s)
+        movement_batch.discard(s)
+        level_leave(s)
+    GS.level_registry.clear()
+    return writes, sent, elapsed, views
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=20)
+    ap.add_argument("--client-hz", type=int, default=30)
+    ap.add_argument("--tick", type=int, default=20)
+    ap.add_argument("--seconds", type=int, default=5)
+    args = ap.parse_args()
+
+    results = {}
+    for name, batching in (("relay  ", False), ("batched", True)):
+        writes, sent, elapsed, views = run(args, batching)
+        results[batching] = views
+        print(f"{name} writes={writes:8d}  bytes={sent:9d}  cpu={elapsed * 1000:7.1f} ms"
+              f"   ({args.players} players x {args.client_hz} Hz for {args.seconds}s, tick {args.tick} Hz)")
+    assert results[False] == results[True], "peers disagree on final positions"
+    movement_batch.print_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Parse-then-forward vs relay_packet for the pure relay handlers.
+
+Run from the server folder :
+    python -m benchmarks.bench_relay [--packets 50000] [--players 8]
+
+0x0A power hit and 0x0B add buff are sent by one player into a level with
+--players players in it, while --players more are spawned in another level
+(fake connections, sendall only counts bytes).
+"legacy" is the handler body before relay_packet : read every field with
+BitReader, then loop over all_sessions. "relay" is combat.handle_power_hit /
+handle_add_buff as they are now (RELAY_VALIDATE_EVERY sampling included).
+
+Reports packets/sec handled for each.
+"""
+import argparse
+import time
+
+import combat
+import globals as g
+from bitreader import BitReader
+from globals import GS, level_join
+from packet_schema import POWER_HIT, ADD_BUFF
+
+
+class FakeConn:
+    def __init__(self):
+        self.sent = 0
+
+    def sendall(self, data):
+        self.sent += len(data)
+
+
+class FakeSession:
+    def __init__(self, level):
+        self.conn = FakeConn()
+        self.player_spawned = False
+        self.indexed_level = None
+        self.current_level = level
+        level_join(self)
+
+
+def legacy_power_hit(session, data):
+    br = BitReader(data[4:])
+    br.read_method_9()
+    br.read_method_9()
+    br.read_method_24()
+    br.read_method_9()
+    if br.read_method_15():
+        br.read_method_9()
+    if br.read_method_15():
+        br.read_method_9()
+    br.read_method_15()
+    for other in GS.all_sessions:
+        if (
+            other is not session
+            and other.player_spawned
+            and other.current_level == session.current_level
+        ):
+            other.conn.sendall(data)
+
+
+def legacy_add_buff(session, data):
+    br = BitReader(data[4:])
+    for _ in range(6):
+        br.read_method_9()
+    if br.read_method_15():
+        for _ in range(br.read_method_9()):
+            br.read_method_9()
+            for _ in range(br.read_method_9()):
+                br.read_method_560()
+    for other in GS.all_sessions:
+        if (
+            other is not session
+            and other.player_spawned
+            and other.current_level == session.current_level
+        ):
+            other.conn.sendall(data)
+
+
+def build_samples():
+    hit = POWER_HIT.build_packet({
+        "target_entity_id": 12345, "source_entity_id": 87, "damage_value": 1500, "power_type_id": 42,
+        "animation_override_id": None, "effect_override_id": 3, "is_critical": True,
+    })
+    buff = ADD_BUFF.build_packet({
+        "entity_id": 12345, "caster_id": 87, "buff_type_id": 17, "duration": 6000, "stack_count": 1,
+        "sequence_id": 9, "modifier_nodes": [
+            {"power_node_type_id": 5, "mod_values": [1.5, 0.25]},
+            {"power_node_type_id": 8, "mod_values": [10.0]},
+        ],
+    })
+    return hit, buff
+
+
+def rate(handler, session, data, count):
+    t0 = time.perf_counter()
+    for _ in range(count):
+        handler(session, data)
+    return count / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--packets", type=int, default=50_000)
+    ap.add_argument("--players", type=int, default=8)
+    args = ap.parse_args()
+
+    sessions = [FakeSession("CraftTown") for _ in range(args.players)]
+    sessions += [FakeSession("SomewhereElse") for _ in range(args.players)]
+    GS.all_sessions[:] = sessions
+    sender = sessions[0]
+
+    hit, buff = build_samples()
+    cases = (
+        ("0x0A power hit", legacy_power_hit, combat.handle_power_hit, memoryview(hit)),
+        ("0x0B add buff ", legacy_add_buff, combat.handle_add_buff, memoryview(buff)),
+    )
+    print(f"RELAY_VALIDATE_EVERY={g.RELAY_VALIDATE_EVERY}  players in level={args.players}")
+    for name, old, new, data in cases:
+        a = rate(old, sender, data, args.packets)
+        b = rate(new, sender, data, args.packets)
+        print(f"{name} ({len(data):2d} bytes)  legacy={a:9.0f}/s  relay={b:9.0f}/s  x{b / a:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Save file formats : indented json vs compact json vs binary (save_codec.py).
+
+Run from the server folder :
+    python -m benchmarks.bench_save_codec [--repeat 50]
+
+The save holds the three class templates (level 20, full inventories, every
+mission, dye and mount, the most progressed characters the server ships).
+Reports the file size and the mean encode / decode time of each format, the
+time to read a single character out of the binary save (read_character), and
+checks every format decodes back to the same data.
+"""
+import argparse
+import json
+import time
+
+from constants import load_class_template
+from save_codec import encode_save, decode_save, read_character
+
+FORMATS = {
+    "json   ": (lambda d: json.dumps(d, ensure_ascii=False, indent=2).encode("utf-8"), json.loads),
+    "compact": (lambda d: json.dumps(d, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), json.loads),
+    "binary ": (encode_save, decode_save),
+}
+
+
+def build_save():
+    chars = []
+    for class_name in ("paladin", "mage", "rogue"):
+        char = load_class_template(class_name)
+        char["name"] = f"Bench{class_name.title()}"
+        chars.append(char)
+    return {"user_id": 1, "characters": chars, "journal_seq": 1792339689464651588}
+
+
+def mean_time(repeat, fn, arg):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(arg)
+    return (time.perf_counter() - t0) / repeat, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    save = build_save()
+    baseline = None
+    for name, (encode, decode) in FORMATS.items():
+        enc_time, raw = mean_time(args.repeat, encode, save)
+        dec_time, decoded = mean_time(args.repeat, decode, raw)
+        assert decoded == save and json.dumps(decoded) == json.dumps(save), f"{name.strip()} does not round trip"
+        baseline = baseline or len(raw)
+        print(f"{name} size={len(raw):8d} bytes ({len(raw) / baseline:6.1%})"
+              f"  encode={enc_time * 1e3:7.2f} ms  decode={dec_time * 1e3:7.2f} ms"
+              f"   ({len(save['characters'])} characters)")
+
+    raw = encode_save(save)
+    one_time, char = mean_time(args.repeat, lambda r: read_character(r, "benchrogue"), raw)
+    assert char == save["characters"][2]
+    print(f"binary  read_character={one_time * 1e3:7.2f} ms (one of {len(save['characters'])})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Synchronous save_characters vs the write-behind SaveWriter (accounts.py).
+
+Run from the server folder :
+    python -m benchmarks.bench_saves [--calls 300] [--chars 6]
+
+A user with --chars characters (class templates) renames a gear set --calls
+times in a row through the real combat.handle_name_gearset, which ends with
+save_characters like most handlers do. Saves go to a temporary folder.
+
+Reports handler latency (mean / p99) and the number of file writes for each
+mode, then checks the file on disk matches the final state after flush_saves().
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import accounts
+import combat
+from BitBuffer import BitBuffer
+from constants import GearType, load_class_template
+from storage import JsonStorage
+
+
+class FakeConn:
+    def sendall(self, data):
+        pass
+
+
+class FakeSession:
+    def __init__(self, user_id, char_list):
+        self.conn = FakeConn()
+        self.user_id = user_id
+        self.char_list = char_list
+        self.current_character = char_list[0]["name"]
+
+
+def build_chars(count):
+    chars = []
+    for i in range(count):
+        char = load_class_template(("paladin", "mage", "rogue")[i % 3])
+        char["name"] = f"Bench{i}"
+        char["gearSets"] = [{"name": f"GearSet {n + 1}", "slots": [0] * 6} for n in range(3)]
+        chars.append(char)
+    return chars
+
+
+def name_gearset_packet(slot, name):
+    bb = BitBuffer()
+    bb.write_method_6(slot, GearType.const_348)
+    bb.write_method_13(name)
+    payload = bb.to_bytes()
+    return memoryview(len(payload).to_bytes(4, "big") + payload)
+
+
+def run(calls, chars, write_behind):
+    accounts.SAVE_WRITE_BEHIND = write_behind
+    writes_before = accounts.save_writer.stats["writes"]
+    session = FakeSession(1, build_chars(chars))
+    packets = [name_gearset_packet(i % 3, f"Set {i}") for i in range(calls)]
+
+    latencies = []
+    sync_writes = 0
+    for pkt in packets:
+        t0 = time.perf_counter()
+        combat.handle_name_gearset(session, pkt)
+        latencies.append(time.perf_counter() - t0)
+        sync_writes += not write_behind
+    accounts.flush_saves()
+
+    assert accounts.storage.load_save(1)["characters"] == session.char_list, "save on disk is not the final state"
+
+    latencies.sort()
+    writes = sync_writes + accounts.save_writer.stats["writes"] - writes_before
+    return sum(latencies) / len(latencies), latencies[int(len(latencies) * 0.99)], writes
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=300)
+    ap.add_argument("--chars", type=int, default=6)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        accounts.storage = JsonStorage(os.path.join(tmp, "Accounts.json"), tmp)
+        for name, write_behind in (("sync        ", False), ("write-behind", True)):
+            mean, p99, writes = run(args.calls, args.chars, write_behind)
+            print(f"{name} handler mean={mean * 1e6:8.1f} us  p99={p99 * 1e6:8.1f} us  file writes={writes:4d}"
+                  f"   ({args.calls} saves, {args.chars} characters)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+TaskScheduler on the timing wheel vs the previous heap (timing_wheel.py).
+
+Run from the server folder :
+    python -m benchmarks.bench_scheduler [--timers 1000000] [--cancel 100000] [--reschedule 100000] [--hours 2]
+
+--timers timers are scheduled over the next 30 days (a few seconds up to
+days, like forge / building / research timers), then --cancel are cancelled
+and --reschedule moved (speed-ups), and the clock is driven one second at a
+time for --hours hours running what comes due. The scheduler thread and
+workers are not started, the benchmark calls run_due itself.
+
+Each queue runs in its own process (the second run in a process pays for the
+memory the first one left behind). Reports the time per operation and checks
+both queues run the same timers.
+"""
+import argparse
+import hashlib
+import random
+import subprocess
+import sys
+import time
+
+from scheduler import TaskScheduler
+from timing_wheel import TimingWheel, TimerHeap
+
+NOW = 1_760_000_000
+
+
+def make_plan(args, seed=1):
+    rng = random.Random(seed)
+    run_at = [NOW + int(rng.expovariate(1 / 86400)) % (30 * 86400) + 1 for _ in range(args.timers)]
+    cancel = rng.sample(range(args.timers), args.cancel)
+    reschedule = [(i, NOW + rng.randint(1, 4 * 3600)) for i in rng.sample(range(args.timers), args.reschedule)]
+    return run_at, cancel, reschedule
+
+
+def run(args, plan, queue):
+    run_at, cancel, reschedule = plan
+    sched = TaskScheduler(queue=queue, start=False, workers=0)
+    fired = []
+    results = {}
+
+    t0 = time.perf_counter()
+    handles = [sched.schedule(ts, lambda i=i: fired.append(i), owner=i % 50000)
+               for i, ts in enumerate(run_at)]
+    results["schedule"] = (time.perf_counter() - t0) / len(run_at)
+
+    t0 = time.perf_counter()
+    for i in cancel:
+        sched.cancel(handles[i])
+    results["cancel"] = (time.perf_counter() - t0) / max(1, len(cancel))
+
+    t0 = time.perf_counter()
+    for i, ts in reschedule:
+        sched.reschedule(handles[i], ts)
+    results["reschedule"] = (time.perf_counter() - t0) / max(1, len(reschedule))
+
+    t0 = time.perf_counter()
+    for now in range(NOW, NOW + args.hours * 3600 + 1):
+        sched.run_due(now)
+    results["run 1 s"] = (time.perf_counter() - t0) / (args.hours * 3600 + 1)
+    return results, sorted(fired), sched.pending()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--timers", type=int, default=1_000_000)
+    ap.add_argument("--cancel", type=int, default=100_000)
+    ap.add_argument("--reschedule", type=int, default=100_000)
+    ap.add_argument("--hours", type=int, default=2)
+    ap.add_argument("--queue", choices=["heap", "wheel"], help="run a single queue (used by the parent run)")
+    args = ap.parse_args()
+
+    if args.queue:
+        queue = TimerHeap() if args.queue == "heap" else TimingWheel(NOW)
+        results, fired, pending = run(args, make_plan(args), queue)
+        line = "  ".join(f"{op}={sec * 1e6:7.2f} us" for op, sec in results.items())
+        print(f"{args.queue:5} {line}   fired={len(fired)} pending={pending}  ({args.timers} timers)")
+        print(hashlib.sha1(repr(fired).encode()).hexdigest())
+        return
+
+    digests = []
+    for queue in ("heap", "wheel"):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_scheduler", "--queue", queue] + sys.argv[1:],
+                             check=True, capture_output=True, text=True).stdout.splitlines()
+        # the last two lines, the scheduler may log before them (callbacks started late)
+        print(out[-2])
+        digests.append(out[-1])
+    assert digests[0] == digests[1], "heap and wheel ran different timers"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+Generated schema codecs vs the hand-written BitReader / BitBuffer code.
+
+Run from the server folder :
+    python -m benchmarks.bench_schema [--packets 20000]
+
+Decode : 0x07 movement, 0x09 power cast and 0x08 full update, schema decoder vs
+the read sequences the handlers used before packet_schema.
+Encode : 0x0F entity spawn, ENTITY_SPAWN encoder vs the old Send_Entity_Data
+(player + every world_npcs entity).
+
+Both sides are checked for identical results first.
+"""
+import argparse
+import glob
+import json
+import time
+from typing import Dict, Any
+
+import entity
+from BitBuffer import BitBuffer
+from bitreader import BitReader
+from constants import Entity, PowerType, class_7, class_20, class_3, Game, LinkUpdater, EntType, GearType, class_64, \
+    class_21, class_118, method_277, load_class_template
+from packet_schema import ENTITY_INCREMENTAL_UPDATE, ENTITY_FULL_UPDATE, POWER_CAST
+
+
+#### hand-written references ####
+
+def parse_0x07_handwritten(payload):
+    br = BitReader(payload)
+    entity_id = br.read_method_4()
+    delta_x = br.read_method_45()
+    delta_y = br.read_method_45()
+    delta_vx = br.read_method_45()
+    ent_state = br.read_method_6(Entity.const_316)
+    flags = [bool(br.read_method_15()) for _ in range(5)]
+    is_airborne = bool(br.read_method_15())
+    velocity_y = br.read_method_24() if is_airborne else 0
+    return [entity_id, delta_x, delta_y, delta_vx, ent_state, *flags, velocity_y]
+
+
+def parse_0x09_handwritten(payload):
+    br = BitReader(payload)
+    out = [br.read_method_9(), br.read_method_9(), br.read_method_15()]
+    if br.read_method_15():
+        out += [br.read_method_24(), br.read_method_24()]
+    if br.read_method_15():
+        out.append(br.read_method_9())
+    out.append(br.read_method_15())
+    if br.read_method_15():
+        out.append(br.read_method_15())
+        out.append(br.read_method_9())
+    if br.read_method_15():
+        if br.read_method_15():
+            out.append(br.read_method_9())
+        if br.read_method_15():
+            out.append(br.read_method_6(PowerType.const_423))
+    return out
+
+
+def parse_0x08_handwritten(payload):
+    br = BitReader(payload)
+    out = [br.read_method_9(), br.read_method_24(), br.read_method_24(), br.read_method_24(),
+           br.read_method_26(), br.read_method_20(Entity.TEAM_BITS), bool(br.read_method_15()), br.read_method_706()]
+    if br.read_method_15():
+        for _ in range(3):
+            if br.read_method_15():
+                out.append(br.read_method_13())
+    out.append(br.read_method_9() if br.read_method_15() else None)
+    out.append(br.read_method_9() if br.read_method_15() else None)
+    out.append(br.read_method_20(Entity.const_316))
+    out.extend(bool(br.read_method_15()) for _ in range(5))
+    return out
+
+
+def send_entity_data_handwritten(entity: Dict[str, Any]) -> bytes:
+    """entity.Send_Entity_Data before packet_schema, verbatim."""
+    bb = BitBuffer()
+    bb.write_method_4(entity['id'])
+    bb.write_method_13(entity['name'])
+    if entity.get("is_player", False):
+        bb.write_method_6(1, 1)
+        bb.write_method_13(entity.get("class", ""))
+        bb.write_method_13(entity.get("gender", ""))
+        bb.write_method_13(entity.get("headSet", ""))
+        bb.write_method_13(entity.get("hairSet", ""))
+        bb.write_method_13(entity.get("mouthSet", ""))
+        bb.write_method_13(entity.get("faceSet", ""))
+        bb.write_method_6(entity.get("hairColor", 0), 24)
+        bb.write_method_6(entity.get("skinColor", 0), 24)
+        bb.write_method_6(entity.get("shirtColor", 0), 24)
+        bb.write_method_6(entity.get("pantColor", 0), 24)
+        equipped = entity.get('equippedGears', [])
+        for slot in range(1, EntType.MAX_SLOTS):
+            idx = slot - 1
+            if idx < len(equipped) and equipped[idx] is not None:
+                gear = equipped[idx]
+                bb.write_method_6(1, 1)
+                bb.write_method_6(gear['gearID'], GearType.GEARTYPE_BITSTOSEND)
+                bb.write_method_6(gear['tier'], GearType.const_176)
+                runes = gear.get('runes', [0, 0, 0])
+                bb.write_method_6(runes[0], class_64.const_101)
+                bb.write_method_6(runes[1], class_64.const_101)
+                bb.write_method_6(runes[2], class_64.const_101)
+                colors = gear.get('colors', [0, 0])
+                bb.write_method_6(colors[0], class_21.const_50)
+                bb.write_method_6(colors[1], class_21.const_50)
+            else:
+                bb.write_method_6(0, 1)
+    else:
+        bb.write_method_6(0, 1)
+
+    bb.write_method_45(int(entity['x']))  # x
+    bb.write_method_45(int(entity['y']))  # y
+    bb.write_method_45(int(entity.get('v', 0)))  # Velocity
+
+    bb.write_method_6(entity.get('team', 0), Entity.TEAM_BITS)
+
+    # ── Player OR NPC branch ──
+    if entity.get("is_player", False):
+        bb.write_method_6(1, 1)
+
+        timing_flag = entity.get("idle_reset", False)
+        bb.write_method_6(1 if timing_flag else 0, 1)
+
+        appearance_flag = entity.get("spawn_fx", False)  # True for new player  spawns if the player is already in the level then it is False
+        bb.write_method_6(1 if appearance_flag else 0, 1)
+
+        active_pet = entity.get("activePet", {})
+        bb.write_method_6(active_pet.get("petID",      0), class_7.const_19)
+        bb.write_method_6(active_pet.get("special_id", 0), class_7.const_75)
+        bb.write_method_6(entity.get("equippedMount",  0), class_20.const_297)
+        bb.write_method_6(entity.get("activeConsumableID",        0), class_3.const_69)
+
+        abilities = entity.get("abilities", [])
+        has_abilities = len(abilities) > 0
+        bb.write_method_6(1 if has_abilities else 0, 1)
+        if has_abilities:
+            for i in range(3):
+                ability = abilities[i] if i < len(abilities) and abilities[i] is not None else {"abilityID": 0, "rank": 0}
+                bb.write_method_6(ability.get("abilityID", 0), class_7.const_19)
+                bb.write_method_6(ability.get("rank", 0), class_7.const_75)
+    else:
+        bb.write_method_6(0, 1)
+        bb.write_method_6(1 if entity.get("untargetable", False) else 0, 1)
+        bb.write_method_739(entity.get("render_depth_offset", 0))
+
+        # used to set the current entity's moving speed if he has any
+        speed = entity.get("behavior_speed", 0)
+        if speed > 0:
+            bb.write_method_6(1, 1)
+            bb.write_method_4(int(speed * LinkUpdater.VELOCITY_INFLATE))
+        else:
+            bb.write_method_6(0, 1)
+
+    cue = entity.get("cue_data", {})
+    for key in ("character_name", "DramaAnim", "SleepAnim"):
+        val = cue.get(key, "")
+        bb.write_method_6(1 if val else 0, 1)
+        if val:
+            bb.write_method_13(val)
+
+    summoner_id = entity.get("summonerId", 0)
+    if summoner_id:
+        bb.write_method_6(1, 1)
+        bb.write_method_4(summoner_id)
+    else:
+        bb.write_method_6(0, 1)
+
+    power_id = entity.get("power_id", 0)
+
+    if power_id > 0:
+        bb.write_method_6(1, 1)
+        bb.write_method_4(power_id)
+    else:
+        bb.write_method_6(0, 1)
+
+    bb.write_method_6(entity.get("entState", 0), Entity.const_316)
+    bb.write_method_6(1 if entity.get("facing_left", False) else 0, 1)
+    if entity.get('is_player', False):
+
+        level = entity.get("level", 0)
+        bb.write_method_6(level, Entity.MAX_CHAR_LEVEL_BITS)
+
+        class_id = entity.get("MasterClass", Game.const_526)
+        bb.write_method_6(class_id, Game.const_209)
+
+        # Talent data is ONLY allowed if a MasterClass has been equipped
+        has_talent_tree = (
+                class_id != Game.const_526 and
+                any(
+                    t and t.get("nodeID", 0) > 0 and t.get("points", 0) > 0
+                    for t in entity.get("talents", [])
+                )
+        )
+
+        bb.write_method_6(1 if has_talent_tree else 0, 1)
+
+        if has_talent_tree:
+            for slot in range(class_118.NUM_TALENT_SLOTS):  # ALWAYS 27
+                t = entity["talents"][slot] if slot < len(entity["talents"]) else None
+
+                if t and t.get("nodeID", 0) > 0 and t.get("points", 0) > 0:
+                    bb.write_method_6(1, 1)
+                    bb.write_method_6(t["nodeID"], class_118.const_127)
+                    bb.write_method_6(t["points"] - 1, method_277(slot))
+                else:
+                    bb.write_method_6(0, 1)
+
+
+    else:
+        bb.write_method_6(0, 1)
+
+    # updates the entity's Health if that specific entity has lost any amount of health
+    value = int(round(entity.get("health_delta", 0)))
+    bb.write_method_45(value)
+
+    # Updates the entities buffs if he has any
+    buffs = entity.get("buffs", [])
+    bb.write_method_4(len(buffs))
+    for buff in buffs:
+        bb.write_method_4(buff.get("type_id", 0))
+        bb.write_method_4(buff.get("param1", 0))
+        bb.write_method_4(buff.get("param2", 0))
+        bb.write_method_4(buff.get("param3", 0))
+        bb.write_method_4(buff.get("param4", 0))
+        extra = buff.get("extra_data", [])
+        bb.write_method_6(1 if extra else 0, 1)
+        if extra:
+            bb.write_method_4(len(extra))
+            for ed in extra:
+                bb.write_method_4(ed.get("id", 0))
+                vals = ed.get("values", [])
+                bb.write_method_4(len(vals))
+                for v in vals:
+                    bb.write_float(v)
+    return bb.to_bytes()
+
+
+#### schema side, flattened the same way for the equality check ####
+
+def parse_0x07_schema(payload):
+    f = ENTITY_INCREMENTAL_UPDATE.decode(payload)
+    return [f["entity_id"], f["delta_x"], f["delta_y"], f["delta_vx"], f["ent_state"], f["b_left"], f["b_running"],
+            f["b_jumping"], f["b_dropping"], f["b_backpedal"], f["velocity_y"] or 0]
+
+
+def parse_0x09_schema(payload):
+    f = POWER_CAST.decode(payload)
+    out = [f["ent_id"], f["power_id"], f["has_target_entity"]]
+    if f["target_pos"]:
+        out += [f["target_pos"]["x"], f["target_pos"]["y"]]
+    if f["projectile_id"] is not None:
+        out.append(f["projectile_id"])
+    out.append(f["is_charged"])
+    if f["extra"]:
+        out.append(f["extra"]["is_secondary"])
+        out.append(f["extra"].get("secondary_id", f["extra"].get("tertiary_id")))
+    if f["flags"]:
+        for key in ("cooldown_tick", "mana_cost"):
+            if f["flags"][key] is not None:
+                out.append(f["flags"][key])
+    return out
+
+
+def parse_0x08_schema(payload):
+    f = ENTITY_FULL_UPDATE.decode(payload)
+    out = [f["entity_id"], f["pos_x"], f["pos_y"], f["velocity_x"], f["ent_name"], f["team"], f["is_player"], f["y_offset"]]
+    if f["cue_data"]:
+        out.extend(v for v in f["cue_data"].values() if v is not None)
+    out += [f["summoner_id"], f["power_id"], f["ent_state"], f["b_left"], f["b_running"], f["b_jumping"],
+            f["b_dropping"], f["b_backpedal"]]
+    return out
+
+
+#### sample packets ####
+
+def build_samples():
+    bb = BitBuffer()
+    bb.write_method_4(12345)
+    for v in (-37, 4, 0):
+        bb.write_method_45(v)
+    bb.write_method_6(3, Entity.const_316)
+    for flag in (True, True, False, False, False, True):
+        bb.write_method_15(flag)
+    bb.write_method_24(-250)
+    movement = bb.to_bytes()
+
+    bb = BitBuffer()
+    bb.write_method_9(12345)
+    bb.write_method_9(87)
+    bb.write_method_15(False)
+    bb.write_method_15(True)
+    bb.write_method_24(1500)
+    bb.write_method_24(-320)
+    bb.write_method_15(True)
+    bb.write_method_9(42)
+    bb.write_method_15(True)
+    bb.write_method_15(True)
+    bb.write_method_15(False)
+    bb.write_method_9(3)
+    bb.write_method_15(True)
+    bb.write_method_15(True)
+    bb.write_method_9(900)
+    bb.write_method_15(True)
+    bb.write_method_6(25, PowerType.const_423)
+    power = bb.to_bytes()
+
+    bb = BitBuffer()
+    bb.write_method_9(12345)
+    for v in (14809, 2139, -3):
+        bb.write_method_24(v)
+    bb.write_method_26("BanditRogue2")
+    bb.write_method_6(2, Entity.TEAM_BITS)
+    bb.write_method_15(False)
+    bb.write_method_739(-37)
+    bb.write_method_15(True)
+    for text in ("Bandit", "", "Sleep"):
+        bb.write_method_15(bool(text))
+        if text:
+            bb.write_method_13(text)
+    bb.write_method_15(True)
+    bb.write_method_9(777)
+    bb.write_method_15(False)
+    bb.write_method_6(1, Entity.const_316)
+    for flag in (True, False, False, False, False):
+        bb.write_method_15(flag)
+    full = bb.to_bytes()
+    return movement, power, full
+
+
+def load_entities():
+    ents = []
+    for path in sorted(glob.glob("world_npcs/*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            ents.extend(json.load(f))
+    for cls in ("paladin", "mage", "rogue"):
+        ents.append(entity.build_entity_dict(5, load_class_template(cls), {"pos_x": 1200, "pos_y": 340}))
+    return ents
+
+
+def rate(fn, arg, count):
+    t0 = time.perf_counter()
+    for _ in range(count):
+        fn(arg)
+    return count / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--packets", type=int, default=20000)
+    args = ap.parse_args()
+
+    movement, power, full = build_samples()
+    # handlers get a memoryview of the packet from the framer
+    cases = (
+        ("0x07 movement decode", parse_0x07_handwritten, parse_0x07_schema, memoryview(movement)),
+        ("0x09 power decode   ", parse_0x09_handwritten, parse_0x09_schema, memoryview(power)),
+        ("0x08 full decode    ", parse_0x08_handwritten, parse_0x08_schema, memoryview(full)),
+    )
+    for name, old, new, payload in cases:
+        assert old(payload) == new(payload), name
+        a, b = rate(old, payload, args.packets), rate(new, payload, args.packets)
+        print(f"{name} ({len(payload):3d} bytes)  hand-written={a:9.0f}/s  schema={b:9.0f}/s  x{b / a:.1f}")
+
+    ents = load_entities()
+    for e in ents:
+        assert send_entity_data_handwritten(e) == entity.Send_Entity_Data(e), e.get("name")
+    rounds = max(1, args.packets // len(ents))
+    a = rate(lambda es: [send_entity_data_handwritten(e) for e in es], ents, rounds) * len(ents)
+    b = rate(lambda es: [entity.Send_Entity_Data(e) for e in es], ents, rounds) * len(ents)
+    print(f"0x0F spawn encode    ({len(ents)} entities)  hand-written={a:9.0f}/s  schema={b:9.0f}/s  x{b / a:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+JSON files vs SQLite storage backend (storage.py), behind accounts.AccountIndex.
+
+Run from the server folder :
+    python -m benchmarks.bench_storage [--accounts 10000,100000] [--logins 50] [--saves 50] [--creates 20]
+
+For each account count a json layout is generated in a temporary folder
+(Accounts.json with every account, a save file with one class template
+character for --logins of them), then imported into SQLite with migrate_from.
+Each backend is then timed on :
+
+  index  : loading the account index (once at boot)
+  login  : find_user_id(email) + load_characters(user_id), what 0x14 does
+  save   : write_save of a one character list (the SaveWriter write)
+  create : get_or_create_user_id for a new email, what 0x13 does
+
+"reload" is the json layout used the way it was before the account index :
+Accounts.json parsed for every login and rewritten for every new account.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import accounts
+from constants import load_class_template
+from storage import JsonStorage, SqliteStorage
+
+
+def populate(tmp, count, with_saves):
+    store = JsonStorage(os.path.join(tmp, "Accounts.json"), os.path.join(tmp, "saves"))
+    store.save_accounts_index({f"player{uid}@bench.local": uid for uid in range(1, count + 1)})
+    char = load_class_template("paladin")
+    for uid in with_saves:
+        char["name"] = f"Bench{uid}"
+        store.write_save(uid, [char])
+    return store
+
+
+def per_second(count, fn):
+    t0 = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    elapsed = time.perf_counter() - t0
+    return count / elapsed, elapsed / count
+
+
+def run(store, users, args):
+    accounts.storage = store
+    accounts.account_index = accounts.AccountIndex()
+    accounts.SAVE_WRITE_BEHIND = False
+    char = load_class_template("mage")
+    results = {}
+    results["index"] = per_second(1, lambda i: accounts.load_account_index())
+    first_id = accounts.account_index._next_id
+    results["login"] = per_second(len(users), lambda i: accounts.load_characters(
+        accounts.find_user_id(f"player{users[i]}@bench.local")))
+    results["save"] = per_second(args.saves, lambda i: store.write_save(users[i % len(users)], [dict(char, name=f"Saved{i}")]))
+    results["create"] = per_second(args.creates, lambda i: accounts.get_or_create_user_id(f"new{i}@bench.local"))
+    assert accounts.find_user_id(f"new{args.creates - 1}@bench.local") == first_id + args.creates - 1
+    # reopened from disk : the appended accounts are there
+    accounts.account_index = accounts.AccountIndex()
+    assert accounts.find_user_id(f"new{args.creates - 1}@bench.local") == first_id + args.creates - 1
+    return results
+
+
+def run_reload(store, users, args):
+    """Accounts.json parsed on every login, rewritten on every create (no account index)."""
+    results = {}
+    results["login"] = per_second(len(users), lambda i: store.load_save(
+        store.load_accounts()[f"player{users[i]}@bench.local"]))
+
+    def create(i):
+        index = store.load_accounts()
+        index[f"old{i}@bench.local"] = max(index.values()) + 1
+        store.save_accounts_index(index)
+    results["create"] = per_second(args.creates, create)
+    return results
+
+
+def report(accounts_count, name, results):
+    line = "  ".join(f"{op}={rate:8.0f}/s ({mean * 1e3:7.2f} ms)" for op, (rate, mean) in results.items())
+    print(f"{accounts_count:7d} accounts  {name}  {line}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--accounts", default="10000,100000")
+    ap.add_argument("--logins", type=int, default=50)
+    ap.add_argument("--saves", type=int, default=50)
+    ap.add_argument("--creates", type=int, default=20)
+    args = ap.parse_args()
+
+    for accounts_count in [int(n) for n in args.accounts.split(",")]:
+        users = random.Random(1).sample(range(1, accounts_count + 1), min(args.logins, accounts_count))
+        with tempfile.TemporaryDirectory() as tmp:
+            json_store = populate(tmp, accounts_count, users)
+            t0 = time.perf_counter()
+            db = SqliteStorage(os.path.join(tmp, "bench.db"))
+            db.migrate_from(json_store)
+            migrate = time.perf_counter() - t0
+            assert db.load_save(users[0]) == json_store.load_save(users[0])
+
+            report(accounts_count, "reload", run_reload(json_store, users, args))
+            for name, store in (("json  ", json_store), ("sqlite", db)):
+                report(accounts_count, name, run(store, users, args))
+            print(f"{accounts_count:7d} accounts  migration to sqlite {migrate:.2f} s"
+                  f"  ({os.path.getsize(os.path.join(tmp, 'Accounts.json'))} byte Accounts.json)")
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
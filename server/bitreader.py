@@ -1,21 +1,43 @@
 import struct
 from typing import List
 
+from codec_trace import build_tracing_class
+
+
 class BitReader:
+    """
+    MSB-first bit reader.
+
+    Reads straight from a memoryview of the packet (no copy), every read_method_20
+    pulls the bytes it spans in one int.from_bytes() window. Byte aligned strings
+    are sliced out directly.
+
+    Note : handlers get a view into the receive buffer (see framing.py), so a
+    BitReader must not outlive the handler call.
+
+    BitReader(data, debug=True) returns a tracing reader instead (see codec_trace.py),
+    it records (bit_offset, bit_width, method, value) for every read.
+    """
+    debug = False
+    debug_log = None
+
+    def __new__(cls, data: bytes, debug: bool = False):
+        if debug and cls is BitReader:
+            cls = TracingBitReader
+        return super().__new__(cls)
+
     def __init__(self, data: bytes, debug: bool = False):
-        self.data = bytearray(data)
+        self.data = memoryview(data)
+        self._nbits = len(self.data) * 8
         self.bit_index = 0
-        self.debug = debug
-        self.debug_log: List[str] = [] if debug else []
 
     def align_to_byte(self):
         remainder = self.bit_index % 8
         if remainder:
             skip_bits = 8 - remainder
-            for _ in range(skip_bits):
-                self.read_bit()
-            if self.debug:
-                self.debug_log.append(f"align_to_byte=skipped {skip_bits} bits")
+            if self.bit_index + skip_bits > self._nbits:
+                raise ValueError("Not enough data to read bit")
+            self.bit_index += skip_bits
 
     def remaining_bits(self) -> int:
         """
@@ -23,52 +45,54 @@ class BitReader:
         The Flash client does not expose an equivalent method; it always knows
         how many bits to read based on the packet type.
         """
-        total_bits = len(self.data) * 8
-        return max(0, total_bits - self.bit_index)
+        return max(0, self._nbits - self.bit_index)
 
     def read_bit(self) -> int:
-        byte_index = self.bit_index // 8
-        bit_offset = self.bit_index & 7
-        if byte_index >= len(self.data):
+        index = self.bit_index
+        if index >= self._nbits:
             raise ValueError("Not enough data to read bit")
-        bit = (self.data[byte_index] >> (7 - bit_offset)) & 1
+        bit = (self.data[index >> 3] >> (7 - (index & 7))) & 1
         self.bit_index += 1
-        if self.debug:
-            self.debug_log.append(f"read_bit={bit} at bit_index={self.bit_index-1}")
         return bit
 
     def read_method_15(self) -> bool:
         """Read a single boolean (1 bit) from the bitstream, matching client method_15."""
         bit = self.read_bit()
-        if self.debug:
-            self.debug_log.append(f"method_15={bool(bit)}")
         return bool(bit)
 
     def read_method_20(self, bit_count: int) -> int:
         """Read bit_count bits across byte boundaries, MSB-first."""
-        val = 0
-        while bit_count > 0:
-            byte_index = self.bit_index // 8
-            bit_offset = self.bit_index & 7
-            bits_left_in_byte = 8 - bit_offset
-            bits_to_read = min(bit_count, bits_left_in_byte)
-
-            mask = (1 << bits_to_read) - 1
-            shift = bits_left_in_byte - bits_to_read
-            current_byte = self.data[byte_index]
-            extracted = (current_byte >> shift) & mask
-
-            val = (val << bits_to_read) | extracted
-            self.bit_index += bits_to_read
-            bit_count -= bits_to_read
-
-            if self.debug:
-                self.debug_log.append(
-                    f"read_method_20: byte_index={byte_index}, bit_offset={bit_offset}, "
-                    f"bits_to_read={bits_to_read}, extracted={extracted}, val={val}"
-                )
+        if bit_count <= 0:
+            return 0
+        start = self.bit_index
+        end = start + bit_count
+        if end > self._nbits:
+            raise ValueError(f"Not enough data to read {bit_count} bits")
+        data = self.data
+        first = start >> 3
+        last = (end + 7) >> 3
+        span = last - first
+        # most fields span one or two bytes, skip the slice for those
+        if span == 1:
+            window = data[first]
+        elif span == 2:
+            window = (data[first] << 8) | data[first + 1]
+        else:
+            window = int.from_bytes(data[first:last], "big")
+        val = (window >> ((last << 3) - end)) & ((1 << bit_count) - 1)
+        self.bit_index = end
+
         return val
 
+    def _read_bytes(self, length: int) -> bytes:
+        if self.bit_index + length * 8 > self._nbits:
+            raise ValueError("Not enough data to read string")
+        if self.bit_index & 7:
+            return self.read_method_20(length * 8).to_bytes(length, "big")
+        start = self.bit_index >> 3
+        self.bit_index += length * 8
+        return bytes(self.data[start:start + length])
+
     def read_method_739(self) -> int:
         sign = self.read_bit()
         prefix = self.read_method_20(3)
@@ -79,16 +103,14 @@ class BitReader:
     def read_method_4(self) -> int:
         prefix = self.read_method_20(4)
         bits_to_use = (prefix + 1) * 2
-        if self.bit_index + bits_to_use > len(self.data) * 8:
+        if self.bit_index + bits_to_use > self._nbits:
             raise ValueError(f"Not enough data to read {bits_to_use} bits for method_4")
         value = self.read_method_20(bits_to_use)
-        if self.debug:
-            self.debug_log.append(f"read_method_4={value}, prefix={prefix}, bits={bits_to_use}")
         return value
 
     def read_method_26(self) -> str:
         length = self.read_method_20(16)
-        raw = bytearray(self.read_method_20(8) for _ in range(length))
+        raw = self._read_bytes(length)
         try:
             return raw.decode('utf-8')
         except UnicodeDecodeError:
@@ -102,69 +124,53 @@ class BitReader:
         return -value if is_negative else value
 
     def read_method_6(self, bit_count: int) -> int:
-        if self.bit_index + bit_count > len(self.data) * 8:
+        if self.bit_index + bit_count > self._nbits:
             raise ValueError(f"Not enough data to read {bit_count} bits for method_6")
         value = self.read_method_20(bit_count)
-        if self.debug:
-            self.debug_log.append(f"read_method_6={value}, bits={bit_count}")
         return value
 
     def read_method_9(self) -> int:
         prefix = self.read_method_20(4)
         n_bits = (prefix + 1) * 2
-        if self.bit_index + n_bits > len(self.data) * 8:
+        if self.bit_index + n_bits > self._nbits:
             raise ValueError(f"Not enough data to read {n_bits} bits for method_9")
         value = self.read_method_20(n_bits)
-        if self.debug:
-            self.debug_log.append(f"read_method_9={value}, prefix={prefix}, bits={n_bits}")
         return value
 
     def read_method_45(self) -> int:
         sign = self.read_bit()
-        if self.bit_index + 4 > len(self.data) * 8:
+        if self.bit_index + 4 > self._nbits:
             raise ValueError("Not enough data to read method_4 prefix for method_45")
         magnitude = self.read_method_4()
         value = -magnitude if sign else magnitude
-        if self.debug:
-            self.debug_log.append(f"read_method_45={value}, sign={sign}, magnitude={magnitude}")
         return value
 
     def read_method_393(self) -> int:
         value = self.read_method_20(8)
-        if self.debug:
-            self.debug_log.append(f"read_method_393={value}")
         return value
 
     def read_method_560(self) -> float:
-        if self.bit_index + 32 > len(self.data) * 8:
+        if self.bit_index + 32 > self._nbits:
             raise ValueError("Not enough data to read float")
         bits = self.read_method_20(32)
         bytes_val = struct.pack('>I', bits)
         float_val = struct.unpack('>f', bytes_val)[0]
-        if self.debug:
-            self.debug_log.append(f"read_method_560={float_val}")
         return float_val
 
     def read_method_13(self) -> str:
         length = self.read_method_20(16)
-        if self.bit_index + length * 8 > len(self.data) * 8:
-            raise ValueError("Not enough data to read string")
-        result_bytes = bytearray()
-        for _ in range(length):
-            result_bytes.append(self.read_method_20(8))
+        result_bytes = self._read_bytes(length)
         try:
             return result_bytes.decode('utf-8')
         except UnicodeDecodeError:
             return result_bytes.decode('latin1')
 
     def read_method_24(self) -> int:
-        if self.bit_index + 1 > len(self.data) * 8:
+        if self.bit_index + 1 > self._nbits:
             raise ValueError("Not enough data to read sign bit for method_24")
         sign = self.read_bit()
         magnitude = self.read_method_9()
         value = -magnitude if sign else magnitude
-        if self.debug:
-            self.debug_log.append(f"read_method_24={value}, sign={sign}, magnitude={magnitude}")
         return value
 
     def read_method_309(self) -> float:
@@ -179,10 +185,15 @@ class BitReader:
         prefix = self.read_method_20(3)
         bits_to_use = (prefix + 1) * 2
 
-        if self.bit_index + bits_to_use > len(self.data) * 8:
+        if self.bit_index + bits_to_use > self._nbits:
             raise ValueError("Not enough data to read method_236 value")
 
         return self.read_method_20(bits_to_use)
 
-    def get_debug_log(self) -> List[str]:
-        return self.debug_log
\ No newline at end of file
+    def get_debug_log(self) -> List[tuple]:
+        return self.debug_log if self.debug else []
+
+
+TracingBitReader = build_tracing_class(
+    BitReader, lambda br: br.bit_index, extra_methods=("align_to_byte",)
+)
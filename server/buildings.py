@@ -4,7 +4,7 @@ from accounts import save_characters
 from bitreader import BitReader
 from constants import find_building_data
 from globals import send_premium_purchase, send_building_complete_packet
-from scheduler import schedule_building_upgrade
+from scheduler import schedule_building_upgrade, cancel_timer
 
 """
 "stats_by_building": {
@@ -29,7 +29,7 @@ from scheduler import schedule_building_upgrade
 """
 
 def handle_building_upgrade(session, data):
-    br = BitReader(data[4:], debug=True)
+    br = BitReader(data[4:])
     building_id = br.read_method_20(5)
     target_rank = br.read_method_20(5)
     used_idols = bool(br.read_method_15())
@@ -72,7 +72,7 @@ def handle_building_upgrade(session, data):
     schedule_building_upgrade(session.user_id, session.current_character, ready_time)
 
 def handle_building_speed_up_request(session, data):
-    br = BitReader(data[4:], debug=True)
+    br = BitReader(data[4:])
     idol_cost = br.read_method_9()
     char = next((c for c in session.char_list if c["name"] == session.current_character), None)
 
@@ -88,6 +88,7 @@ def handle_building_speed_up_request(session, data):
         save_characters(session.user_id, session.char_list)
         return
 
+    cancel_timer(session.user_id, session.current_character, "building")
     stats = char.setdefault("magicForge", {}).setdefault("stats_by_building", {})
     stats[str(building_id)] = new_rank
     char["buildingUpgrade"] = {"buildingID": 0, "rank": 0, "ReadyTime": 0}
@@ -106,6 +107,7 @@ def handle_cancel_building_upgrade(session, data):
     upgrade = char.get("buildingUpgrade", {})
     building_id = upgrade.get("buildingID", 0)
 
+    cancel_timer(session.user_id, session.current_character, "building")
     char["buildingUpgrade"] = {"buildingID": 0, "rank": 0, "ReadyTime": 0}
     save_characters(session.user_id, session.char_list)
 
@@ -0,0 +1,102 @@
+"""
+One in-memory character list per user, shared by the client handlers and the
+scheduler callbacks.
+
+Sessions get their char_list from attach() (login, character select, level
+transfer) and give it back with detach() (disconnect), so every session of a
+user and every timer completion work on the same list and the same character
+dicts. A timer firing for an online player changes the session's own data,
+saves it through save_characters (write-behind) and touches no disk.
+
+Users without a session are loaded on first use (a timer for an offline
+player) and kept in a small LRU, evicted past CHAR_REPO_OFFLINE_CACHE. An
+evicted list that was not written yet is still pending in accounts.save_writer,
+load_characters gives it back from there.
+"""
+
+import threading
+from collections import OrderedDict
+
+from accounts import load_characters, save_characters
+
+CHAR_REPO_OFFLINE_CACHE = 256   # lists kept for users without a session
+
+
+class CharacterRepository:
+    def __init__(self, offline_cache=CHAR_REPO_OFFLINE_CACHE):
+        self._lists = {}                # str(user_id) -> char_list of users with a session
+        self._sessions = {}             # str(user_id) -> set of attached sessions
+        self._offline = OrderedDict()   # str(user_id) -> char_list, least recently used first
+        self._offline_cache = offline_cache
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        char_list = self._lists.get(key)
+        if char_list is None:
+            char_list = self._offline.get(key)
+            if char_list is not None:
+                self._offline.move_to_end(key)
+        return char_list
+
+    def get(self, user_id) -> list[dict]:
+        """The user's character list, loaded from storage when it is not in memory."""
+        key = str(user_id)
+        with self._lock:
+            char_list = self._cached(key)
+        if char_list is not None:
+            return char_list
+        loaded = load_characters(user_id)
+        with self._lock:
+            # another thread may have loaded it meanwhile, keep a single list
+            char_list = self._cached(key)
+            if char_list is None:
+                char_list = loaded
+                self._offline[key] = char_list
+                self._evict()
+            return char_list
+
+    def find(self, user_id, char_name: str) -> dict | None:
+        return next((c for c in self.get(user_id) if c.get("name") == char_name), None)
+
+    def save(self, user_id):
+        save_characters(user_id, self.get(user_id))
+
+    def attach(self, session) -> list[dict]:
+        """Register the session as holding its user's list and return the list (its char_list)."""
+        key = str(session.user_id)
+        char_list = self.get(session.user_id)
+        with self._lock:
+            cached = self._cached(key)
+            if cached is not None:
+                char_list = cached
+            self._offline.pop(key, None)
+            self._lists[key] = char_list
+            self._sessions.setdefault(key, set()).add(session)
+        return char_list
+
+    def detach(self, session):
+        """Session closed, the list moves to the offline cache once the user has no session left."""
+        key = str(session.user_id)
+        with self._lock:
+            sessions = self._sessions.get(key)
+            if not sessions or session not in sessions:
+                return
+            sessions.discard(session)
+            if sessions:
+                return
+            del self._sessions[key]
+            self._offline[key] = self._lists.pop(key)
+            self._evict()
+
+    def is_online(self, user_id) -> bool:
+        return str(user_id) in self._lists
+
+    def _evict(self):
+        while len(self._offline) > self._offline_cache:
+            self._offline.popitem(last=False)
+
+    def __len__(self):
+        return len(self._lists) + len(self._offline)
+
+
+char_repo = CharacterRepository()
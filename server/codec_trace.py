@@ -0,0 +1,61 @@
+"""
+Opt-in tracing for BitBuffer / BitReader.
+
+BitBuffer(debug=True) and BitReader(data, debug=True) return a tracing subclass
+built here. The plain classes carry no debug checks at all, so packets built or
+parsed in production pay nothing for it.
+
+A trace (obj.debug_log) is a list of compact tuples, one per top-level call :
+
+    (bit_offset, bit_width, method, value)
+
+Nested calls (write_method_45 -> write_method_4 -> write_method_11 ...) are folded
+into the outer one. For writers `value` is the value argument, for readers it is
+the value read.
+"""
+
+
+def build_tracing_class(base, position, value_arg=None, extra_methods=()):
+    """
+    base          : BitBuffer or BitReader
+    position      : function(obj) -> current bit offset
+    value_arg     : {method_name: index of the value argument} (default 0)
+    extra_methods : non write_/read_ methods to trace as well (to_bytes, align_to_byte ...)
+    """
+    value_arg = value_arg or {}
+
+    def wrap(name, inner):
+        index = value_arg.get(name, 0)
+        is_read = name.startswith("read")
+
+        def method(self, *args, **kwargs):
+            if self._trace_depth:
+                return inner(self, *args, **kwargs)
+            start = position(self)
+            self._trace_depth = 1
+            try:
+                result = inner(self, *args, **kwargs)
+            finally:
+                self._trace_depth = 0
+            if is_read:
+                value = result
+            elif len(args) > index:
+                value = args[index]
+            else:
+                value = next(iter(kwargs.values()), None)
+            self.debug_log.append((start, position(self) - start, name, value))
+            return result
+
+        method.__name__ = name
+        method.__doc__ = inner.__doc__
+        return method
+
+    def __init__(self, *args, **kwargs):
+        base.__init__(self, *args, **kwargs)
+        self.debug_log = []
+
+    attrs = {"__init__": __init__, "debug": True, "_trace_depth": 0}
+    for name in dir(base):
+        if name.startswith(("write_", "read_")) or name in extra_methods:
+            attrs[name] = wrap(name, getattr(base, name))
+    return type("Tracing" + base.__name__, (base,), attrs)
@@ -3,8 +3,11 @@ import struct
 from BitBuffer import BitBuffer
 from accounts import save_characters
 from bitreader import BitReader
-from constants import Entity, PowerType, GearType, class_64, class_1, EntType, class_21, Game
-from globals import send_consumable_update, build_change_offset_y_packet, GS
+from constants import Entity, GearType, class_64, class_1, EntType, class_21, Game
+from globals import send_consumable_update, build_change_offset_y_packet, GS, broadcast_to_level, \
+    index_session
+from interest import broadcast_to_interest, relay_to_interest, broadcast_entity_update
+from packet_schema import POWER_CAST, POWER_HIT, PROJECTILE_EXPLODE, ADD_BUFF, REMOVE_BUFF, BUFF_TICK_DOT
 
 
                 # Helpers
@@ -58,7 +61,7 @@ def build_gear_change_packet(entity_id: int, equipped_gears: list[dict]) -> byte
     payload = bb.to_bytes()
     return struct.pack(">HH", 0xAF, len(payload)) + payload
 
-def broadcast_gear_change(session, all_sessions):
+def broadcast_gear_change(session):
     char = session.current_char_dict
     if not char:
         return
@@ -67,21 +70,13 @@ def broadcast_gear_change(session, all_sessions):
     equipped = char.get("equippedGears", [])
 
     pkt = build_gear_change_packet(entity_id, equipped)
-
-    for other in all_sessions:
-        if (
-                other is not session
-                and other.player_spawned
-                and other.current_level == session.current_level
-        ):
-            other.conn.sendall(pkt)
+    broadcast_to_interest(session, pkt)
 
 def apply_and_broadcast_hp_delta(
     *,
     source_session,
     ent_id: int,
     delta: int,
-    all_sessions,
     source_name: str,
 ):
 
@@ -91,14 +86,7 @@ def apply_and_broadcast_hp_delta(
 
     payload = bb.to_bytes()
     pkt = struct.pack(">HH", 0x3A, len(payload)) + payload
-
-    for other in all_sessions:
-        if (
-            other is not source_session
-            and other.player_spawned
-            and other.current_level == source_session.current_level
-        ):
-            other.conn.sendall(pkt)
+    broadcast_to_level(source_session.current_level, pkt, exclude=source_session)
 
 
         # game client function handlers
@@ -115,35 +103,17 @@ def handle_entity_destroy(session, data):
     # If this was the client’s own entity, clear reference
     if session.clientEntID == entity_id:
         session.clientEntID = None
+        index_session(session)
 
     level_map = GS.level_entities.get(level)
     if level_map and entity_id in level_map:
         del level_map[entity_id]
         # print(f"[DESTROY] Entity {entity_id} removed from level {level}")
 
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == level
-        ):
-            other.conn.sendall(data)
+    broadcast_to_level(level, data, exclude=session)
 
 def handle_buff_tick_dot(session, data):
-    br = BitReader(data[4:])
-    target_id = br.read_method_9()
-    source_id = br.read_method_9()
-    power_type_id = br.read_method_9()
-    amount = br.read_method_24()
-
-    # Broadcast unchanged packet to other players in same level
-    for other in GS.all_sessions:
-        if (
-                other is not session
-                and other.player_spawned
-                and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_to_interest(session, data, BUFF_TICK_DOT)
 
 def handle_respawn_broadcast(session, data):
     br = BitReader(data[4:])
@@ -171,9 +141,7 @@ def handle_respawn_broadcast(session, data):
     payload = bb.to_bytes()
     pkt = struct.pack(">HH", 0x82, len(payload)) + payload
 
-    for other in GS.all_sessions:
-        if other is not session and other.player_spawned and other.current_level == session.current_level:
-            other.conn.sendall(pkt)
+    broadcast_entity_update(session, ent_id, pkt)
 
 def handle_request_respawn(session, data):
     br = BitReader(data[4:])
@@ -206,48 +174,10 @@ def handle_request_respawn(session, data):
     session.conn.sendall(struct.pack(">HH", 0x80, len(payload)) + payload)
 
 def handle_power_hit(session, data):
-    br = BitReader(data[4:])
-    target_entity_id = br.read_method_9()
-    source_entity_id = br.read_method_9()
-    damage_value     = br.read_method_24()
-    power_type_id    = br.read_method_9()
-
-    # Animation override
-    has_animation_override = br.read_method_15()
-    animation_override_id = br.read_method_9() if has_animation_override  else None
-
-    # Hit effect override (projectile/effect index)
-    has_effect_override = br.read_method_15()
-    effect_override_id = br.read_method_9() if has_effect_override else None
-
-    # Critical hit or special-flag
-    is_critical = br.read_method_15()
-
-    # Forward packet unchanged to other clients in same level
-    for other in GS.all_sessions:
-        if (
-                other is not session
-                and other.player_spawned
-                and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_to_interest(session, data, POWER_HIT)
 
 def handle_projectile_explode(session, data):
-    br = BitReader(data[4:])
-    entity_id      = br.read_method_9()
-    remote_missile = br.read_method_9()
-    coordinate_x   = br.read_method_24()
-    coordinate_y   = br.read_method_24()
-    is_crit        = br.read_method_15()
-
-    # Broadcast unchanged packet to all other players in same level
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_to_interest(session, data, PROJECTILE_EXPLODE)
 # TODO:
 #   Buffs are currently not stored or simulated server-side.
 #   The client fully handles buff logic, but it STILL depends on the
@@ -266,35 +196,7 @@ def handle_projectile_explode(session, data):
 #   In the future, server must store these values to correctly
 #   handle timed buff removal and expiration logic.
 def handle_add_buff(session, data):
-    br = BitReader(data[4:])
-    entity_id    = br.read_method_9()
-    caster_id    = br.read_method_9()
-    buff_type_id = br.read_method_9()
-    duration     = br.read_method_9()
-    stack_count  = br.read_method_9()
-    sequence_id  = br.read_method_9()
-    has_modifier_nodes = br.read_method_15()
-
-    if has_modifier_nodes:
-        node_count = br.read_method_9()
-
-        for _ in range(node_count):
-            power_node_type_id = br.read_method_9()
-            mod_value_count    = br.read_method_9()
-
-            mod_values = []
-            for _ in range(mod_value_count):
-                mod_value = br.read_method_560()
-                mod_values.append(mod_value)
-
-    # Broadcast unchanged packet to other clients in same level
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_to_interest(session, data, ADD_BUFF)
 
 """
 TODO:
@@ -310,83 +212,18 @@ TODO:
     so it can send timed buff removals correctly.
 """
 def handle_remove_buff(session, data):
-    br = BitReader(data[4:])
-    entity_id      = br.read_method_9()
-    buff_type_id   = br.read_method_9()
-    instance_id    = br.read_method_9()
-
-    # Broadcast packet unchanged to other players in the same level
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_to_interest(session, data, REMOVE_BUFF)
 
 def handle_change_max_speed(session, data):
     br = BitReader(data[4:])
     entity_id     = br.read_method_9()
     speed_mod_int = br.read_method_9()
-    for other in GS.all_sessions:
-        if (
-            other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    session.conn.sendall(data)  # the sender gets it back too
+    broadcast_entity_update(session, entity_id, data)
 
 
 def handle_power_cast(session, data):
-    br = BitReader(data[4:])
-
-    ent_id   = br.read_method_9()
-    power_id = br.read_method_9()
-
-    # Skip has-target-entity flag (unused by client)
-    has_target_entity = br.read_method_15()
-
-    # Target position if ranged/projectile attacks
-    has_target_pos = br.read_method_15()
-    if has_target_pos:
-        target_x = br.read_method_24()
-        target_y = br.read_method_24()
-
-    has_projectile = br.read_method_15()
-    if has_projectile:
-        projectile_id = br.read_method_9()
-
-    # Charged variant
-    is_charged = br.read_method_15()
-
-    # Combo / alternate variant
-    has_extra = br.read_method_15()
-    if has_extra:
-        is_secondary = br.read_method_15()
-        if is_secondary:
-            secondary_id = br.read_method_9()
-        else:
-            tertiary_id = br.read_method_9()
-
-    # Cooldown & mana flags
-    has_flags = br.read_method_15()
-    if has_flags:
-        has_cooldown_tick = br.read_method_15()
-        if has_cooldown_tick:
-            cooldown_tick = br.read_method_9()
-
-        has_mana_cost = br.read_method_15()
-        if has_mana_cost:
-            MANA_BITS = PowerType.const_423
-            mana_cost = br.read_method_6(MANA_BITS)
-
-    # Broadcast unchanged packet
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_to_interest(session, data, POWER_CAST)
 
 def handle_change_offset_y(session, data):
     br = BitReader(data[4:])
@@ -394,13 +231,7 @@ def handle_change_offset_y(session, data):
     offset_y  = br.read_method_739()
 
     pkt = build_change_offset_y_packet(entity_id, offset_y)
-
-    for s in GS.all_sessions:
-        if s is not session and s.player_spawned and s.current_level == session.current_level:
-            try:
-                s.conn.sendall(pkt)
-            except:
-                pass
+    broadcast_entity_update(session, entity_id, pkt)
 
 
 # Sent when equipment, runes, or stats change and HP
@@ -413,7 +244,6 @@ def handle_char_regen(session, data):
         source_session=session,
         ent_id=ent_id,
         delta=delta,
-        all_sessions=GS.all_sessions,
         source_name="GEAR/STAT",
     )
 
@@ -428,7 +258,6 @@ def handle_char_regen_tick(session, data):
         source_session=session,
         ent_id=ent_id,
         delta=delta,
-        all_sessions=GS.all_sessions,
         source_name="REGEN",
     )
 
@@ -575,7 +404,7 @@ def handle_update_single_gear(session, data):
     eq[slot] = gear_data
 
     save_characters(session.user_id, session.char_list)
-    broadcast_gear_change(session, GS.all_sessions)
+    broadcast_gear_change(session)
 
 
 def handle_update_equipment(session, data):
@@ -619,7 +448,7 @@ def handle_update_equipment(session, data):
         }
 
     save_characters(session.user_id, session.char_list)
-    broadcast_gear_change(session, GS.all_sessions)
+    broadcast_gear_change(session)
 
 
 def handle_create_gearset(session, data):
@@ -1,6 +1,8 @@
 import os
 import json
 
+from data_bundle import load_json, DATA_DIR
+
 PACKET_HEADER_SIZE = 4
 CONST_529 = [5,2,3,5,5,3,2,3,2,5,2,3,5,5,3,2,3,2,5,2,3,5,5,3,2,3,2]
 SLOT_BIT_WIDTHS = []
@@ -314,13 +316,11 @@ class class_66:
 
 def _load_json(path, default=None):
     try:
-        with open(path, encoding="utf-8") as f:
-            return json.load(f)
+        return load_json(path)
     except (OSError, json.JSONDecodeError) as e:
         print(f"[WARN] Could not load {path}: {e}")
         return default if default is not None else {}
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 DYE_DATA      = _load_json(os.path.join(DATA_DIR, "DyeTypes.json"), {})
 ABILITY_DATA  = _load_json(os.path.join(DATA_DIR, "AbilityTypes.json"), [])
 BUILDING_DATA = _load_json(os.path.join(DATA_DIR, "BuildingTypes.json"), [])
@@ -337,20 +337,45 @@ CONSUMABLE_BOOSTS = {
     for c in CONSUMABLES
 }
 
+#### Indexes ####
+# Built once here, the handlers look rows up by key instead of scanning the
+# lists (ids are strings in AbilityTypes / BuildingTypes). The first row wins
+# when a key repeats, as the scans did.
+
+def _index(rows, key):
+    index = {}
+    for row in rows:
+        try:
+            index.setdefault(key(row), row)
+        except (TypeError, ValueError):
+            continue    # template / malformed row
+    return index
+
+# (AbilityID, Rank) -> {"AbilityID", "Rank", "GoldCost", "IdolCost", "UpgradeTime"} as ints
+ABILITY_INFO = {
+    k: {f: int(e.get(f, 0)) for f in ("AbilityID", "Rank", "GoldCost", "IdolCost", "UpgradeTime")}
+    for k, e in _index(ABILITY_DATA, lambda e: (int(e["AbilityID"]), int(e["Rank"]))).items()
+}
+BUILDING_INDEX = _index(BUILDING_DATA, lambda b: (int(b["BuildingID"]), int(b["Rank"])))   # (BuildingID, Rank) -> row
+EGG_BY_ID = _index(EGG_TYPES, lambda e: e["EggID"])                                       # EggID -> row
+PET_BY_ID = _index(PET_TYPES, lambda p: p["PetID"])                                       # PetID -> row
+DAILY_EGG_IDS = tuple(e["EggID"] for e in EGG_TYPES if e.get("EggID", 0) > 0)            # eggs the hatchery can offer
+
 def get_dye_color(dye_id: int | str):
     return DYE_DATA.get(str(dye_id), {}).get("color")
 
 def get_ability_info(ability_id: int, rank: int):
-    key, rank = str(ability_id), str(rank)
-    for e in ABILITY_DATA:
-        if e.get("AbilityID") == key and e.get("Rank") == rank:
-            return {k: int(e.get(k, 0)) for k in ("AbilityID", "Rank", "GoldCost", "IdolCost", "UpgradeTime")}
-    return None
+    """Shared dict, do not modify."""
+    return ABILITY_INFO.get((int(ability_id), int(rank)))
 
 def find_building_data(building_id: int, rank: int):
-    bid, rank = int(building_id), int(rank)
-    return next((b for b in BUILDING_DATA
-                 if int(b.get("BuildingID", -1)) == bid and int(b.get("Rank", -1)) == rank), None)
+    return BUILDING_INDEX.get((int(building_id), int(rank)))
+
+def find_egg_def(egg_id: int):
+    return EGG_BY_ID.get(egg_id)
+
+def find_pet_def(pet_id: int):
+    return PET_BY_ID.get(pet_id)
 
 MATERIALS_DATA = {
     int(m["MaterialID"]): m
@@ -359,6 +384,5 @@ MATERIALS_DATA = {
 
 
 def load_class_template(class_name: str) -> dict:
-    path = os.path.join("data", f"{class_name.lower()}_template.json")
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    path = os.path.join(DATA_DIR, f"{class_name.lower()}_template.json")
+    return load_json(path)
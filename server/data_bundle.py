@@ -0,0 +1,179 @@
+"""
+Precompiled game data (data/*.json), loaded faster than parsing the JSON.
+
+`python data_bundle.py build` (from the server folder) compiles the files of
+BUNDLE_SOURCES into BUNDLE_PATH, every file as its own marshal blob :
+
+    b"DBDL" version:u8 python:u8 u8     marshal depends on the Python version
+    crc32:u32 index_size:u32            crc32 of everything after this header
+    index       marshal {name: (mtime_ns, size, offset, length)}, offsets from the first blob
+    blobs       marshal of each file's JSON data
+
+load_json(path) is what the loaders call instead of json.load, with paths
+under DATA_DIR (whatever the working directory) : it returns the file's data
+from the bundle when the bundle holds that file with the same modification
+time and size, else it parses the JSON as before. An edited
+source is therefore picked up right away (and reported), a missing, damaged or
+foreign bundle is ignored. Every call decodes a fresh copy, callers may modify
+what they get (class templates).
+
+The server refreshes a stale bundle at boot (refresh_bundle), the file is
+generated and not committed.
+"""
+
+import json
+import marshal
+import os
+import struct
+import sys
+import zlib
+
+DATA_BUNDLE = True     # serve the data files from the bundle when it is up to date, else always parse the JSON
+# the data folder next to the sources, or next to the executable of a frozen build (pyinstaller.spec)
+_BASE_DIR = os.path.dirname(os.path.abspath(sys.executable if getattr(sys, "frozen", False) else __file__))
+DATA_DIR = os.path.join(_BASE_DIR, "data")  # every loader reads its file from here
+BUNDLE_PATH = os.path.join(DATA_DIR, "gamedata.bundle")
+BUNDLE_SOURCES = (
+    "AbilityTypes.json", "BuildingTypes.json", "Charms.json", "ConsumableTypes.json", "DyeTypes.json",
+    "Materials.json", "MissionTypes.json", "door_map.json", "level_config.json", "egg_types.json",
+    "pet_types.json", "paladin_template.json", "mage_template.json", "rogue_template.json",
+)
+
+MAGIC = b"DBDL"
+VERSION = 1
+_HEADER = struct.Struct(">4sBBBII")
+
+
+class DataBundle:
+    def __init__(self, path=BUNDLE_PATH):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        """Forget what was read (the bundle was rebuilt)."""
+        self._blobs = None
+        self._index = None      # name -> (mtime_ns, size, offset, length), {} when unusable
+        self._stale = set()     # names already reported as newer than the bundle
+
+    def _open(self):
+        self._index = {}
+        try:
+            with open(self.path, "rb") as f:
+                buf = f.read()
+        except OSError:
+            return
+        try:
+            magic, version, major, minor, crc, index_size = _HEADER.unpack_from(buf)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("not a data bundle")
+            if (major, minor) != sys.version_info[:2]:
+                raise ValueError(f"built by Python {major}.{minor}")
+            body = memoryview(buf)[_HEADER.size:]
+            if zlib.crc32(body) != crc:
+                raise ValueError("checksum mismatch")
+            index = marshal.loads(body[:index_size])
+        except (ValueError, EOFError, TypeError, struct.error) as e:
+            print(f"[DATA] Ignoring {self.path}: {e}")
+            return
+        self._blobs = body[index_size:]
+        self._index = index
+
+    def _entry(self, path):
+        if self._index is None:
+            self._open()
+        name = os.path.basename(path)
+        entry = self._index.get(name)
+        if entry is None:
+            return None
+        if os.path.normcase(os.path.dirname(os.path.abspath(path))) != os.path.normcase(DATA_DIR):
+            if name not in self._stale:
+                self._stale.add(name)
+                print(f"[DATA] {path} is not in {DATA_DIR}, loading the JSON")
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return entry    # source gone, the bundle still has it
+        if (st.st_mtime_ns, st.st_size) != entry[:2]:
+            if name not in self._stale:
+                self._stale.add(name)
+                print(f"[DATA] {name} changed since the bundle was built, loading the JSON")
+            return None
+        return entry
+
+    def load(self, path):
+        """The file's data from the bundle, None when the bundle cannot serve it."""
+        if not DATA_BUNDLE:
+            return None
+        entry = self._entry(path)
+        if entry is None:
+            return None
+        offset, length = entry[2], entry[3]
+        return marshal.loads(self._blobs[offset:offset + length])
+
+    def is_stale(self):
+        if self._index is None:
+            self._open()
+        return any(self._entry(os.path.join(DATA_DIR, name)) is None
+                   for name in BUNDLE_SOURCES if os.path.exists(os.path.join(DATA_DIR, name)))
+
+
+def build_bundle(path=BUNDLE_PATH, data_dir=DATA_DIR) -> int:
+    """Compile BUNDLE_SOURCES into path, returns the bundle size."""
+    index = {}
+    blobs = bytearray()
+    for name in BUNDLE_SOURCES:
+        source = os.path.join(data_dir, name)
+        if not os.path.exists(source):
+            continue
+        st = os.stat(source)
+        with open(source, encoding="utf-8") as f:
+            blob = marshal.dumps(json.load(f))
+        index[name] = (st.st_mtime_ns, st.st_size, len(blobs), len(blob))
+        blobs += blob
+    raw_index = marshal.dumps(index)
+    body = raw_index + bytes(blobs)
+    header = _HEADER.pack(MAGIC, VERSION, *sys.version_info[:2], zlib.crc32(body), len(raw_index))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header + body)
+    os.replace(tmp, path)
+    if path == bundle.path:
+        bundle.reset()
+    return len(header) + len(body)
+
+
+def refresh_bundle():
+    """Boot : rebuild the bundle when a source is newer (or there is none yet), for the next start."""
+    if not DATA_BUNDLE or not bundle.is_stale():
+        return
+    try:
+        size = build_bundle()
+    except OSError as e:
+        print(f"[DATA] Could not write {BUNDLE_PATH}: {e}")
+        return
+    print(f"[DATA] Rebuilt {os.path.basename(BUNDLE_PATH)} ({size} bytes)")
+
+
+def load_json(path):
+    """JSON data of a data file, from the bundle when it is up to date."""
+    data = bundle.load(path)
+    if data is not None:
+        return data
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+bundle = DataBundle()
+
+
+def main():
+    if sys.argv[1:] != ["build"]:
+        print("usage: python data_bundle.py build")
+        sys.exit(2)
+    size = build_bundle()
+    print(f"Built {BUNDLE_PATH} ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
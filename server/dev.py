@@ -2,8 +2,10 @@ import struct
 
 from BitBuffer import BitBuffer
 from bitreader import BitReader
-from globals import GS
+from globals import GS, relay_packet
 from login import handle_gameserver_login
+from packet_schema import QUEST_PROGRESS_UPDATE, LEVEL_STATE, PLAY_SOUND, ACTION_UPDATE, EMOTE, ROOM_STATE_UPDATE, \
+    ROOM_EVENT_START, ROOM_INFO_UPDATE, SET_UNTARGETABLE, ROOM_CLOSE, ROOM_UNLOCK, ROOM_BOSS_INFO, EMOTE_END
 """
 Some context : 
 
@@ -38,199 +40,45 @@ def DEVFLAG_MASTER_CLIENT(session, data):
 
 
 def handle_quest_progress_update(session, data):
-    br = BitReader(data[4:])
-    progress = br.read_method_4()
-    #print(f" Quest/Room progress = {progress}")
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, QUEST_PROGRESS_UPDATE)
 
 
 def handle_level_state(session, data):
-    br = BitReader(data[4:])
-    state_a = br.read_method_26()
-    state_b = br.read_method_26()
-    #print(f" LevelState: '{state_a}', '{state_b}'")
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, LEVEL_STATE)
 
 def handle_play_sound(session, data):
-    br = BitReader(data[4:])
-    room_id = br.read_method_4()
-    sound_name = br.read_method_26()
-    volume_scaled = br.read_method_4()
-    volume = volume_scaled / 100.0
-    #print(f" PlaySound room={room_id} sound='{sound_name}' volume={volume}")
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, PLAY_SOUND)
 
 def handle_action_update(session, data):
-    br = BitReader(data[4:])
-    room_id = br.read_method_4()
-    action_id = br.read_method_4()
-    #print(f" ActionUpdate room={room_id} action={action_id}")
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, ACTION_UPDATE)
 
 def handle_emote(session, data):
-    br = BitReader(data[4:])
-    room_id = br.read_method_4()
-    actor_name = br.read_method_26()
-    emote_name = br.read_method_26()
-    loop_flag = br.read_method_15()
-    #print(
-    #    f"Emote room={room_id} actor='{actor_name}' "
-    #    f"emote='{emote_name}' loop={loop_flag}"
-    #)
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, EMOTE)
 
 
 def handle_room_state_update(session, data):
-    br = BitReader(data[4:])
-    room_id = br.read_method_4()
-    room_state = br.read_method_4()
-    #print(f" RoomStateUpdate room={room_id} state={room_state}")
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, ROOM_STATE_UPDATE)
 
 def handle_room_event_start(session, data):
-    br = BitReader(data[4:])
-    room_id = br.read_method_4()
-    flag = br.read_method_15()
-    #print(f" RoomEventStart room={room_id} flag={flag}")
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, ROOM_EVENT_START)
 
 def handle_room_info_update(session, data):
-    br = BitReader(data[4:])
-    room_id = br.read_method_4()
-    info_a = br.read_method_4()
-    info_b = br.read_method_26()
-    info_c = br.read_method_4()
-    info_d = br.read_method_26()
-    #print(
-    #    f"RoomInfoUpdate room={room_id} "
-    #    f"a={info_a} b='{info_b}' c={info_c} d='{info_d}'"
-    #)
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, ROOM_INFO_UPDATE)
 
 def handle_set_untargetable(session, data):
-    br = BitReader(data[4:])
-    entity_id = br.read_method_4()
-    untargetable = br.read_method_15()
-    #print(
-    #    f"SetUntargetable entity={entity_id} "
-    #    f"untargetable={untargetable}"
-    #)
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, SET_UNTARGETABLE)
 
 def handle_room_close(session, data):
-    br = BitReader(data[4:])
-    room_id = br.read_method_4()
-    #print(f"RoomClose / Reset room={room_id}")
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, ROOM_CLOSE)
 
 
 def handle_room_unlock(session, data):
-    br = BitReader(data[4:])
-    room_id = br.read_method_4()
-    #print(f"RoomUnlock room={room_id}")
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, ROOM_UNLOCK)
 
 
 def handle_room_boss_info(session, data):
-    br = BitReader(data[4:])
-
-    room_id    = br.read_method_4()
-    boss1_id   = br.read_method_4()
-    boss1_name = br.read_method_26()
-    boss2_id   = br.read_method_4()
-    boss2_name = br.read_method_26()
-
-    #print(
-    #    f"[0xAC] ROOM_BOSS_INFO room={room_id} "
-    #    f"boss1=({boss1_id}, '{boss1_name}') "
-    #    f"boss2=({boss2_id}, '{boss2_name}')"
-    #)
-
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, ROOM_BOSS_INFO)
 
 
 def handle_emote_end(session, data):
-    br = BitReader(data[4:])
-    entity_id = br.read_method_4()
-
-    #print(f"[0x7F] EMOTE_END entity={entity_id}")
-
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    relay_packet(session, data, EMOTE_END)
@@ -3,10 +3,12 @@ import os
 import struct
 
 from typing import Dict, Any
-from BitBuffer import BitBuffer
-from bitreader import BitReader
-from constants import Entity, class_7, class_20, class_3, Game, LinkUpdater, EntType, GearType, class_64, class_21, class_118, method_277
-from globals import GS
+from constants import Game, LinkUpdater, EntType, class_118
+import interest
+import movement_batch
+from globals import GS, level_join, level_sessions, index_session
+from interest import set_spawn_packet_builder
+from packet_schema import ENTITY_SPAWN, ENTITY_FULL_UPDATE
 
 """
 Hints NPCs data 
@@ -104,177 +106,122 @@ def load_npc_data_for_level(level_name: str) -> list:
         return []
 
 def Send_Entity_Data(entity: Dict[str, Any]) -> bytes:
-    bb = BitBuffer(debug=True)
-    bb.write_method_4(entity['id'])
-    bb.write_method_13(entity['name'])
-    if entity.get("is_player", False):
-        bb.write_method_6(1, 1)
-        bb.write_method_13(entity.get("class", ""))
-        bb.write_method_13(entity.get("gender", ""))
-        bb.write_method_13(entity.get("headSet", ""))
-        bb.write_method_13(entity.get("hairSet", ""))
-        bb.write_method_13(entity.get("mouthSet", ""))
-        bb.write_method_13(entity.get("faceSet", ""))
-        bb.write_method_6(entity.get("hairColor", 0), 24)
-        bb.write_method_6(entity.get("skinColor", 0), 24)
-        bb.write_method_6(entity.get("shirtColor", 0), 24)
-        bb.write_method_6(entity.get("pantColor", 0), 24)
-        equipped = entity.get('equippedGears', [])
-        for slot in range(1, EntType.MAX_SLOTS):
-            idx = slot - 1
-            if idx < len(equipped) and equipped[idx] is not None:
-                gear = equipped[idx]
-                bb.write_method_6(1, 1)
-                bb.write_method_6(gear['gearID'], GearType.GEARTYPE_BITSTOSEND)
-                bb.write_method_6(gear['tier'], GearType.const_176)
-                runes = gear.get('runes', [0, 0, 0])
-                bb.write_method_6(runes[0], class_64.const_101)
-                bb.write_method_6(runes[1], class_64.const_101)
-                bb.write_method_6(runes[2], class_64.const_101)
-                colors = gear.get('colors', [0, 0])
-                bb.write_method_6(colors[0], class_21.const_50)
-                bb.write_method_6(colors[1], class_21.const_50)
-            else:
-                bb.write_method_6(0, 1)
-    else:
-        bb.write_method_6(0, 1)
-
-    bb.write_method_45(int(entity['x']))  # x
-    bb.write_method_45(int(entity['y']))  # y
-    bb.write_method_45(int(entity.get('v', 0)))  # Velocity
-
-    bb.write_method_6(entity.get('team', 0), Entity.TEAM_BITS)
-
-    # ── Player OR NPC branch ──
-    if entity.get("is_player", False):
-        bb.write_method_6(1, 1)
-
-        timing_flag = entity.get("idle_reset", False)
-        bb.write_method_6(1 if timing_flag else 0, 1)
-
-        appearance_flag = entity.get("spawn_fx", False)  # True for new player  spawns if the player is already in the level then it is False
-        bb.write_method_6(1 if appearance_flag else 0, 1)
-
-        active_pet = entity.get("activePet", {})
-        bb.write_method_6(active_pet.get("petID",      0), class_7.const_19)
-        bb.write_method_6(active_pet.get("special_id", 0), class_7.const_75)
-        bb.write_method_6(entity.get("equippedMount",  0), class_20.const_297)
-        bb.write_method_6(entity.get("activeConsumableID",        0), class_3.const_69)
-
-        abilities = entity.get("abilities", [])
-        has_abilities = len(abilities) > 0
-        bb.write_method_6(1 if has_abilities else 0, 1)
-        if bb.debug:
-            bb.debug_log.append(f"has_abilities={has_abilities}")
-        if has_abilities:
-            for i in range(3):
-                ability = abilities[i] if i < len(abilities) and abilities[i] is not None else {"abilityID": 0, "rank": 0}
-                bb.write_method_6(ability.get("abilityID", 0), class_7.const_19)
-                bb.write_method_6(ability.get("rank", 0), class_7.const_75)
-                if bb.debug:
-                    bb.debug_log.append(
-                        f"ability_{i + 1}_abilityID={ability.get('abilityID', 0)}, rank={ability.get('rank', 0)}")
-    else:
-        bb.write_method_6(0, 1)
-        bb.write_method_6(1 if entity.get("untargetable", False) else 0, 1)
-        bb.write_method_739(entity.get("render_depth_offset", 0))
-
-        # used to set the current entity's moving speed if he has any
-        speed = entity.get("behavior_speed", 0)
-        if speed > 0:
-            bb.write_method_6(1, 1)
-            bb.write_method_4(int(speed * LinkUpdater.VELOCITY_INFLATE))
-        else:
-            bb.write_method_6(0, 1)
+    """0x0F entity spawn payload, layout in packet_schema.ENTITY_SPAWN."""
+    return ENTITY_SPAWN.encode(entity_spawn_fields(entity))
 
+def entity_spawn_fields(entity: Dict[str, Any]) -> dict:
+    """Map an entity dict (see build_entity_dict / world_npcs) onto the ENTITY_SPAWN fields."""
+    is_player = bool(entity.get("is_player", False))
     cue = entity.get("cue_data", {})
-    for key in ("character_name", "DramaAnim", "SleepAnim"):
-        val = cue.get(key, "")
-        bb.write_method_6(1 if val else 0, 1)
-        if val:
-            bb.write_method_13(val)
-
-    summoner_id = entity.get("summonerId", 0)
-    if summoner_id:
-        bb.write_method_6(1, 1)
-        bb.write_method_4(summoner_id)
-        if bb.debug:
-            bb.debug_log.append(f"summonerId = {summoner_id}")
-    else:
-        bb.write_method_6(0, 1)
-
     power_id = entity.get("power_id", 0)
+    fields = {
+        "id": entity['id'],
+        "name": entity['name'],
+        "is_player": is_player,
+        "x": int(entity['x']),
+        "y": int(entity['y']),
+        "v": int(entity.get('v', 0)),
+        "team": entity.get('team', 0),
+        "character_name": cue.get("character_name", "") or None,
+        "DramaAnim": cue.get("DramaAnim", "") or None,
+        "SleepAnim": cue.get("SleepAnim", "") or None,
+        "summonerId": entity.get("summonerId", 0) or None,
+        "power_id": power_id if power_id > 0 else None,
+        "entState": entity.get("entState", 0),
+        "facing_left": entity.get("facing_left", False),
+        # updates the entity's Health if that specific entity has lost any amount of health
+        "health_delta": int(round(entity.get("health_delta", 0))),
+        "buffs": [
+            {
+                "type_id": buff.get("type_id", 0),
+                "param1": buff.get("param1", 0),
+                "param2": buff.get("param2", 0),
+                "param3": buff.get("param3", 0),
+                "param4": buff.get("param4", 0),
+                "extra_data": [
+                    {"id": ed.get("id", 0), "values": ed.get("values", [])}
+                    for ed in buff.get("extra_data", [])
+                ] or None,
+            }
+            for buff in entity.get("buffs", [])
+        ],
+    }
 
-    if power_id > 0:
-        bb.write_method_6(1, 1)
-        bb.write_method_4(power_id)
-        if bb.debug:
-            bb.debug_log.append(f"powerTypeID = {power_id}")
-    else:
-        bb.write_method_6(0, 1)
-
-    bb.write_method_6(entity.get("entState", 0), Entity.const_316)
-    bb.write_method_6(1 if entity.get("facing_left", False) else 0, 1)
-    if entity.get('is_player', False):
-
-        level = entity.get("level", 0)
-        bb.write_method_6(level, Entity.MAX_CHAR_LEVEL_BITS)
-        if bb.debug:
-            bb.debug_log.append(f"level={level}")
-
-        class_id = entity.get("MasterClass", Game.const_526)
-        bb.write_method_6(class_id, Game.const_209)
-
-        # Talent data is ONLY allowed if a MasterClass has been equipped
-        has_talent_tree = (
-                class_id != Game.const_526 and
-                any(
-                    t and t.get("nodeID", 0) > 0 and t.get("points", 0) > 0
-                    for t in entity.get("talents", [])
-                )
-        )
-
-        bb.write_method_6(1 if has_talent_tree else 0, 1)
-
-        if has_talent_tree:
-            for slot in range(class_118.NUM_TALENT_SLOTS):  # ALWAYS 27
-                t = entity["talents"][slot] if slot < len(entity["talents"]) else None
-
-                if t and t.get("nodeID", 0) > 0 and t.get("points", 0) > 0:
-                    bb.write_method_6(1, 1)
-                    bb.write_method_6(t["nodeID"], class_118.const_127)
-                    bb.write_method_6(t["points"] - 1, method_277(slot))
-                else:
-                    bb.write_method_6(0, 1)
-
+    if not is_player:
+        # used to set the current entity's moving speed if he has any
+        speed = entity.get("behavior_speed", 0)
+        fields.update({
+            "untargetable": entity.get("untargetable", False),
+            "render_depth_offset": entity.get("render_depth_offset", 0),
+            "behavior_speed": int(speed * LinkUpdater.VELOCITY_INFLATE) if speed > 0 else None,
+            "talents": None,
+        })
+        return fields
+
+    equipped = entity.get('equippedGears', [])
+    gears = []
+    for idx in range(EntType.MAX_SLOTS - 1):
+        gear = equipped[idx] if idx < len(equipped) else None
+        if gear is None:
+            gears.append(None)
+            continue
+        runes = gear.get('runes', [0, 0, 0])
+        colors = gear.get('colors', [0, 0])
+        gears.append({
+            "gearID": gear['gearID'], "tier": gear['tier'],
+            "rune1": runes[0], "rune2": runes[1], "rune3": runes[2],
+            "color1": colors[0], "color2": colors[1],
+        })
 
+    abilities = entity.get("abilities", [])
+    if abilities:
+        empty = {"abilityID": 0, "rank": 0}
+        abilities = [
+            {"abilityID": a.get("abilityID", 0), "rank": a.get("rank", 0)}
+            for a in ((abilities[i] if i < len(abilities) and abilities[i] is not None else empty) for i in range(3))
+        ]
     else:
-        bb.write_method_6(0, 1)
-
-    # updates the entity's Health if that specific entity has lost any amount of health
-    value = int(round(entity.get("health_delta", 0)))
-    bb.write_method_45(value)
-
-    # Updates the entities buffs if he has any
-    buffs = entity.get("buffs", [])
-    bb.write_method_4(len(buffs))
-    for buff in buffs:
-        bb.write_method_4(buff.get("type_id", 0))
-        bb.write_method_4(buff.get("param1", 0))
-        bb.write_method_4(buff.get("param2", 0))
-        bb.write_method_4(buff.get("param3", 0))
-        bb.write_method_4(buff.get("param4", 0))
-        extra = buff.get("extra_data", [])
-        bb.write_method_6(1 if extra else 0, 1)
-        if extra:
-            bb.write_method_4(len(extra))
-            for ed in extra:
-                bb.write_method_4(ed.get("id", 0))
-                vals = ed.get("values", [])
-                bb.write_method_4(len(vals))
-                for v in vals:
-                    bb.write_float(v)
-    return bb.to_bytes()
+        abilities = None
+
+    # Talent data is ONLY allowed if a MasterClass has been equipped
+    class_id = entity.get("MasterClass", Game.const_526)
+    talents = entity.get("talents", [])
+    talent_slots = None
+    if class_id != Game.const_526 and any(
+            t and t.get("nodeID", 0) > 0 and t.get("points", 0) > 0 for t in talents):
+        talent_slots = []
+        for slot in range(class_118.NUM_TALENT_SLOTS):  # ALWAYS 27
+            t = talents[slot] if slot < len(talents) else None
+            if t and t.get("nodeID", 0) > 0 and t.get("points", 0) > 0:
+                talent_slots.append({"nodeID": t["nodeID"], "points": t["points"] - 1})
+            else:
+                talent_slots.append(None)
+
+    active_pet = entity.get("activePet", {})
+    fields.update({
+        "class": entity.get("class", ""),
+        "gender": entity.get("gender", ""),
+        "headSet": entity.get("headSet", ""),
+        "hairSet": entity.get("hairSet", ""),
+        "mouthSet": entity.get("mouthSet", ""),
+        "faceSet": entity.get("faceSet", ""),
+        "hairColor": entity.get("hairColor", 0),
+        "skinColor": entity.get("skinColor", 0),
+        "shirtColor": entity.get("shirtColor", 0),
+        "pantColor": entity.get("pantColor", 0),
+        "gears": gears,
+        "idle_reset": entity.get("idle_reset", False),
+        "spawn_fx": entity.get("spawn_fx", False),  # True for new player  spawns if the player is already in the level then it is False
+        "petID": active_pet.get("petID", 0),
+        "pet_special_id": active_pet.get("special_id", 0),
+        "equippedMount": entity.get("equippedMount", 0),
+        "activeConsumableID": entity.get("activeConsumableID", 0),
+        "abilities": abilities,
+        "level": entity.get("level", 0),
+        "MasterClass": class_id,
+        "talents": talent_slots,
+    })
+    return fields
 
 def build_entity_dict(eid, char, props):
     """
@@ -352,26 +299,33 @@ def send_existing_entities_to_joiner(joiner):
     to the joining player.
     NPCs are skipped and should be spawned separately by the level loader.
     """
-    for other in GS.all_sessions:
+    for other in level_sessions(joiner.current_level):
         if other is joiner:
             continue
-        if not other.player_spawned or other.current_level != joiner.current_level:
-            continue
 
         # Only send the entity that belongs to the player's character
-        if other.clientEntID and other.clientEntID in other.entities:
-            eprops = other.entities[other.clientEntID]
-
-            char = next((c for c in other.char_list if c.get("name") == other.current_character), None)
-            ent_dict = build_entity_dict(other.clientEntID, char, eprops)
-
-            try:
-                pkt = Send_Entity_Data(ent_dict)
-                framed = struct.pack(">HH", 0x0F, len(pkt)) + pkt
+        try:
+            framed = build_player_spawn_packet(other)
+            if framed:
                 joiner.conn.sendall(framed)
-                #print(f"[JOIN] Sent player {ent_dict['name']} (eid={other.clientEntID}) → {joiner.addr}")
-            except Exception as ex:
-                print(f"[JOIN] Error sending player {ent_dict['name']} to {joiner.addr}: {ex}")
+                #print(f"[JOIN] Sent player {other.current_character} (eid={other.clientEntID}) → {joiner.addr}")
+        except Exception as ex:
+            print(f"[JOIN] Error sending player {other.current_character} to {joiner.addr}: {ex}")
+
+def build_player_spawn_packet(session):
+    """Framed 0x0F spawn for the session's own player, None until its entity is known."""
+    eprops = session.entities.get(session.clientEntID)
+    if not session.clientEntID or not eprops:
+        return None
+    # with movement batching on, peers may not have been sent the latest position yet
+    x, y, vx = movement_batch.published_position(session, session.clientEntID, eprops)
+    eprops = dict(eprops, pos_x=x, pos_y=y, velocity_x=vx)
+    char = next((c for c in session.char_list if c.get("name") == session.current_character), None)
+    ent_dict = build_entity_dict(session.clientEntID, char, eprops)
+    pkt = Send_Entity_Data(normalize_entity_for_send(ent_dict))
+    return struct.pack(">HH", 0x0F, len(pkt)) + pkt
+
+set_spawn_packet_builder(build_player_spawn_packet)
 
 def handle_entity_full_update(session, data):
     """
@@ -382,45 +336,35 @@ def handle_entity_full_update(session, data):
     - Broadcasts raw 0x08 packets for movement/state sync.
     - sends 0x0F for newly-seen non-player entities (pets/minions).
     """
-    br = BitReader(data[4:])
-
-    entity_id = br.read_method_9()
-    pos_x = br.read_method_24()
-    pos_y = br.read_method_24()
-    velocity_x = br.read_method_24()
-    ent_name = br.read_method_26()
-
-    team = br.read_method_20(Entity.TEAM_BITS)
-    is_player = bool(br.read_method_15())
-    y_offset = br.read_method_706()
-
-    # Optional cue data
-    has_cue = bool(br.read_method_15())
-    cue_data = {}
-    if has_cue:
-        if bool(br.read_method_15()):
-            cue_data["character_name"] = br.read_method_13()
-        if bool(br.read_method_15()):
-            cue_data["DramaAnim"] = br.read_method_13()
-        if bool(br.read_method_15()):
-            cue_data["SleepAnim"] = br.read_method_13()
-
-    has_summoner = bool(br.read_method_15())
-    summoner_id = br.read_method_9() if has_summoner else None
-
-    has_power = bool(br.read_method_15())
-    power_id = br.read_method_9() if has_power else None
-
-    ent_state = br.read_method_20(Entity.const_316)
-    b_left = bool(br.read_method_15())
-    b_running = bool(br.read_method_15())
-    b_jumping = bool(br.read_method_15())
-    b_dropping = bool(br.read_method_15())
-    b_backpedal = bool(br.read_method_15())
+    fields = ENTITY_FULL_UPDATE.decode(data[4:])
+
+    entity_id = fields["entity_id"]
+    pos_x = fields["pos_x"]
+    pos_y = fields["pos_y"]
+    velocity_x = fields["velocity_x"]
+    ent_name = fields["ent_name"]
+
+    team = fields["team"]
+    is_player = fields["is_player"]
+    y_offset = fields["y_offset"]
+
+    # Optional cue data, only the names that were sent
+    cue_data = {k: v for k, v in (fields["cue_data"] or {}).items() if v is not None}
+
+    summoner_id = fields["summoner_id"]
+    power_id = fields["power_id"]
+
+    ent_state = fields["ent_state"]
+    b_left = fields["b_left"]
+    b_running = fields["b_running"]
+    b_jumping = fields["b_jumping"]
+    b_dropping = fields["b_dropping"]
+    b_backpedal = fields["b_backpedal"]
 
     # Track client’s entity ID
     if is_player and session.clientEntID is None:
         session.clientEntID = entity_id
+        index_session(session)
         print(f"[{session.addr}] [PKT08] Learned clientEntID = {entity_id}")
 
     # Build props
@@ -504,38 +448,34 @@ def handle_entity_full_update(session, data):
         pkt = Send_Entity_Data(flat_ent)
         framed = struct.pack(">HH", 0x0F, len(pkt)) + pkt
 
-        for other in GS.all_sessions:
-            if (
-                    other is not session
-                    and other.player_spawned
-                    and other.current_level == session.current_level
-            ):
+        for other in level_sessions(session.current_level):
+            if other is not session:
                 other.conn.sendall(framed)
                 print(f"[SPAWN] Broadcasted new entity {entity_id} ({ent_name}) → {other.addr}")
 
     # First-time world load for this player
     if not session.player_spawned:
-        session.player_spawned = True
-        send_existing_entities_to_joiner(session)
-
-        # Broadcast THIS player’s spawn to others
-        char = next(
-            (c for c in session.char_list if c.get("name") == session.current_character),
-            None
-        )
-        if char:
-            ent_dict = build_entity_dict(entity_id, char, props)
-            flat_ent = normalize_entity_for_send(ent_dict)
-            pkt = Send_Entity_Data(flat_ent)
-            framed = struct.pack(">HH", 0x0F, len(pkt)) + pkt
-            for other in GS.all_sessions:
-                if (
-                        other is not session
-                        and other.player_spawned
-                        and other.current_level == session.current_level
-                ):
-                    other.conn.sendall(framed)
-                    #print(f"[JOIN] Broadcasted Send_Entity_Data for {ent_dict['name']} → {other.addr}")
+        level_join(session)
+        if interest.INTEREST_ENABLED:
+            # only the players around it, the others follow as they come in range (interest.py)
+            interest.enter(session)
+        else:
+            send_existing_entities_to_joiner(session)
+
+            # Broadcast THIS player’s spawn to others
+            char = next(
+                (c for c in session.char_list if c.get("name") == session.current_character),
+                None
+            )
+            if char:
+                ent_dict = build_entity_dict(entity_id, char, props)
+                flat_ent = normalize_entity_for_send(ent_dict)
+                pkt = Send_Entity_Data(flat_ent)
+                framed = struct.pack(">HH", 0x0F, len(pkt)) + pkt
+                for other in level_sessions(session.current_level):
+                    if other is not session:
+                        other.conn.sendall(framed)
+                        #print(f"[JOIN] Broadcasted Send_Entity_Data for {ent_dict['name']} → {other.addr}")
 
 def ensure_level_npcs(level_name: str) -> None:
     if level_name in GS.level_entities:
@@ -0,0 +1,82 @@
+"""
+Inbound packet framing shared by both engines.
+
+Every client packet is a 4-byte header (>HH type/length) followed by `length`
+bytes of payload. The old loop did buffer.extend(chunk), copied each packet out
+with bytes(buffer[:total]) and compacted with del buffer[:total], which moves the
+whole rest of the buffer once per packet.
+
+PacketFramer keeps one fixed bytearray per connection:
+
+  - the socket reads straight into the free space behind the data (recv_into),
+  - packets are walked with a read cursor and handed out as memoryview slices,
+  - the unread tail is moved to the front once per chunk, before the next read.
+
+Note : the memoryview handed to a handler points into the receive buffer and is
+only valid until the handler returns. Anything that keeps the packet around must
+copy it first (bytes(data)). BitReader and conn.sendall() already copy.
+"""
+
+HEADER_SIZE = 4
+MAX_PACKET_LENGTH = 32 * 1024   # payload bytes, larger headers are treated as garbage and drop the client
+RECV_SIZE = 4096                # bytes read per recv, same as the old conn.recv(4096)
+
+
+class PacketTooLarge(ValueError):
+    pass
+
+
+class PacketFramer:
+    def __init__(self, max_packet_length=MAX_PACKET_LENGTH, recv_size=RECV_SIZE):
+        self.max_packet_length = max_packet_length
+        self.recv_size = recv_size
+        # room for one maximum packet plus one read, so a partial packet never blocks the next read
+        self._buf = bytearray(HEADER_SIZE + max_packet_length + recv_size)
+        self._view = memoryview(self._buf)
+        self._start = 0   # read cursor
+        self._end = 0     # end of received data
+
+    def _compact(self):
+        start, end = self._start, self._end
+        if start == 0:
+            return
+        if start < end:
+            self._buf[:end - start] = self._buf[start:end]
+        self._start = 0
+        self._end = end - start
+
+    def get_buffer(self):
+        """Writable view of the free space, compacts first (once per chunk)."""
+        self._compact()
+        return self._view[self._end:self._end + self.recv_size]
+
+    def buffer_updated(self, nbytes: int):
+        self._end += nbytes
+
+    def recv_into(self, conn) -> int:
+        """Read one chunk from conn into the buffer, returns the byte count (0 = closed)."""
+        n = conn.recv_into(self.get_buffer())
+        self._end += n
+        return n
+
+    def packets(self):
+        """Yield (pkt_type, packet_view) for every complete packet received so far."""
+        buf = self._buf
+        view = self._view
+        max_len = self.max_packet_length
+        start = self._start
+        end = self._end
+        while end - start >= HEADER_SIZE:
+            length = (buf[start + 2] << 8) | buf[start + 3]
+            if length > max_len:
+                raise PacketTooLarge(f"packet length {length} exceeds limit of {max_len} bytes")
+            total = HEADER_SIZE + length
+            if end - start < total:
+                break
+            pkt = (buf[start] << 8) | buf[start + 1]
+            self._start = start + total
+            yield pkt, view[start:start + total]
+            start += total
+
+    def pending_bytes(self) -> int:
+        return self._end - self._start
@@ -1,19 +1,24 @@
+import itertools
 import random
 import struct
+import threading
 import time
 
 from BitBuffer import BitBuffer
-from constants import class_3, class_1, class_64, class_111, class_66, GearType, EGG_TYPES, class_16, class_7
+from constants import class_3, class_1, class_64, class_111, class_66, GearType, DAILY_EGG_IDS, class_16, class_7
 
 HOST = "127.0.0.1"
 PORTS = [8080]# Developer mode Port : 7498
 PORT_HTTP = 8081
+RELAY_VALIDATE_EVERY = 64 # relayed packets are fully decoded 1 in N times (1 = every packet, 0 = never)
 
 class GlobalState:
     def __init__(self):
         self.current_characters = {}# Done
         self.used_tokens = {}# Done
         self.session_by_token = {}# Done
+        self.session_by_name = {}   # lowercase character name -> session
+        self.session_by_char = {}   # (user_id, character name) -> session
         self.level_registry = {}
         self.char_tokens = {} # Done
         self.token_char = {} # Done
@@ -33,13 +38,124 @@ all_sessions = GS.all_sessions
 SECRET_HEX = "815bfb010cd7b1b4e6aa90abc7679028"
 SECRET      = bytes.fromhex(SECRET_HEX)
 
-def _level_add(level, session):
-    s = GS.level_registry.setdefault(level, set())
-    s.add(session)
+#### Session indexes ####
+# GS.session_by_name / session_by_char / session_by_token, kept by index_session
+# (character select, game server login, level transfer, clientEntID learned) and
+# unindex_session (disconnect). A newer session for the same character replaces
+# the old one, an old session going away only removes the keys still pointing to it.
+
+_index_lock = threading.Lock()
+
+def _unindex_locked(session):
+    keys = session.index_keys
+    if keys is None:
+        return
+    name_key, char_key, token = keys
+    if GS.session_by_name.get(name_key) is session:
+        del GS.session_by_name[name_key]
+    if GS.session_by_char.get(char_key) is session:
+        del GS.session_by_char[char_key]
+    if GS.session_by_token.get(token) is session:
+        del GS.session_by_token[token]
+    session.index_keys = None
+
+def index_session(session):
+    """(Re)register the session under its current character name, (user_id, name) and clientEntID."""
+    name = session.current_character
+    with _index_lock:
+        _unindex_locked(session)
+        name_key = name.lower() if name else None
+        char_key = (session.user_id, name) if name else None
+        token = session.clientEntID
+        if name_key:
+            GS.session_by_name[name_key] = session
+            GS.session_by_char[char_key] = session
+        if token is not None:
+            GS.session_by_token[token] = session
+        session.index_keys = (name_key, char_key, token)
+
+def unindex_session(session):
+    with _index_lock:
+        _unindex_locked(session)
+
+def find_session_by_name(name):
+    """Online session playing `name` (any case), or None."""
+    if not name:
+        return None
+    return GS.session_by_name.get(name.lower())
+
+def find_session_by_char(user_id, char_name):
+    return GS.session_by_char.get((user_id, char_name))
+
+def find_session_by_token(token):
+    return GS.session_by_token.get(token)
+
+#### Level index ####
+# GS.level_registry : level name -> frozenset of the sessions whose player is spawned there.
+# This is the only list broadcasts use, level_join / level_leave keep it (and
+# session.player_spawned) in sync. The sets are replaced, never mutated, so a
+# broadcast can iterate one without a lock or a copy while other threads join/leave.
+
+_level_lock = threading.Lock()
+
+def _level_discard(session):
+    level = session.indexed_level
+    if level is None:
+        return
+    members = GS.level_registry.get(level, frozenset()) - {session}
+    if members:
+        GS.level_registry[level] = members
+    else:
+        GS.level_registry.pop(level, None)
+    session.indexed_level = None
+
+def level_join(session):
+    """Player spawned in session.current_level (also moves it out of its previous level)."""
+    with _level_lock:
+        _level_discard(session)
+        level = session.current_level
+        GS.level_registry[level] = GS.level_registry.get(level, frozenset()) | {session}
+        session.indexed_level = level
+        session.player_spawned = True
+
+def level_leave(session):
+    """Player despawned (level transfer, disconnect)."""
+    with _level_lock:
+        _level_discard(session)
+        session.player_spawned = False
+
+def level_sessions(level):
+    """Spawned sessions in `level` (a snapshot, safe to iterate)."""
+    return GS.level_registry.get(level, frozenset())
+
+def broadcast_to_level(level, pkt, exclude=None):
+    """Send pkt to every spawned player in `level`, except `exclude`."""
+    for other in GS.level_registry.get(level, ()):
+        if other is not exclude:
+            other.conn.sendall(pkt)
 
 # Helpers
 #############################################
 
+_relay_counter = itertools.count(1)
+
+def relay_packet(session, data, schema=None):
+    """
+    Forward a client packet unchanged to the other players in the same level.
+
+    The server does not use the fields of these packets, so they are not decoded.
+    When a schema (packet_schema.py) is given, a sample of the packets
+    (RELAY_VALIDATE_EVERY) is still fully decoded, a malformed one raises like
+    a normal handler would.
+    """
+    validate_relay_sample(data, schema)
+    broadcast_to_level(session.current_level, data, exclude=session)
+
+def validate_relay_sample(data, schema):
+    """Decode every RELAY_VALIDATE_EVERY-th relayed packet, a malformed one raises."""
+    if schema is not None and RELAY_VALIDATE_EVERY and next(_relay_counter) % RELAY_VALIDATE_EVERY == 0:
+        schema.decode(data[4:])
+
 def send_chat_status(session, text: str):
     """
     Send PKTTYPE_CHAT_STATUS (0x44) to show a chat status message
@@ -129,7 +245,7 @@ def build_destroy_entity_packet(entity_id: int) -> bytes:
     payload = bb.to_bytes()
     return struct.pack(">HH", 0x0D, len(payload)) + payload
 
-def handle_entity_destroy_server(session, entity_id: int, all_sessions: list):
+def handle_entity_destroy_server(session, entity_id: int):
     # Remove locally
     session.entities.pop(entity_id, None)
 
@@ -137,9 +253,7 @@ def handle_entity_destroy_server(session, entity_id: int, all_sessions: list):
     pkt = build_destroy_entity_packet(entity_id)
 
     # Send to everyone in same level
-    for s in all_sessions:
-        if s.player_spawned and s.current_level == session.current_level:
-            s.conn.sendall(pkt)
+    broadcast_to_level(session.current_level, pkt)
 
     #print(f"[EntityDestroy] Entity {entity_id} destroyed")
 
@@ -180,7 +294,7 @@ def send_forge_reroll_packet(
 def Client_Crash_Reports(session, data):
     _, length = struct.unpack_from(">HH", data, 0)
     payload = data[4:4 + length]
-    msg = payload.decode("utf-8", errors="replace")
+    msg = bytes(payload).decode("utf-8", errors="replace")
     print(f"[{session.addr}] CLIENT ERROR (0x7C): {msg}")
 
 def build_room_thought_packet(entity_id: int, text: str) -> bytes:
@@ -293,13 +407,10 @@ def pick_daily_eggs(count=3):
     """
     Picks 'count' random eggs from EGG_TYPES.
     """
-    valid = [e for e in EGG_TYPES if e.get("EggID", 0) > 0]
-
-    if len(valid) < count:
-        return [e["EggID"] for e in valid]
+    if len(DAILY_EGG_IDS) < count:
+        return list(DAILY_EGG_IDS)
 
-    chosen = random.sample(valid, count)
-    return [e["EggID"] for e in chosen]
+    return random.sample(DAILY_EGG_IDS, count)
 
 def send_pet_training_complete(session, type_id):
     bb = BitBuffer()
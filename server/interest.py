@@ -0,0 +1,254 @@
+"""
+Spatial interest management for players in the same level.
+
+Without it every movement packet (0x07) goes to every player in the level, so a
+busy town costs O(n²) bandwidth. Here each level keeps a grid of square cells
+(CELL_SIZE px) holding the spawned players, and every session carries
+`session.interest` : the other players close enough to see it.
+
+  - two players become interested in each other within INTEREST_RADIUS and stop
+    being interested past INTEREST_LEAVE_RADIUS (the gap keeps players standing
+    on the edge from spawning/despawning every step),
+  - when a pair becomes interested each one gets a fresh 0x0F spawn of the other
+    (Send_Entity_Data), when it stops each one gets a 0x0D destroy of the other,
+  - movement, emotes and cosmetic updates only go to session.interest
+    (broadcast_to_interest), anything a player missed while out of range is in
+    the spawn they get when coming back,
+  - so do the packets about the player's own entity or cast by it (powers,
+    projectiles, buffs, respawn, speed / offset changes, relay_to_interest) :
+    a client is never sent those for an entity it got a 0x0D destroy for.
+    Effects a player casts on an NPC are therefore only shown to the players
+    who see the caster.
+
+NPC state (0x3A hp changes, NPC destroy) and room scripting are still sent to
+the whole level, NPCs are spawned level wide by the client and their state has
+to stay in sync.
+
+A player whose position is not known yet when it spawns is placed at the
+position saved with its character (or the level origin) until its first move.
+
+Off by default (like movement_batch.MOVEMENT_BATCHING) : it changes what every
+player in a level can see.
+
+Interest is symmetric (A sees B <=> B sees A) and is only recomputed after a
+player moved RECHECK_DISTANCE px, neighbours are found in the 3x3 cells around it.
+"""
+
+import threading
+
+from globals import broadcast_to_level, build_destroy_entity_packet, level_sessions, validate_relay_sample
+
+INTEREST_ENABLED = False
+INTEREST_RADIUS = 1600          # px, players closer than this see each other
+INTEREST_LEAVE_RADIUS = 2000    # px, players further than this stop seeing each other
+CELL_SIZE = INTEREST_LEAVE_RADIUS  # the 3x3 cells around a player always cover the leave radius
+RECHECK_DISTANCE = 96           # px moved before interest is recomputed
+
+spawn_packet_builder = None     # function(session) -> framed 0x0F for its player (or None), set by entity.py
+
+def set_spawn_packet_builder(fn):
+    global spawn_packet_builder
+    spawn_packet_builder = fn
+
+
+class LevelGrid:
+    """Spawned players of one level, bucketed by cell."""
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}      # (cx, cy) -> set of sessions
+        self.positions = {}  # session -> (x, y, cell, last checked x, last checked y)
+        self.lock = threading.Lock()
+
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def nearby(self, cell):
+        cx, cy = cell
+        cells = self.cells
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                members = cells.get((cx + dx, cy + dy))
+                if members:
+                    yield from members
+
+    def place(self, session, x, y):
+        """Insert or move a session, returns its previous cell (None if it was not in the grid)."""
+        cell = self.cell_of(x, y)
+        old = self.positions.get(session)
+        old_cell = old[2] if old else None
+        if old_cell != cell:
+            if old_cell is not None:
+                members = self.cells[old_cell]
+                members.discard(session)
+                if not members:
+                    del self.cells[old_cell]
+            self.cells.setdefault(cell, set()).add(session)
+        lx, ly = (old[3], old[4]) if old else (x, y)
+        self.positions[session] = (x, y, cell, lx, ly)
+        return old_cell
+
+    def remove(self, session):
+        old = self.positions.pop(session, None)
+        if old is None:
+            return
+        members = self.cells.get(old[2])
+        if members is not None:
+            members.discard(session)
+            if not members:
+                del self.cells[old[2]]
+
+    def recompute(self, session):
+        """
+        Update session.interest (and the other side of every pair),
+        returns (entered, left) lists of sessions.
+        """
+        x, y, cell, _, _ = self.positions[session]
+        self.positions[session] = (x, y, cell, x, y)
+
+        enter_sq = INTEREST_RADIUS * INTEREST_RADIUS
+        leave_sq = INTEREST_LEAVE_RADIUS * INTEREST_LEAVE_RADIUS
+        current = session.interest
+        visible = set()
+        for other in self.nearby(cell):
+            if other is session:
+                continue
+            ox, oy = self.positions[other][:2]
+            d = (ox - x) * (ox - x) + (oy - y) * (oy - y)
+            if d <= enter_sq or (d <= leave_sq and other in current):
+                visible.add(other)
+
+        entered = [o for o in visible if o not in current]
+        left = [o for o in current if o not in visible]
+        # the sets are replaced, never mutated, broadcasts iterate them without the lock
+        session.interest = frozenset(visible)
+        for other in entered:
+            other.interest = other.interest | {session}
+        for other in left:
+            other.interest = other.interest - {session}
+        return entered, left
+
+
+_grids = {}
+_grids_lock = threading.Lock()
+
+def _grid(level):
+    grid = _grids.get(level)
+    if grid is None:
+        with _grids_lock:
+            grid = _grids.setdefault(level, LevelGrid())
+    return grid
+
+
+def _player_position(session):
+    ent = session.entities.get(session.clientEntID) or {}
+    x, y = ent.get("pos_x"), ent.get("pos_y")
+    if x is None or y is None:
+        return None
+    return x, y
+
+
+def _spawn_position(session):
+    """Where to put a player spawned before its entity has a position : its saved position, else the origin."""
+    saved = (session.current_char_dict or {}).get("CurrentLevel")
+    if isinstance(saved, dict) and saved.get("name") == session.current_level:
+        x, y = saved.get("x"), saved.get("y")
+        if x is not None and y is not None:
+            return x, y
+    return 0, 0
+
+
+def _exchange_spawns(session, entered, left):
+    if entered:
+        own_spawn = spawn_packet_builder(session) if spawn_packet_builder else None
+        for other in entered:
+            if own_spawn:
+                other.conn.sendall(own_spawn)
+            other_spawn = spawn_packet_builder(other) if spawn_packet_builder else None
+            if other_spawn:
+                session.conn.sendall(other_spawn)
+    if left:
+        own_destroy = build_destroy_entity_packet(session.clientEntID)
+        for other in left:
+            other.conn.sendall(own_destroy)
+            if other.clientEntID is not None:
+                session.conn.sendall(build_destroy_entity_packet(other.clientEntID))
+
+
+def enter(session):
+    """
+    Player just spawned (after level_join). Registers it in the level grid and
+    exchanges spawns with the players around it.
+    """
+    if not INTEREST_ENABLED:
+        return
+    # never leave a spawned player out of the grid, moved() only tracks players in it
+    pos = _player_position(session) or _spawn_position(session)
+    grid = _grid(session.current_level)
+    with grid.lock:
+        grid.place(session, *pos)
+        entered, _ = grid.recompute(session)
+    _exchange_spawns(session, entered, ())
+
+
+def moved(session):
+    """Player position changed (0x07), updates interest once it moved far enough."""
+    pos = _player_position(session)
+    if not INTEREST_ENABLED or pos is None:
+        return
+    grid = _grids.get(session.current_level)
+    if grid is None:
+        return
+    x, y = pos
+    with grid.lock:
+        if session not in grid.positions:
+            return
+        old_cell = grid.place(session, x, y)
+        _, _, cell, lx, ly = grid.positions[session]
+        if old_cell == cell and abs(x - lx) + abs(y - ly) < RECHECK_DISTANCE:
+            return
+        entered, left = grid.recompute(session)
+    _exchange_spawns(session, entered, left)
+
+
+def leave(session, level=None):
+    """
+    Player despawned (level transfer, disconnect). Its destroy is already sent to
+    the whole level by handle_entity_destroy_server, only the sets are cleared here.
+    """
+    grid = _grids.get(level or session.current_level)
+    if grid is not None:
+        with grid.lock:
+            grid.remove(session)
+            for other in session.interest:
+                other.interest = other.interest - {session}
+    session.interest = frozenset()
+
+
+def interest_sessions(session):
+    """The other players that can see `session` (everyone else in the level when interest is off)."""
+    if not INTEREST_ENABLED:
+        return [s for s in level_sessions(session.current_level) if s is not session]
+    return session.interest
+
+
+def broadcast_to_interest(session, pkt):
+    """Send pkt to the players that can see `session`."""
+    if not INTEREST_ENABLED:
+        broadcast_to_level(session.current_level, pkt, exclude=session)
+        return
+    for other in session.interest:
+        other.conn.sendall(pkt)
+
+
+def relay_to_interest(session, data, schema=None):
+    """globals.relay_packet for packets cast by the player : forwarded unchanged to the players that can see it."""
+    validate_relay_sample(data, schema)
+    broadcast_to_interest(session, data)
+
+
+def broadcast_entity_update(session, entity_id, pkt):
+    """An update of entity_id : to the players that see `session` when it is its own player, else level wide."""
+    if entity_id == session.clientEntID:
+        broadcast_to_interest(session, pkt)
+    else:
+        broadcast_to_level(session.current_level, pkt, exclude=session)
@@ -2,14 +2,18 @@ import os
 import struct
 
 import missions
+import movement_batch
 from BitBuffer import BitBuffer
-from accounts import load_characters, save_characters
+from accounts import save_characters
 from WorldEnter import build_enter_world_packet
 from bitreader import BitReader
-from constants import door, class_119, Entity, _load_json
-from globals import send_admin_chat, handle_entity_destroy_server, all_sessions, GS, PORTS, HOST
-
-DATA_DIR = "data"
+from char_repo import char_repo
+from constants import door, class_119, _load_json
+from data_bundle import DATA_DIR
+import interest
+from globals import send_admin_chat, handle_entity_destroy_server, GS, PORTS, HOST, level_leave, index_session
+from interest import broadcast_to_interest
+from packet_schema import ENTITY_INCREMENTAL_UPDATE
 
 _raw_level_config = _load_json(os.path.join(DATA_DIR, "level_config.json"), {})
 _door_list        = _load_json(os.path.join(DATA_DIR, "door_map.json"), [])
@@ -319,9 +323,11 @@ def handle_level_transfer_request(session, data):
     if session.clientEntID in session.entities:
         del session.entities[session.clientEntID]
         print(f"[{session.addr}] Removed entity {session.clientEntID} from level {old_level}")
-        handle_entity_destroy_server(session, session.clientEntID, all_sessions)
+        handle_entity_destroy_server(session, session.clientEntID)
     # Prepare for upcoming level transition
-    session.player_spawned = False
+    interest.leave(session)
+    movement_batch.discard(session)
+    level_leave(session)
 
     # Ensure we know user_id
     if not session.user_id:
@@ -331,10 +337,11 @@ def handle_level_transfer_request(session, data):
             return
         session.user_id = token_info[0]
 
-    # Reload latest characters, ensure we're pointing to the right one
-    session.char_list = load_characters(session.user_id)
+    # Shared character list (char_repo), ensure we're pointing to the right one
+    session.char_list = char_repo.attach(session)
     session.current_character = char["name"]
     session.authenticated = True
+    index_session(session)
 
     # Resolve mission/special door overrides
     target_level = resolve_special_mission_doors(session, char, old_level, target_level)
@@ -487,31 +494,28 @@ def handle_request_door_state(session, data):
 
 
 def handle_entity_incremental_update(session, data):
-    payload = data[4:]
-    br = BitReader(payload)
-    entity_id = br.read_method_4()
+    fields = ENTITY_INCREMENTAL_UPDATE.decode(data[4:])
+    entity_id = fields["entity_id"]
     is_self = (entity_id == session.clientEntID)
 
     if is_self and not session.player_spawned:
         return
 
-    delta_x = br.read_method_45()
-    delta_y = br.read_method_45()
-    delta_vx = br.read_method_45()
-
-    STATE_BITS = Entity.const_316
-    ent_state = br.read_method_6(STATE_BITS)
+    delta_x = fields["delta_x"]
+    delta_y = fields["delta_y"]
+    delta_vx = fields["delta_vx"]
+    ent_state = fields["ent_state"]
 
     flags = {
-        'b_left':      bool(br.read_method_15()),
-        'b_running':   bool(br.read_method_15()),
-        'b_jumping':   bool(br.read_method_15()),
-        'b_dropping':  bool(br.read_method_15()),
-        'b_backpedal': bool(br.read_method_15()),
+        'b_left':      fields["b_left"],
+        'b_running':   fields["b_running"],
+        'b_jumping':   fields["b_jumping"],
+        'b_dropping':  fields["b_dropping"],
+        'b_backpedal': fields["b_backpedal"],
     }
 
-    is_airborne = bool(br.read_method_15())
-    velocity_y = br.read_method_24() if is_airborne else 0
+    # only sent while airborne
+    velocity_y = fields["velocity_y"] or 0
 
     # --- calculate new position ---
     ent = session.entities.get(entity_id)
@@ -523,13 +527,14 @@ def handle_entity_incremental_update(session, data):
     if old_x is None or old_y is None:
         return
 
+    old_vx = ent.get("velocity_x", 0)
     new_x = old_x + delta_x
     new_y = old_y + delta_y
 
     ent.update({
         "pos_x": new_x,
         "pos_y": new_y,
-        "velocity_x": ent.get("velocity_x", 0) + delta_vx,
+        "velocity_x": old_vx + delta_vx,
         "velocity_y": velocity_y,
         "ent_state": ent_state,
         **flags
@@ -553,6 +558,10 @@ def handle_entity_incremental_update(session, data):
                         char["CurrentLevel"]["y"] = new_y
                     break
 
-    for other in GS.all_sessions:
-        if other is not session and other.player_spawned and other.current_level == session.current_level:
-            other.conn.sendall(data)
\ No newline at end of file
+    if is_self:
+        interest.moved(session)
+    if movement_batch.MOVEMENT_BATCHING:
+        # sent coalesced on the next movement tick
+        movement_batch.mark_moved(session, entity_id, old_x, old_y, old_vx, fields["velocity_y"])
+    else:
+        broadcast_to_interest(session, data)
\ No newline at end of file
@@ -8,13 +8,15 @@ import time
 
 from Character import build_login_character_list_bitpacked
 from WorldEnter import build_enter_world_packet, Player_Data_Packet
-from accounts import get_or_create_user_id, load_accounts, build_popup_packet, is_character_name_taken, load_characters, save_characters
+from accounts import get_or_create_user_id, find_user_id, build_popup_packet, reserve_character_name, save_characters
 from ai_logic import AI_ENABLED, ensure_ai_loop, run_ai_loop
 from bitreader import BitReader
+from char_repo import char_repo
 from constants import EntType, load_class_template
 from entity import Send_Entity_Data, ensure_level_npcs, normalize_entity_for_send
-from globals import SECRET, _level_add, all_sessions, GS, HOST, PORTS
+from globals import SECRET, GS, HOST, PORTS, index_session
 from level_config import LEVEL_CONFIG, get_spawn_coordinates
+from scheduler import schedule_hatchery_refresh
 from socials import get_group_for_session, online_group_members, update_session_group_cache, build_group_update_packet
 
 def handle_login_version(session, data):
@@ -45,7 +47,7 @@ def handle_login_create(session, data):
 
     session.user_id = int(get_or_create_user_id(email))
     session.authenticated = True
-    session.char_list = load_characters(session.user_id)
+    session.char_list = char_repo.attach(session)
 
     pkt = build_login_character_list_bitpacked(session.user_id, session.char_list)
     session.conn.sendall(pkt)
@@ -60,8 +62,7 @@ def handle_login_authenticate(session, data):
     encrypted_password = br.read_method_26()
     legacy_auth_key = br.read_method_26()
 
-    accounts = load_accounts()
-    user_id = accounts.get(email)
+    user_id = find_user_id(email)
 
     if not user_id:
         session.conn.sendall(
@@ -71,7 +72,7 @@ def handle_login_authenticate(session, data):
         return
 
     session.user_id = user_id
-    session.char_list = load_characters(session.user_id)
+    session.char_list = char_repo.attach(session)
     session.authenticated = True
 
     pkt = build_login_character_list_bitpacked(session.user_id, session.char_list)
@@ -93,14 +94,6 @@ def handle_login_character_create(session, data):
     shirt_color = br.read_method_20(EntType.CHAR_COLOR_BITSTOSEND)
     pant_color = br.read_method_20(EntType.CHAR_COLOR_BITSTOSEND)
 
-    if is_character_name_taken(name):
-        session.conn.sendall(build_popup_packet(
-            "Character name is unavailable. Please choose a new name.",
-            disconnect=False
-        ))
-        print(f"[{session.addr}] [0x17] Name taken: {name}")
-        return
-
     base_template = load_class_template(class_name)
     new_char = copy.deepcopy(base_template)
     new_char.update({
@@ -117,6 +110,15 @@ def handle_login_character_create(session, data):
         "pantColor": pant_color,
     })
 
+    # reserve once the character is built, a template that fails to load must not keep the name
+    if not reserve_character_name(name, session.user_id):
+        session.conn.sendall(build_popup_packet(
+            "Character name is unavailable. Please choose a new name.",
+            disconnect=False
+        ))
+        print(f"[{session.addr}] [0x17] Name taken: {name}")
+        return
+
     session.char_list.append(new_char)
     save_characters(session.user_id, session.char_list)
 
@@ -125,8 +127,7 @@ def handle_login_character_create(session, data):
 
     tk = session.ensure_token(new_char, target_level=current_level, previous_level=prev_level)
     session.clientEntID = tk
-    GS.session_by_token[tk] = session
-    _level_add(current_level, session)
+    index_session(session)
 
     level_config = LEVEL_CONFIG.get(current_level, ("LevelsNR.swf/a_Level_NewbieRoad", 1, 1, False))
 
@@ -174,8 +175,7 @@ def handle_character_select(session, data):
 
         tk = session.ensure_token(c, target_level=current_level, previous_level=prev_level)
         session.clientEntID = tk
-        GS.session_by_token[tk] = session
-        _level_add(current_level, session)
+        index_session(session)
 
         level_config = LEVEL_CONFIG.get(
             current_level, ("LevelsNR.swf/a_Level_NewbieRoad", 1, 1, False)
@@ -244,10 +244,11 @@ def handle_gameserver_login(session, data):
 
     session.clientEntID   = token
     session.authenticated = True
+    index_session(session)
     GS.current_characters[session.user_id] = session.current_character
 
     # Save/update character list
-    session.char_list = load_characters(session.user_id)
+    session.char_list = char_repo.attach(session)
     for i, c in enumerate(session.char_list):
         if c["name"] == char["name"]:
             session.char_list[i] = char
@@ -283,9 +284,12 @@ def handle_gameserver_login(session, data):
 
     session.conn.sendall(welcome)
 
+    # egg set notify while online, fires right away when a new set is already waiting (once per set, EggNotifySent)
+    schedule_hatchery_refresh(session.user_id, char["name"], char.get("EggResetTime", 0))
+
     gid, group = get_group_for_session(session)
     if gid and group:
-        members = online_group_members(group, all_sessions)
+        members = online_group_members(group)
         update_session_group_cache(gid, members)
         pkt = build_group_update_packet(members)
         for member, _ in members:
@@ -1,5 +1,8 @@
 import json
+import os
 from typing import Optional, Dict
+
+from data_bundle import load_json, DATA_DIR
 """
  if a missions has "Achievement": "True", it means that this missions is a special mission 
 """
@@ -21,13 +24,12 @@ def _parse_int(v, default=0) -> int:
     except Exception:
         return default
 
-def load_mission_defs(path: str = "data/MissionTypes.json") -> None:
+def load_mission_defs(path: str = os.path.join(DATA_DIR, "MissionTypes.json")) -> None:
     global _MISSION_DEFS_BY_ID, _MISSION_MAX_ID, _MISSION_EXTRA_BY_ID
     if _MISSION_DEFS_BY_ID is not None:
         return
 
-    with open(path, "r", encoding="utf-8") as f:
-        raw = json.load(f)
+    raw = load_json(path)
 
     defs: Dict[int, dict] = {}
     extra: Dict[int, dict] = {}
@@ -0,0 +1,180 @@
+"""
+Optional tick based batching of movement (0x07) updates.
+
+Without it handle_entity_incremental_update relays every 0x07 the moment it
+arrives, so with 20 players moving each peer gets hundreds of tiny writes per
+second. With MOVEMENT_BATCHING on the handler only updates session.entities
+(as before) and marks the entity dirty. Every 1 / MOVEMENT_TICK_RATE seconds :
+
+  - one 0x07 per dirty entity is built from session.entities, the deltas are
+    current state - the state peers were last sent (summed deltas, latest
+    flags / ent_state / velocity_y),
+  - every recipient gets all the 0x07s for the entities it can see
+    (interest.interest_sessions) concatenated in one sendall, one TCP write.
+
+The client still receives plain 0x07 packets, nothing changes on its side.
+
+A player spawned in the middle of a tick is sent the state its peers were last
+sent (published_position), the next tick's delta brings it up to date.
+"""
+
+import threading
+import time
+
+import interest
+from globals import level_sessions
+from packet_schema import ENTITY_INCREMENTAL_UPDATE
+
+MOVEMENT_BATCHING = False
+MOVEMENT_TICK_RATE = 20          # ticks per second
+MOVEMENT_STATS_INTERVAL = 60     # seconds between stats prints, 0 = never
+
+_published = {}   # session -> {entity_id: [x, y, vx]} as last sent to its peers
+_dirty = {}       # level -> {session: {entity_id: [velocity_y, updates received]}}
+_lock = threading.Lock()
+_thread = None
+
+stats = {
+    "updates_in": 0,       # 0x07 received
+    "updates_out": 0,      # 0x07 sent after coalescing (one per entity per recipient per tick)
+    "writes": 0,           # sendall calls
+    "relay_writes": 0,     # sendall calls relaying every 0x07 on arrival would have made
+}
+
+
+def ensure_movement_tick():
+    """Start the tick thread (safe to call repeatedly)."""
+    global _thread
+    if _thread is not None:
+        return
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run_movement_tick, daemon=True)
+            _thread.start()
+
+
+def mark_moved(session, entity_id, old_x, old_y, old_vx, velocity_y):
+    """
+    Called by the 0x07 handler after session.entities was updated.
+    old_* is the state before this update, the base of the first delta sent for the entity.
+    """
+    ensure_movement_tick()
+    with _lock:
+        stats["updates_in"] += 1
+        published = _published.setdefault(session, {})
+        if entity_id not in published:
+            published[entity_id] = [old_x, old_y, old_vx]
+        entities = _dirty.setdefault(session.current_level, {}).setdefault(session, {})
+        entry = entities.get(entity_id)
+        if entry is None:
+            entities[entity_id] = [velocity_y, 1]
+        else:
+            entry[0] = velocity_y
+            entry[1] += 1
+
+
+def published_position(session, entity_id, ent):
+    """(x, y, vx) of the entity as its peers know it, differs from `ent` while a tick is pending."""
+    pub = _published.get(session, {}).get(entity_id)
+    if pub is None:
+        return ent.get("pos_x", 0), ent.get("pos_y", 0), ent.get("velocity_x", 0)
+    return tuple(pub)
+
+
+def discard(session, level=None):
+    """Forget a session that left its level (nothing pending is sent)."""
+    with _lock:
+        _published.pop(session, None)
+        level_dirty = _dirty.get(level or session.current_level)
+        if level_dirty:
+            level_dirty.pop(session, None)
+
+
+def build_update(entity_id, ent, published, velocity_y):
+    """0x07 taking peers from `published` to the current state of `ent`, advances `published`."""
+    x = ent.get("pos_x", published[0])
+    y = ent.get("pos_y", published[1])
+    vx = ent.get("velocity_x", published[2])
+    pkt = ENTITY_INCREMENTAL_UPDATE.build_packet({
+        "entity_id": entity_id,
+        "delta_x": int(x - published[0]),
+        "delta_y": int(y - published[1]),
+        "delta_vx": int(vx - published[2]),
+        "ent_state": ent.get("ent_state", 0),
+        "b_left": ent.get("b_left", False),
+        "b_running": ent.get("b_running", False),
+        "b_jumping": ent.get("b_jumping", False),
+        "b_dropping": ent.get("b_dropping", False),
+        "b_backpedal": ent.get("b_backpedal", False),
+        "velocity_y": velocity_y,
+    })
+    published[:] = (x, y, vx)
+    return pkt
+
+
+def flush_level(level, level_dirty):
+    """Build this tick's 0x07s for one level and send each recipient its batch."""
+    outbox = {}   # recipient -> [framed 0x07, ...]
+    spawned = level_sessions(level)
+    for session, entities in level_dirty.items():
+        if session not in spawned:
+            continue
+        peers = interest.interest_sessions(session)
+        packets = []
+        with _lock:
+            published = _published.get(session, {})
+            for entity_id, (velocity_y, received) in entities.items():
+                ent = session.entities.get(entity_id)
+                if ent is None or entity_id not in published:
+                    continue
+                packets.append(build_update(entity_id, ent, published[entity_id], velocity_y))
+                # what relaying on arrival would have written : every update to every peer
+                stats["relay_writes"] += received * len(peers)
+        if not packets:
+            continue
+        for other in peers:
+            outbox.setdefault(other, []).extend(packets)
+
+    for other, packets in outbox.items():
+        stats["updates_out"] += len(packets)
+        stats["writes"] += 1
+        try:
+            other.conn.sendall(b"".join(packets))
+        except Exception as e:
+            print(f"[MOVE] send to {other.addr} failed: {e}")
+
+
+def flush_all():
+    global _dirty
+    with _lock:
+        dirty, _dirty = _dirty, {}
+    for level, level_dirty in dirty.items():
+        flush_level(level, level_dirty)
+
+
+def print_stats():
+    saved = stats["relay_writes"] - stats["writes"]
+    print(
+        f"[MOVE] updates in={stats['updates_in']} out={stats['updates_out']} "
+        f"writes={stats['writes']} (relay would have done {stats['relay_writes']}, saved {saved})"
+    )
+
+
+def run_movement_tick():
+    interval = 1.0 / MOVEMENT_TICK_RATE
+    next_tick = time.monotonic()
+    next_stats = next_tick + MOVEMENT_STATS_INTERVAL
+    while True:
+        next_tick += interval
+        delay = next_tick - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_tick = time.monotonic()   # fell behind, don't burst
+        try:
+            flush_all()
+        except Exception as e:
+            print(f"[MOVE] tick error: {e}")
+        if MOVEMENT_STATS_INTERVAL and time.monotonic() >= next_stats:
+            print_stats()
+            next_stats += MOVEMENT_STATS_INTERVAL
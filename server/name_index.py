@@ -0,0 +1,126 @@
+"""
+In-memory index of character names (lowercase) -> user_id.
+
+is_character_name_taken used to open and parse every save. The index is loaded
+on first use from NAME_INDEX_PATH, or built once from every stored save when
+the file is missing, and then answers name checks with a dict lookup.
+
+Changes are made under one lock, so reserve() is a race-free check-and-insert :
+two sessions creating the same name at once, one gets it. Every change is
+appended to the index file ("+name<TAB>user_id" / "-name") and fsynced before
+it is acknowledged. On load the log is replayed and rewritten compacted.
+Delete the file to rebuild the index from the saves.
+"""
+
+import os
+import threading
+
+NAME_INDEX_PATH = "saves/names.idx"
+
+
+def name_key(name) -> str:
+    return str(name or "").strip().lower()
+
+
+class NameIndex:
+    def __init__(self, path=NAME_INDEX_PATH, source=None):
+        self.path = path
+        self._source = source       # () -> iterable of (name, user_id), used when there is no index file
+        self._names = None          # name_key -> user_id, None until loaded
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _load(self):
+        names = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break   # torn last append
+                    if line.startswith("+"):
+                        name, _, user_id = line[1:-1].rpartition("\t")
+                        names[name] = int(user_id)
+                    elif line.startswith("-"):
+                        names.pop(line[1:-1], None)
+        elif self._source is not None:
+            for name, user_id in self._source():
+                names.setdefault(name_key(name), int(user_id))
+            print(f"[NAMES] Built the character name index from the saves ({len(names)} names)")
+        self._rewrite(names)
+        self._names = names
+
+    def _rewrite(self, names):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(f"+{name}\t{user_id}\n" for name, user_id in names.items())
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _append(self, line):
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _ensure_loaded(self):
+        if self._names is None:
+            self._load()
+
+    def load(self):
+        """Load (or build) the index now instead of on the first name check."""
+        with self._lock:
+            self._ensure_loaded()
+
+    def owner(self, name):
+        """user_id owning the name, or None."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._names.get(name_key(name))
+
+    def reserve(self, name, user_id) -> bool:
+        """Claim a free name for user_id, False when it is taken (by anyone)."""
+        key = name_key(name)
+        with self._lock:
+            self._ensure_loaded()
+            if key in self._names or "\n" in key:
+                return False
+            self._append(f"+{key}\t{int(user_id)}\n")
+            self._names[key] = int(user_id)
+            return True
+
+    def release(self, name, user_id=None):
+        """Free a name (character deleted or renamed), only if user_id owns it when given."""
+        key = name_key(name)
+        with self._lock:
+            self._ensure_loaded()
+            owner = self._names.get(key)
+            if owner is None or (user_id is not None and owner != int(user_id)):
+                return False
+            self._append(f"-{key}\n")
+            del self._names[key]
+            return True
+
+    def rename(self, old_name, new_name, user_id) -> bool:
+        """Move user_id's character from old_name to a free new_name in one step."""
+        old_key, new_key = name_key(old_name), name_key(new_name)
+        with self._lock:
+            self._ensure_loaded()
+            if old_key == new_key:
+                return self._names.get(old_key) == int(user_id)
+            if new_key in self._names or "\n" in new_key:
+                return False
+            owned = self._names.get(old_key) == int(user_id)
+            self._append(f"+{new_key}\t{int(user_id)}\n" + (f"-{old_key}\n" if owned else ""))
+            self._names[new_key] = int(user_id)
+            if owned:
+                del self._names[old_key]
+            return True
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._names)
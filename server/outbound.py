@@ -0,0 +1,169 @@
+"""
+Per-session outbound queue.
+
+Broadcasts used to call other.conn.sendall(pkt) inline, so one slow or stalled
+client blocked the sender's handler thread (and with it the whole movement relay
+for that level). Now every session.conn queues the packet and returns at once,
+a writer drains the queue:
+
+  - threaded engine : BufferedConnection below, one writer thread per client
+  - asyncio engine  : async_server.TransportConnection, flushed by the event loop
+
+Everything queued since the last drain is joined and written with a single send,
+so the many small packets produced in the same tick cost one syscall.
+
+When a client falls too far behind (more than OUTBOUND_MAX_PENDING_BYTES waiting)
+OUTBOUND_OVERFLOW_POLICY decides what happens :
+
+  "drop_movement" : drop the oldest queued movement packets (0x07) to make room,
+                    disconnect only if that is not enough.
+                    Note : 0x07 carries position deltas, so peers may see that
+                    entity slightly off until its next update / respawn.
+  "disconnect"    : disconnect the client straight away.
+"""
+
+import socket
+import threading
+from collections import deque
+
+OUTBOUND_MAX_PENDING_BYTES = 256 * 1024
+OUTBOUND_OVERFLOW_POLICY = "drop_movement"   # "drop_movement" or "disconnect"
+OUTBOUND_COALESCE_LIMIT = 64 * 1024          # max bytes joined into one send
+
+DROPPABLE_PACKETS = {0x07}  # incremental entity updates
+
+
+class OutboundQueue:
+    def __init__(self, addr, max_pending_bytes=None, policy=None):
+        self.addr = addr
+        self.max_pending_bytes = max_pending_bytes or OUTBOUND_MAX_PENDING_BYTES
+        self.policy = policy or OUTBOUND_OVERFLOW_POLICY
+        self.pending_bytes = 0
+        self.dropped_packets = 0
+        self.overflowed = False
+        self._queue = deque()
+        self._lock = threading.Lock()
+
+    def push(self, data) -> bool:
+        """
+        Queue one packet. Returns False if the client fell too far behind
+        and has to be disconnected.
+        """
+        pkt = bytes(data)  # callers may hand us a reusable buffer / memoryview
+        size = len(pkt)
+        with self._lock:
+            if self.overflowed:
+                return False
+            if self.pending_bytes + size > self.max_pending_bytes and not self._make_room(size):
+                if self.policy == "drop_movement" and _packet_type(pkt) in DROPPABLE_PACKETS:
+                    # nothing older left to drop, this update is the one that goes
+                    self.dropped_packets += 1
+                    return True
+                self.overflowed = True
+                self._queue.clear()
+                self.pending_bytes = 0
+                print(f"[{self.addr}] Outbound queue overflow, disconnecting client")
+                return False
+            self._queue.append(pkt)
+            self.pending_bytes += size
+            return True
+
+    def _make_room(self, incoming_size: int) -> bool:
+        if self.policy != "drop_movement":
+            return False
+
+        needed = self.pending_bytes + incoming_size - self.max_pending_bytes
+        kept = deque()
+        while self._queue and needed > 0:
+            pkt = self._queue.popleft()
+            if _packet_type(pkt) in DROPPABLE_PACKETS:
+                self.pending_bytes -= len(pkt)
+                self.dropped_packets += 1
+                needed -= len(pkt)
+            else:
+                kept.append(pkt)
+        kept.extend(self._queue)
+        self._queue = kept
+        return needed <= 0
+
+    def take(self, limit=None):
+        """Pop everything queued (up to limit bytes) as one coalesced chunk, or None."""
+        limit = limit or OUTBOUND_COALESCE_LIMIT
+        with self._lock:
+            if not self._queue:
+                return None
+            parts = [self._queue.popleft()]
+            size = len(parts[0])
+            while self._queue and size + len(self._queue[0]) <= limit:
+                pkt = self._queue.popleft()
+                parts.append(pkt)
+                size += len(pkt)
+            self.pending_bytes -= size
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+
+def _packet_type(pkt: bytes) -> int:
+    return int.from_bytes(pkt[0:2], "big") if len(pkt) >= 2 else -1
+
+
+class BufferedConnection:
+    """
+    Wraps a client socket for the threaded engine.
+    sendall() queues and returns, a dedicated writer thread does the blocking send.
+    recv / recv_into / settimeout go straight to the socket.
+    """
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.queue = OutboundQueue(addr)
+        self._wakeup = threading.Event()
+        self._closed = False
+        threading.Thread(target=self._writer_loop, daemon=True).start()
+
+    def sendall(self, data):
+        if self._closed:
+            return
+        if not self.queue.push(data):
+            self._abort()
+            return
+        self._wakeup.set()
+
+    def recv(self, bufsize):
+        return self.sock.recv(bufsize)
+
+    def recv_into(self, buffer, nbytes=0):
+        return self.sock.recv_into(buffer, nbytes)
+
+    def settimeout(self, seconds):
+        self.sock.settimeout(seconds)
+
+    def close(self):
+        """Stop accepting packets, the writer flushes what is left and closes the socket."""
+        self._closed = True
+        self._wakeup.set()
+
+    def _abort(self):
+        # wakes up the handler thread blocked in recv(), it then runs the normal disconnect path
+        self._closed = True
+        self._wakeup.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _writer_loop(self):
+        try:
+            while True:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                while (chunk := self.queue.take()) is not None:
+                    self.sock.sendall(chunk)
+                if self._closed:
+                    break
+        except OSError:
+            pass
+        finally:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
@@ -0,0 +1,736 @@
+"""
+Declarative packet layouts.
+
+A packet is described once as a list of nodes, using the same method_N names
+as BitBuffer / BitReader :
+
+    Field("entity_id", "method_4")                  prefixed / signed / string fields
+    Field("ent_state", "method_6", Entity.const_316)  fixed width fields
+    Flagged(Field("velocity_y", "method_24"))        1 presence bit, value or None
+    Flagged("target_pos", [Field(...), ...])         1 presence bit, dict or None
+    Branch("is_player", [then...], [else...])        1 bit picks one of two layouts
+    If("is_player", [then...], [else...])            earlier field picks the layout, no bit
+    Fixed("gears", 6, node)                          exactly N items, unrolled
+    Repeat("buffs", "method_4", [nodes...])          method_4 count + items
+
+Inside Fixed the width may be a function of the item index (talent slots).
+
+Schema(...) compiles the layout at import time into two plain python functions,
+straight-line code with no BitReader / BitBuffer method calls per field :
+
+    schema.decode(payload) -> dict     whole payload is one big int, fields are shifted out
+    schema.encode(values)  -> bytes    fields are shifted into one int, padded to a byte
+
+encode() produces exactly what the matching write_method_* calls produce
+(write_method_9(0) quirk included), decode() reads what read_method_* reads.
+Reading past the end raises ValueError, like BitReader.
+The generated source is kept on schema.decode_source / schema.encode_source.
+"""
+
+import struct
+
+from constants import Entity, EntType, GearType, class_64, class_21, class_7, class_20, class_3, class_118, Game, PowerType, method_277
+
+#### Layout nodes ####
+
+class Field:
+    def __init__(self, name, method, width=None):
+        if method not in _METHODS:
+            raise ValueError(f"Unknown field method: {method}")
+        if method in _FIXED_WIDTH and width is None:
+            raise ValueError(f"{method} needs a width ({name})")
+        self.name = name
+        self.method = method
+        self.width = width
+
+
+class Flagged:
+    def __init__(self, name_or_node, nodes=None):
+        if nodes is None:
+            self.name = name_or_node.name
+            self.node = name_or_node
+            self.nodes = None
+        else:
+            self.name = name_or_node
+            self.node = None
+            self.nodes = nodes
+
+
+class Branch:
+    def __init__(self, name, then, otherwise):
+        self.name = name
+        self.then = then
+        self.otherwise = otherwise
+
+
+class If:
+    def __init__(self, name, then, otherwise=()):
+        self.name = name
+        self.then = then
+        self.otherwise = otherwise
+
+
+class Fixed:
+    def __init__(self, name, count, item):
+        self.name = name
+        self.count = count
+        self.item = item
+
+
+class Repeat:
+    def __init__(self, name, count_method, item):
+        self.name = name
+        self.count_method = count_method
+        self.item = item
+
+
+# method -> kind
+_METHODS = {
+    "method_15": "bool",
+    "method_6": "bits", "method_20": "bits", "method_11": "bits",
+    "method_393": "byte",
+    "method_4": "prefix4", "method_9": "prefix9", "method_236": "prefix3", "method_91": "prefix3",
+    "method_45": "signed4", "method_24": "signed9", "method_739": "signed3", "method_706": "signed3",
+    "method_13": "str13", "method_26": "str26",
+    "method_309": "float", "method_560": "float",
+}
+_FIXED_WIDTH = {"method_6", "method_20", "method_11"}
+
+
+#### Runtime helpers used by the generated code ####
+
+def _str13(raw: bytes) -> str:
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('latin1')
+
+
+def _str26(raw: bytes) -> str:
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('latin-1', errors='replace')
+
+
+def _float_from_bits(bits: int) -> float:
+    return struct.unpack('>f', struct.pack('>I', bits))[0]
+
+
+def _float_bits(val: float) -> int:
+    return struct.unpack('>I', struct.pack('>f', val))[0]
+
+
+_RUNTIME = {"_str13": _str13, "_str26": _str26, "_float_from_bits": _float_from_bits, "_float_bits": _float_bits}
+
+
+#### Code generation ####
+
+class _Gen:
+    def __init__(self):
+        self.lines = []
+        self.depth = 1
+        self.counter = 0
+
+    def var(self, prefix):
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def emit(self, line):
+        self.lines.append("    " * self.depth + line)
+
+    def source(self, header):
+        return "\n".join([header] + self.lines) + "\n"
+
+
+def _width(field, index):
+    width = field.width
+    if callable(width):
+        if index is None:
+            raise ValueError(f"{field.name}: per-index width only allowed inside Fixed")
+        return width(index)
+    return width
+
+
+#### decode ####
+# `r` = bits remaining, the next field starts at bit (r - 1) of `n`.
+
+def _dec_take(g, target, width_expr, mask_expr=None):
+    mask_expr = mask_expr or f"((1 << {width_expr}) - 1)"
+    g.emit(f"r -= {width_expr}")
+    g.emit(f"{target} = (n >> r) & {mask_expr}")
+
+
+def _dec_prefixed(g, target, prefix_bits):
+    w = g.var("w")
+    g.emit(f"r -= {prefix_bits}")
+    g.emit(f"{w} = (((n >> r) & {(1 << prefix_bits) - 1}) + 1) * 2")
+    _dec_take(g, target, w)
+
+
+def _dec_field(g, field, index):
+    kind = _METHODS[field.method]
+    v = g.var("v")
+    if kind == "bool":
+        g.emit("r -= 1")
+        g.emit(f"{v} = (n >> r) & 1 == 1")
+    elif kind == "bits":
+        width = _width(field, index)
+        if width <= 0:
+            g.emit(f"{v} = 0")
+        else:
+            _dec_take(g, v, str(width), str((1 << width) - 1))
+    elif kind == "byte":
+        _dec_take(g, v, "8", "255")
+    elif kind.startswith("prefix"):
+        _dec_prefixed(g, v, 3 if kind == "prefix3" else 4)
+    elif kind.startswith("signed"):
+        sign = g.var("s")
+        g.emit("r -= 1")
+        g.emit(f"{sign} = (n >> r) & 1")
+        _dec_prefixed(g, v, 3 if kind == "signed3" else 4)
+        g.emit(f"if {sign}:")
+        g.emit(f"    {v} = -{v}")
+    elif kind in ("str13", "str26"):
+        length = g.var("l")
+        _dec_take(g, length, "16", "65535")
+        g.emit(f"r -= {length} * 8")
+        g.emit(f"{v} = _{kind}(((n >> r) & ((1 << ({length} * 8)) - 1)).to_bytes({length}, 'big'))")
+    elif kind == "float":
+        bits = g.var("f")
+        _dec_take(g, bits, "32", "0xFFFFFFFF")
+        g.emit(f"{v} = _float_from_bits({bits})")
+    return v
+
+
+def _dec_node(g, node, index):
+    """Emit code for one node, returns the local variable holding its value."""
+    if isinstance(node, Field):
+        return _dec_field(g, node, index)
+
+    v = g.var("v")
+    if isinstance(node, Flagged):
+        g.emit(f"{v} = None")
+        g.emit("r -= 1")
+        g.emit("if (n >> r) & 1:")
+        g.depth += 1
+        if node.node is not None:
+            g.emit(f"{v} = {_dec_node(g, node.node, index)}")
+        else:
+            _dec_into(g, v, node.nodes, index)
+        g.depth -= 1
+    elif isinstance(node, Fixed):
+        g.emit(f"{v} = []")
+        for i in range(node.count):
+            g.emit(f"{v}.append({_dec_item(g, node.item, i)})")
+    elif isinstance(node, Repeat):
+        count = _dec_field(g, Field(node.name, node.count_method), index)
+        g.emit(f"{v} = []")
+        g.emit(f"for _ in range({count}):")
+        g.depth += 1
+        g.emit(f"{v}.append({_dec_item(g, node.item, None)})")
+        g.depth -= 1
+    else:
+        raise TypeError(f"Not a value node: {node!r}")
+    return v
+
+
+def _dec_item(g, item, index):
+    if isinstance(item, list):
+        v = g.var("d")
+        _dec_into(g, v, item, index)
+        return v
+    return _dec_node(g, item, index)
+
+
+def _dec_into(g, target, nodes, index):
+    """Decode a list of nodes into a new dict `target`."""
+    g.emit(f"{target} = {{}}")
+    _dec_fill(g, target, nodes, index)
+
+
+def _dec_fill(g, target, nodes, index):
+    for node in nodes:
+        if isinstance(node, Branch):
+            g.emit("r -= 1")
+            g.emit("if (n >> r) & 1:")
+            g.depth += 1
+            g.emit(f"{target}[{node.name!r}] = True")
+            _dec_fill(g, target, node.then, index)
+            g.depth -= 1
+            g.emit("else:")
+            g.depth += 1
+            g.emit(f"{target}[{node.name!r}] = False")
+            _dec_fill(g, target, node.otherwise, index)
+            g.depth -= 1
+        elif isinstance(node, If):
+            g.emit(f"if {target}[{node.name!r}]:")
+            g.depth += 1
+            g.emit("pass")
+            _dec_fill(g, target, node.then, index)
+            g.depth -= 1
+            if node.otherwise:
+                g.emit("else:")
+                g.depth += 1
+                _dec_fill(g, target, node.otherwise, index)
+                g.depth -= 1
+        else:
+            g.emit(f"{target}[{node.name!r}] = {_dec_node(g, node, index)}")
+
+
+#### encode ####
+# `acc` holds every bit written so far, `nb` counts them.
+
+def _enc_bits(g, value_expr, width_expr, masked=False):
+    if masked:
+        g.emit(f"acc = (acc << {width_expr}) | {value_expr}")
+    else:
+        g.emit(f"acc = (acc << {width_expr}) | ({value_expr} & ((1 << {width_expr}) - 1))")
+    g.emit(f"nb += {width_expr}")
+
+
+def _enc_prefix_even(g, v, prefix_bits, check):
+    """write_method_4 (4-bit prefix, asserts) / write_method_91 (3-bit prefix)."""
+    w = g.var("w")
+    g.emit(f"{w} = (({v}.bit_length() if {v} > 0 else 1) + 1) & ~1")
+    g.emit(f"if {w} < 2:")
+    g.emit(f"    {w} = 2")
+    if check:
+        g.emit(f"assert {w} <= 32, f\"Value too large for method_4: {{{v}}}\"")
+    g.emit(f"acc = (acc << ({prefix_bits} + {w})) | (((({w} >> 1) - 1) & {(1 << prefix_bits) - 1}) << {w}) | ({v} & ((1 << {w}) - 1))")
+    g.emit(f"nb += {prefix_bits} + {w}")
+
+
+def _enc_prefix9(g, v):
+    """write_method_9, 0 writes prefix 15 and no value bits."""
+    w = g.var("w")
+    g.emit(f"{w} = {v}.bit_length()")
+    g.emit(f"{w} += {w} & 1")
+    g.emit(f"acc = (acc << (4 + {w})) | (((({w} >> 1) - 1) & 15) << {w}) | ({v} & ((1 << {w}) - 1))")
+    g.emit(f"nb += 4 + {w}")
+
+
+def _enc_field(g, field, value_expr, index):
+    kind = _METHODS[field.method]
+    v = g.var("v")
+    g.emit(f"{v} = {value_expr}")
+    if kind == "bool":
+        g.emit(f"acc = (acc << 1) | (1 if {v} else 0)")
+        g.emit("nb += 1")
+    elif kind == "bits":
+        width = _width(field, index)
+        if width > 0:
+            g.emit(f"acc = (acc << {width}) | ({v} & {(1 << width) - 1})")
+            g.emit(f"nb += {width}")
+    elif kind == "byte":
+        g.emit(f"acc = (acc << 8) | ({v} & 255)")
+        g.emit("nb += 8")
+    elif kind == "prefix4":
+        _enc_prefix_even(g, v, 4, check=True)
+    elif kind == "prefix3":
+        _enc_prefix_even(g, v, 3, check=False)
+    elif kind == "prefix9":
+        _enc_prefix9(g, v)
+    elif kind.startswith("signed"):
+        g.emit(f"if {v} < 0:")
+        g.emit("    acc = (acc << 1) | 1")
+        g.emit(f"    {v} = -{v}")
+        g.emit("else:")
+        g.emit("    acc <<= 1")
+        g.emit("nb += 1")
+        if kind == "signed4":
+            _enc_prefix_even(g, v, 4, check=True)
+        elif kind == "signed3":
+            _enc_prefix_even(g, v, 3, check=False)
+        else:
+            _enc_prefix9(g, v)
+    elif kind in ("str13", "str26"):
+        e = g.var("e")
+        if kind == "str13":
+            g.emit(f"{e} = str({v}).encode('utf-8')[:65535]")
+        else:
+            g.emit(f"{e} = ('' if {v} is None else {v}).encode('utf-8')[:65535]")
+        g.emit(f"acc = (((acc << 16) | len({e})) << (len({e}) * 8)) | int.from_bytes({e}, 'big')")
+        g.emit(f"nb += 16 + len({e}) * 8")
+    elif kind == "float":
+        g.emit(f"acc = (acc << 32) | _float_bits({v})")
+        g.emit("nb += 32")
+
+
+def _enc_node(g, node, value_expr, index):
+    if isinstance(node, Field):
+        _enc_field(g, node, value_expr, index)
+        return
+
+    v = g.var("x")
+    g.emit(f"{v} = {value_expr}")
+    if isinstance(node, Flagged):
+        g.emit(f"if {v} is None:")
+        g.emit("    acc <<= 1")
+        g.emit("else:")
+        g.depth += 1
+        g.emit("acc = (acc << 1) | 1")
+        if node.node is not None:
+            _enc_node(g, node.node, v, index)
+        else:
+            _enc_from(g, v, node.nodes, index)
+        g.depth -= 1
+        g.emit("nb += 1")
+    elif isinstance(node, Fixed):
+        for i in range(node.count):
+            _enc_item(g, node.item, f"{v}[{i}]", i)
+    elif isinstance(node, Repeat):
+        _enc_field(g, Field(node.name, node.count_method), f"len({v})", index)
+        item = g.var("i")
+        g.emit(f"for {item} in {v}:")
+        g.depth += 1
+        _enc_item(g, node.item, item, None)
+        g.depth -= 1
+    else:
+        raise TypeError(f"Not a value node: {node!r}")
+
+
+def _enc_item(g, item, value_expr, index):
+    if isinstance(item, list):
+        d = g.var("d")
+        g.emit(f"{d} = {value_expr}")
+        _enc_from(g, d, item, index)
+    else:
+        _enc_node(g, item, value_expr, index)
+
+
+def _enc_from(g, source, nodes, index):
+    """Encode a list of nodes reading their values from dict `source`."""
+    for node in nodes:
+        if isinstance(node, Branch):
+            g.emit(f"if {source}[{node.name!r}]:")
+            g.depth += 1
+            g.emit("acc = (acc << 1) | 1")
+            g.emit("nb += 1")
+            _enc_from(g, source, node.then, index)
+            g.depth -= 1
+            g.emit("else:")
+            g.depth += 1
+            g.emit("acc <<= 1")
+            g.emit("nb += 1")
+            _enc_from(g, source, node.otherwise, index)
+            g.depth -= 1
+        elif isinstance(node, If):
+            g.emit(f"if {source}[{node.name!r}]:")
+            g.depth += 1
+            g.emit("pass")
+            _enc_from(g, source, node.then, index)
+            g.depth -= 1
+            if node.otherwise:
+                g.emit("else:")
+                g.depth += 1
+                _enc_from(g, source, node.otherwise, index)
+                g.depth -= 1
+        else:
+            _enc_node(g, node, f"{source}[{node.name!r}]", index)
+
+
+#### Schema ####
+
+class Schema:
+    def __init__(self, name, pkt_type, nodes):
+        self.name = name
+        self.pkt_type = pkt_type
+        self.nodes = nodes
+
+        g = _Gen()
+        g.emit("n = int.from_bytes(payload, 'big')")
+        g.emit("r = len(payload) * 8")
+        _dec_into(g, "out", nodes, None)
+        g.emit("return out")
+        self.decode_source = g.source("def decode(payload):")
+        self.decode = self._compile(self.decode_source, "decode")
+
+        g = _Gen()
+        g.emit("acc = 0")
+        g.emit("nb = 0")
+        _enc_from(g, "values", nodes, None)
+        g.emit("pad = -nb & 7")
+        g.emit("return (acc << pad).to_bytes((nb + pad) >> 3, 'big')")
+        self.encode_source = g.source("def encode(values):")
+        self.encode = self._compile(self.encode_source, "encode")
+
+    def _compile(self, source, func_name):
+        namespace = dict(_RUNTIME)
+        exec(compile(source, f"<schema {self.name} {func_name}>", "exec"), namespace)
+        fn = namespace[func_name]
+        fn.__qualname__ = f"{self.name}.{func_name}"
+        return fn
+
+    def build_packet(self, values) -> bytes:
+        payload = self.encode(values)
+        return struct.pack(">HH", self.pkt_type, len(payload)) + payload
+
+
+#### Packet layouts ####
+
+# 0x07 incremental entity update (client -> server, relayed as is)
+ENTITY_INCREMENTAL_UPDATE = Schema("entity_incremental_update", 0x07, [
+    Field("entity_id", "method_4"),
+    Field("delta_x", "method_45"),
+    Field("delta_y", "method_45"),
+    Field("delta_vx", "method_45"),
+    Field("ent_state", "method_6", Entity.const_316),
+    Field("b_left", "method_15"),
+    Field("b_running", "method_15"),
+    Field("b_jumping", "method_15"),
+    Field("b_dropping", "method_15"),
+    Field("b_backpedal", "method_15"),
+    Flagged(Field("velocity_y", "method_24")),   # only while airborne
+])
+
+# 0x08 full entity update (client -> server)
+ENTITY_FULL_UPDATE = Schema("entity_full_update", 0x08, [
+    Field("entity_id", "method_9"),
+    Field("pos_x", "method_24"),
+    Field("pos_y", "method_24"),
+    Field("velocity_x", "method_24"),
+    Field("ent_name", "method_26"),
+    Field("team", "method_20", Entity.TEAM_BITS),
+    Field("is_player", "method_15"),
+    Field("y_offset", "method_706"),
+    Flagged("cue_data", [
+        Flagged(Field("character_name", "method_13")),
+        Flagged(Field("DramaAnim", "method_13")),
+        Flagged(Field("SleepAnim", "method_13")),
+    ]),
+    Flagged(Field("summoner_id", "method_9")),
+    Flagged(Field("power_id", "method_9")),
+    Field("ent_state", "method_20", Entity.const_316),
+    Field("b_left", "method_15"),
+    Field("b_running", "method_15"),
+    Field("b_jumping", "method_15"),
+    Field("b_dropping", "method_15"),
+    Field("b_backpedal", "method_15"),
+])
+
+# 0x09 power cast (client -> server, relayed as is)
+POWER_CAST = Schema("power_cast", 0x09, [
+    Field("ent_id", "method_9"),
+    Field("power_id", "method_9"),
+    Field("has_target_entity", "method_15"),   # unused by the client
+    Flagged("target_pos", [
+        Field("x", "method_24"),
+        Field("y", "method_24"),
+    ]),
+    Flagged(Field("projectile_id", "method_9")),
+    Field("is_charged", "method_15"),
+    Flagged("extra", [
+        Branch("is_secondary",
+               [Field("secondary_id", "method_9")],
+               [Field("tertiary_id", "method_9")]),
+    ]),
+    Flagged("flags", [
+        Flagged(Field("cooldown_tick", "method_9")),
+        Flagged(Field("mana_cost", "method_6", PowerType.const_423)),
+    ]),
+])
+
+# 0x0F entity spawn (server -> client), see entity.Send_Entity_Data for how the values are filled
+_GEAR = Flagged("gear", [
+    Field("gearID", "method_6", GearType.GEARTYPE_BITSTOSEND),
+    Field("tier", "method_6", GearType.const_176),
+    Field("rune1", "method_6", class_64.const_101),
+    Field("rune2", "method_6", class_64.const_101),
+    Field("rune3", "method_6", class_64.const_101),
+    Field("color1", "method_6", class_21.const_50),
+    Field("color2", "method_6", class_21.const_50),
+])
+
+_TALENT = Flagged("talent", [
+    Field("nodeID", "method_6", class_118.const_127),
+    Field("points", "method_6", method_277),   # points - 1, width depends on the slot
+])
+
+_BUFF = [
+    Field("type_id", "method_4"),
+    Field("param1", "method_4"),
+    Field("param2", "method_4"),
+    Field("param3", "method_4"),
+    Field("param4", "method_4"),
+    Flagged(Repeat("extra_data", "method_4", [
+        Field("id", "method_4"),
+        Repeat("values", "method_4", Field("value", "method_309")),
+    ])),
+]
+
+ENTITY_SPAWN = Schema("entity_spawn", 0x0F, [
+    Field("id", "method_4"),
+    Field("name", "method_13"),
+    Branch("is_player", [
+        Field("class", "method_13"),
+        Field("gender", "method_13"),
+        Field("headSet", "method_13"),
+        Field("hairSet", "method_13"),
+        Field("mouthSet", "method_13"),
+        Field("faceSet", "method_13"),
+        Field("hairColor", "method_6", 24),
+        Field("skinColor", "method_6", 24),
+        Field("shirtColor", "method_6", 24),
+        Field("pantColor", "method_6", 24),
+        Fixed("gears", EntType.MAX_SLOTS - 1, _GEAR),
+    ], []),
+    Field("x", "method_45"),
+    Field("y", "method_45"),
+    Field("v", "method_45"),
+    Field("team", "method_6", Entity.TEAM_BITS),
+    Branch("is_player", [
+        Field("idle_reset", "method_15"),
+        Field("spawn_fx", "method_15"),
+        Field("petID", "method_6", class_7.const_19),
+        Field("pet_special_id", "method_6", class_7.const_75),
+        Field("equippedMount", "method_6", class_20.const_297),
+        Field("activeConsumableID", "method_6", class_3.const_69),
+        Flagged(Fixed("abilities", 3, [
+            Field("abilityID", "method_6", class_7.const_19),
+            Field("rank", "method_6", class_7.const_75),
+        ])),
+    ], [
+        Field("untargetable", "method_15"),
+        Field("render_depth_offset", "method_739"),
+        Flagged(Field("behavior_speed", "method_4")),
+    ]),
+    Flagged(Field("character_name", "method_13")),
+    Flagged(Field("DramaAnim", "method_13")),
+    Flagged(Field("SleepAnim", "method_13")),
+    Flagged(Field("summonerId", "method_4")),
+    Flagged(Field("power_id", "method_4")),
+    Field("entState", "method_6", Entity.const_316),
+    Field("facing_left", "method_15"),
+    If("is_player", [
+        Field("level", "method_6", Entity.MAX_CHAR_LEVEL_BITS),
+        Field("MasterClass", "method_6", Game.const_209),
+    ]),
+    Flagged(Fixed("talents", class_118.NUM_TALENT_SLOTS, _TALENT)),   # always None for NPCs
+    Field("health_delta", "method_45"),
+    Repeat("buffs", "method_4", _BUFF),
+])
+
+
+#### Relayed packets ####
+# Forwarded unchanged by globals.relay_packet, only a sample is decoded (validation).
+
+# 0x0A power hit
+POWER_HIT = Schema("power_hit", 0x0A, [
+    Field("target_entity_id", "method_9"),
+    Field("source_entity_id", "method_9"),
+    Field("damage_value", "method_24"),
+    Field("power_type_id", "method_9"),
+    Flagged(Field("animation_override_id", "method_9")),
+    Flagged(Field("effect_override_id", "method_9")),   # projectile / effect index
+    Field("is_critical", "method_15"),
+])
+
+# 0x0B add buff
+ADD_BUFF = Schema("add_buff", 0x0B, [
+    Field("entity_id", "method_9"),
+    Field("caster_id", "method_9"),
+    Field("buff_type_id", "method_9"),
+    Field("duration", "method_9"),
+    Field("stack_count", "method_9"),
+    Field("sequence_id", "method_9"),
+    Flagged(Repeat("modifier_nodes", "method_9", [
+        Field("power_node_type_id", "method_9"),
+        Repeat("mod_values", "method_9", Field("mod_value", "method_560")),
+    ])),
+])
+
+# 0x0C remove buff
+REMOVE_BUFF = Schema("remove_buff", 0x0C, [
+    Field("entity_id", "method_9"),
+    Field("buff_type_id", "method_9"),
+    Field("instance_id", "method_9"),
+])
+
+# 0x0E projectile explode
+PROJECTILE_EXPLODE = Schema("projectile_explode", 0x0E, [
+    Field("entity_id", "method_9"),
+    Field("remote_missile", "method_9"),
+    Field("x", "method_24"),
+    Field("y", "method_24"),
+    Field("is_crit", "method_15"),
+])
+
+# 0x79 buff tick (damage over time)
+BUFF_TICK_DOT = Schema("buff_tick_dot", 0x79, [
+    Field("target_id", "method_9"),
+    Field("source_id", "method_9"),
+    Field("power_type_id", "method_9"),
+    Field("amount", "method_24"),
+])
+
+# dev / room scripting packets (dev.py)
+QUEST_PROGRESS_UPDATE = Schema("quest_progress_update", 0xB7, [
+    Field("progress", "method_4"),
+])
+
+LEVEL_STATE = Schema("level_state", 0x40, [
+    Field("state_a", "method_26"),
+    Field("state_b", "method_26"),
+])
+
+PLAY_SOUND = Schema("play_sound", 0xA8, [
+    Field("room_id", "method_4"),
+    Field("sound_name", "method_26"),
+    Field("volume_scaled", "method_4"),   # volume * 100
+])
+
+ACTION_UPDATE = Schema("action_update", 0xAA, [
+    Field("room_id", "method_4"),
+    Field("action_id", "method_4"),
+])
+
+EMOTE = Schema("emote", 0xA7, [
+    Field("room_id", "method_4"),
+    Field("actor_name", "method_26"),
+    Field("emote_name", "method_26"),
+    Field("loop", "method_15"),
+])
+
+ROOM_STATE_UPDATE = Schema("room_state_update", 0xA9, [
+    Field("room_id", "method_4"),
+    Field("room_state", "method_4"),
+])
+
+ROOM_EVENT_START = Schema("room_event_start", 0xA5, [
+    Field("room_id", "method_4"),
+    Field("flag", "method_15"),
+])
+
+ROOM_INFO_UPDATE = Schema("room_info_update", 0xAB, [
+    Field("room_id", "method_4"),
+    Field("info_a", "method_4"),
+    Field("info_b", "method_26"),
+    Field("info_c", "method_4"),
+    Field("info_d", "method_26"),
+])
+
+SET_UNTARGETABLE = Schema("set_untargetable", 0xAE, [
+    Field("entity_id", "method_4"),
+    Field("untargetable", "method_15"),
+])
+
+ROOM_CLOSE = Schema("room_close", 0xA6, [
+    Field("room_id", "method_4"),
+])
+
+ROOM_UNLOCK = Schema("room_unlock", 0xAD, [
+    Field("room_id", "method_4"),
+])
+
+ROOM_BOSS_INFO = Schema("room_boss_info", 0xAC, [
+    Field("room_id", "method_4"),
+    Field("boss1_id", "method_4"),
+    Field("boss1_name", "method_26"),
+    Field("boss2_id", "method_4"),
+    Field("boss2_name", "method_26"),
+])
+
+EMOTE_END = Schema("emote_end", 0x7F, [
+    Field("entity_id", "method_4"),
+])
@@ -2,10 +2,11 @@ import time
 
 from accounts import save_characters
 from bitreader import BitReader
-from constants import class_20, class_7, class_16, Game, EGG_TYPES, PET_TYPES
+from constants import class_20, class_7, class_16, Game, find_egg_def, find_pet_def
 from globals import build_hatchery_packet, pick_daily_eggs, send_premium_purchase, send_pet_training_complete, \
-    send_egg_hatch_start, send_new_pet_packet, GS
-from scheduler import schedule_pet_training, schedule_egg_hatch
+    send_egg_hatch_start, send_new_pet_packet
+from interest import broadcast_to_interest
+from scheduler import schedule_pet_training, schedule_egg_hatch, schedule_hatchery_refresh, cancel_timer
 
 
 # Helpers
@@ -46,12 +47,6 @@ def get_egg_hatch_time(egg_rank: int, first_pet: bool) -> int:
         return class_16.const_1093   # 6 days
     return class_16.const_907       # 10 days
 
-def find_egg_def(egg_id: int):
-    for e in EGG_TYPES:
-        if e.get("EggID") == egg_id:
-            return e
-    return None
-
 ##############################################################
 
 def handle_equip_pets(session, data):
@@ -96,13 +91,7 @@ def handle_mount_equip_packet(session, data):
     char["equippedMount"] = mount_id
     save_characters(session.user_id, session.char_list)
 
-    for other in GS.all_sessions:
-        if (
-            other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level
-        ):
-            other.conn.sendall(data)
+    broadcast_to_interest(session, data)
 
 
 def handle_request_hatchery_eggs(session, data):
@@ -134,6 +123,7 @@ def handle_request_hatchery_eggs(session, data):
         char["EggResetTime"] = reset_time
         char["OwnedEggsID"] = owned
         save_characters(session.user_id, session.char_list)
+        schedule_hatchery_refresh(session.user_id, session.current_character, reset_time)
 
     else:
         pass
@@ -205,6 +195,7 @@ def handle_pet_training_collect(session, data):
 
 def handle_pet_training_cancel(session, data):
     char = session.current_char_dict
+    cancel_timer(session.user_id, session.current_character, "pet_training")
     char["trainingPet"] = [{
         "typeID": 0,
         "special_id": 0,
@@ -227,6 +218,7 @@ def handle_pet_speed_up(session, data):
     tp = tp_list[0]
     pet_type = tp["typeID"]
     tp["trainingTime"] = 0
+    cancel_timer(session.user_id, session.current_character, "pet_training")
 
     save_characters(session.user_id, session.char_list)
     send_pet_training_complete(session, pet_type)
@@ -293,6 +285,7 @@ def handle_egg_speed_up(session, data):
     send_premium_purchase(session, "Egg Hatch Speedup", idol_cost_client)
 
     egg_data["ReadyTime"] = 0   # 0 == finished (client logic)
+    cancel_timer(session.user_id, session.current_character, "egg_hatch")
 
     save_characters(session.user_id, session.char_list)
     send_egg_hatch_start(session)
@@ -303,7 +296,7 @@ def handle_collect_hatched_egg(session, data):
     egg_data = char.get("EggHachery")
     egg_id = egg_data["EggID"]
 
-    pet_def = next((p for p in PET_TYPES if p.get("PetID") == egg_id), None)
+    pet_def = find_pet_def(egg_id)
     if not pet_def:
         print(f"[EGG] ERROR: No pet definition for EggID/PetID={egg_id}")
         return
@@ -347,6 +340,7 @@ def handle_collect_hatched_egg(session, data):
 
 def handle_cancel_egg_hatch(session, data):
     char = session.current_char_dict
+    cancel_timer(session.user_id, session.current_character, "egg_hatch")
 
     char["EggHachery"] = {
         "EggID": 0,
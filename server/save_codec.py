@@ -0,0 +1,343 @@
+"""
+Compact binary encoding of character saves (accounts.SAVE_FORMAT = "binary").
+
+Layout, version 1 :
+
+    b"DBSV" version:u8
+    header      value   every top level key but "characters" (user_id, journal_seq)
+    count       varint  number of characters
+    count times :
+        name    varint length + utf-8   the character name, readable without decoding the rest
+        size    varint                  byte length of the encoded character
+        body    value                   the character dict
+
+Every character is encoded on its own (own string table) so a loader can walk
+the file and decode only the characters it needs (iter_characters,
+read_character) and a damaged character does not take the others with it.
+
+A value is a tag byte followed by its data :
+
+    NONE FALSE TRUE
+    INT      zigzag varint (any size)
+    FLOAT    8 byte double
+    STR      varint length + utf-8, added to the string table
+    STRREF   varint index in the string table (keys and repeated strings cost 2 bytes)
+    LIST     varint count + values
+    DICT     varint count + (key value, value) pairs
+    INTSET   sorted distinct ints >= 0 (OwnedDyes, mounts, OwnedEggsID ...) :
+             varint first, varint byte count, bitmap of value - first
+    INTLIST  varint count + zigzag varints (no tag per item)
+    TABLE    list of dicts sharing the same keys (inventoryGears, pets, charms,
+             materials, learnedAbilities ...) : varint rows, varint key count,
+             keys, then the values row by row
+
+Mission entries ({"state", "currCount", ...} per mission id) are dicts whose
+keys are all STRREFs after the first one and whose values are 1 byte varints.
+
+Decoding gives back exactly the JSON data (same types, same key order).
+Run `python save_codec.py convert --format binary` from the server folder to
+convert the saves folder (any format to any format).
+"""
+
+import argparse
+import json
+import struct
+
+MAGIC = b"DBSV"
+VERSION = 1
+
+T_NONE, T_FALSE, T_TRUE, T_INT, T_FLOAT, T_STR, T_STRREF, T_LIST, T_DICT, T_INTSET, T_INTLIST, T_TABLE = range(12)
+
+_pack_double = struct.Struct(">d").pack
+_unpack_double = struct.Struct(">d").unpack_from
+
+
+#### Encoding ####
+
+def _varint(out, n):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _zigzag(n):
+    return n << 1 if n >= 0 else ((-n) << 1) - 1
+
+
+def _intset_bytes(items):
+    """Bitmap for a sorted distinct list of ints >= 0 when it is smaller than an INTLIST, else None."""
+    if len(items) < 8:
+        return None
+    prev = -1
+    for v in items:
+        if type(v) is not int or v <= prev:
+            return None
+        prev = v
+    first = items[0]
+    if first < 0:
+        return None
+    span = items[-1] - first + 1
+    if (span + 7) // 8 >= len(items):
+        return None
+    bitmap = bytearray((span + 7) // 8)
+    for v in items:
+        d = v - first
+        bitmap[d >> 3] |= 1 << (d & 7)
+    return bitmap
+
+
+class _Encoder:
+    def __init__(self):
+        self.out = bytearray()
+        self.strings = {}
+
+    def str(self, s):
+        out = self.out
+        ref = self.strings.get(s)
+        if ref is not None:
+            out.append(T_STRREF)
+            _varint(out, ref)
+            return
+        self.strings[s] = len(self.strings)
+        data = s.encode("utf-8")
+        out.append(T_STR)
+        _varint(out, len(data))
+        out += data
+
+    def list(self, items):
+        out = self.out
+        if items and all(type(v) is int for v in items):
+            bitmap = _intset_bytes(items)
+            if bitmap is not None:
+                out.append(T_INTSET)
+                _varint(out, items[0])
+                _varint(out, len(bitmap))
+                out += bitmap
+                return
+            out.append(T_INTLIST)
+            _varint(out, len(items))
+            for v in items:
+                _varint(out, _zigzag(v))
+            return
+        if len(items) > 1 and type(items[0]) is dict:
+            keys = list(items[0])
+            if all(type(k) is str for k in keys) and \
+                    all(type(row) is dict and len(row) == len(keys) and list(row) == keys for row in items):
+                out.append(T_TABLE)
+                _varint(out, len(items))
+                _varint(out, len(keys))
+                for key in keys:
+                    self.str(key)
+                value = self.value
+                for row in items:
+                    for v in row.values():
+                        value(v)
+                return
+        out.append(T_LIST)
+        _varint(out, len(items))
+        value = self.value
+        for v in items:
+            value(v)
+
+    def value(self, v):
+        t = type(v)
+        out = self.out
+        if t is str:
+            self.str(v)
+        elif t is int:
+            out.append(T_INT)
+            _varint(out, _zigzag(v))
+        elif t is dict:
+            out.append(T_DICT)
+            _varint(out, len(v))
+            for key, item in v.items():
+                # json.dumps turns 1 / True / None keys into "1" / "true" / "null"
+                self.str(key if type(key) is str else json.dumps(key))
+                self.value(item)
+        elif t is list or t is tuple:
+            self.list(v)
+        elif v is None:
+            out.append(T_NONE)
+        elif t is bool:
+            out.append(T_TRUE if v else T_FALSE)
+        elif t is float:
+            out.append(T_FLOAT)
+            out += _pack_double(v)
+        else:
+            raise TypeError(f"Cannot encode {t.__name__} in a save")
+
+
+def encode_value(v) -> bytes:
+    enc = _Encoder()
+    enc.value(v)
+    return bytes(enc.out)
+
+
+def encode_save(data: dict) -> bytes:
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    out += encode_value({k: v for k, v in data.items() if k != "characters"})
+    characters = data.get("characters", [])
+    _varint(out, len(characters))
+    for char in characters:
+        name = str(char.get("name", "") if isinstance(char, dict) else "").encode("utf-8")
+        body = encode_value(char)
+        _varint(out, len(name))
+        out += name
+        _varint(out, len(body))
+        out += body
+    return bytes(out)
+
+
+#### Decoding ####
+
+class _Decoder:
+    def __init__(self, buf, pos=0):
+        self.buf = buf
+        self.pos = pos
+        self.strings = []
+
+    def varint(self):
+        buf = self.buf
+        pos = self.pos
+        b = buf[pos]
+        pos += 1
+        if b < 0x80:
+            self.pos = pos
+            return b
+        n = b & 0x7F
+        shift = 7
+        while True:
+            b = buf[pos]
+            pos += 1
+            n |= (b & 0x7F) << shift
+            if b < 0x80:
+                self.pos = pos
+                return n
+            shift += 7
+
+    def sint(self):
+        z = self.varint()
+        return z >> 1 if not z & 1 else -((z + 1) >> 1)
+
+    def bytes(self, n):
+        start = self.pos
+        self.pos = start + n
+        return self.buf[start:self.pos]
+
+    def value(self):
+        tag = self.buf[self.pos]
+        self.pos += 1
+        if tag == T_STRREF:
+            return self.strings[self.varint()]
+        if tag == T_INT:
+            return self.sint()
+        if tag == T_DICT:
+            value = self.value
+            return {value(): value() for _ in range(self.varint())}
+        if tag == T_STR:
+            s = str(self.bytes(self.varint()), "utf-8")
+            self.strings.append(s)
+            return s
+        if tag == T_TABLE:
+            rows = self.varint()
+            value = self.value
+            keys = [value() for _ in range(self.varint())]
+            return [{key: value() for key in keys} for _ in range(rows)]
+        if tag == T_INTLIST:
+            sint = self.sint
+            return [sint() for _ in range(self.varint())]
+        if tag == T_LIST:
+            value = self.value
+            return [value() for _ in range(self.varint())]
+        if tag == T_INTSET:
+            first = self.varint()
+            items = []
+            for i, byte in enumerate(self.bytes(self.varint())):
+                if byte:
+                    base = first + (i << 3)
+                    items.extend(base + bit for bit in range(8) if byte >> bit & 1)
+            return items
+        if tag == T_NONE:
+            return None
+        if tag == T_FALSE:
+            return False
+        if tag == T_TRUE:
+            return True
+        if tag == T_FLOAT:
+            v = _unpack_double(self.buf, self.pos)[0]
+            self.pos += 8
+            return v
+        raise ValueError(f"Bad save value tag {tag} at {self.pos - 1}")
+
+
+def is_binary_save(buf) -> bool:
+    return bytes(buf[:4]) == MAGIC
+
+
+def _read_header(buf):
+    if not is_binary_save(buf):
+        raise ValueError("Not a binary save")
+    if buf[4] != VERSION:
+        raise ValueError(f"Unsupported binary save version {buf[4]}")
+    dec = _Decoder(buf, 5)
+    header = dec.value()
+    return header, dec.varint(), dec.pos
+
+
+def iter_characters(buf, names=None):
+    """
+    Yield the characters of a binary save one at a time, only decoding the
+    ones named in `names` (lowercase set) when given.
+    """
+    _, count, pos = _read_header(buf)
+    dec = _Decoder(buf, pos)
+    for _ in range(count):
+        name = str(dec.bytes(dec.varint()), "utf-8")
+        size = dec.varint()
+        start = dec.pos
+        dec.pos = start + size
+        if names is not None and name.strip().lower() not in names:
+            continue
+        yield _Decoder(buf, start).value()
+
+
+def read_character(buf, name):
+    """One character of a binary save by name (case insensitive), or None."""
+    return next(iter_characters(buf, {name.strip().lower()}), None)
+
+
+def decode_save(buf) -> dict:
+    header, _, _ = _read_header(buf)
+    # same key order as the json saves
+    data = {"user_id": header.pop("user_id")} if "user_id" in header else {}
+    data["characters"] = list(iter_characters(buf))
+    data.update(header)
+    return data
+
+
+#### Converter ####
+
+def main():
+    from storage import JsonStorage
+
+    ap = argparse.ArgumentParser(description="Convert the character saves to another format")
+    ap.add_argument("command", choices=["convert"])
+    ap.add_argument("--format", choices=["json", "compact", "binary"], required=True)
+    ap.add_argument("--dir", default="saves")
+    args = ap.parse_args()
+
+    source = JsonStorage(save_dir=args.dir)
+    target = JsonStorage(save_dir=args.dir, save_format=args.format)
+    before = source.saves_size()
+    converted = 0
+    for data in source.iter_saves():
+        target.write_save(data["user_id"], data.get("characters", []), data.get("journal_seq"))
+        converted += 1
+    after = target.saves_size()
+    print(f"Converted {converted} saves to {args.format} : {before} -> {after} bytes")
+
+
+if __name__ == "__main__":
+    main()
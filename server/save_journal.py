@@ -0,0 +1,150 @@
+"""
+Append-only journal of character saves (optional, accounts.SAVE_JOURNAL).
+
+With the write-behind SaveWriter a crash loses everything saved since the last
+flush, which keeps SAVE_FLUSH_INTERVAL short. With the journal on, every
+save_characters() also marks the user here and a journal thread appends the
+dirty users' characters every JOURNAL_INTERVAL seconds, one compact JSON line
+per user, fsynced once per batch (group commit). The full pretty-printed saves
+can then be written rarely (SAVE_FLUSH_INTERVAL_JOURNALED).
+
+Every record carries a sequence number, save files written while the journal is
+on carry the sequence they are up to date with ("journal_seq"). On boot
+accounts.replay_save_journal() re-applies the records newer than their save
+file. Once the save files cover the journal it is truncated (or compacted when
+it grew past JOURNAL_MAX_BYTES).
+
+Sequence numbers are time based (ns) so they keep growing across restarts.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+JOURNAL_PATH = "saves/journal.log"
+JOURNAL_INTERVAL = 0.25            # seconds between journal appends (max progress lost on a crash)
+JOURNAL_MAX_BYTES = 64 * 1024 * 1024  # compact the journal when it is bigger than this
+
+
+class SaveJournal:
+    def __init__(self, path=JOURNAL_PATH, lock_for=None):
+        self.path = path
+        # user_id -> the lock its handlers change its characters under (accounts.user_lock)
+        self._lock_for = lock_for or (lambda user_id: contextlib.nullcontext())
+        self._dirty = {}                # str(user_id) -> (user_id, char_list)
+        self._dirty_lock = threading.Lock()
+        self.seq_lock = threading.Lock()   # sequence numbers, the journal file and its bookkeeping
+        self._seq = 0
+        self._last_record = {}          # str(user_id) -> seq of its newest journal record
+        self._covered = {}              # str(user_id) -> journal_seq of its save file
+        self._file = None
+        self._thread = None
+        self.stats = {"records": 0, "batches": 0, "bytes": 0}
+
+    def next_seq(self):
+        """Call with seq_lock held."""
+        self._seq = max(self._seq + 1, time.time_ns())
+        return self._seq
+
+    def mark(self, user_id, char_list):
+        with self._dirty_lock:
+            self._dirty[str(user_id)] = (user_id, char_list)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "ab")
+        return self._file
+
+    def write_pending(self):
+        """Append a record for every dirty user and fsync, returns the number of records."""
+        with self._dirty_lock:
+            batch, self._dirty = self._dirty, {}
+        if not batch:
+            return 0
+        records = []
+        for key, (user_id, char_list) in batch.items():
+            # dump and sequence number together, under the lock the handlers change the list with
+            with self._lock_for(user_id):
+                text = json.dumps(char_list, ensure_ascii=False, separators=(",", ":"))
+                with self.seq_lock:
+                    seq = self.next_seq()
+            records.append((key, seq, f'{{"seq":{seq},"user_id":{json.dumps(user_id)},"characters":{text}}}\n'))
+        lines = [line for _, _, line in records]
+        with self.seq_lock:
+            for key, seq, _ in records:
+                if seq > self._last_record.get(key, -1):
+                    self._last_record[key] = seq
+            data = "".join(lines).encode("utf-8")
+            f = self._open()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.stats["records"] += len(lines)
+        self.stats["batches"] += 1
+        self.stats["bytes"] += len(data)
+        return len(lines)
+
+    def covered(self, user_id, seq):
+        """The save file of user_id was written with journal_seq = seq."""
+        key = str(user_id)
+        with self.seq_lock:
+            if seq > self._covered.get(key, -1):
+                self._covered[key] = seq
+
+    def checkpoint(self):
+        """Truncate the journal when the save files cover it, compact it when it is too big."""
+        with self.seq_lock:
+            stale = [k for k, seq in self._last_record.items() if seq <= self._covered.get(k, -1)]
+            for key in stale:
+                del self._last_record[key]
+            if not self._last_record:
+                if self._file is not None and self._file.tell():
+                    self._file.truncate(0)
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                self._covered.clear()
+                return
+            if self._file is None or self._file.tell() < JOURNAL_MAX_BYTES:
+                return
+            # keep only the newest record of the users whose save file is behind
+            keep = {}
+            for record in read_records(self.path):
+                key = str(record["user_id"])
+                if record["seq"] == self._last_record.get(key):
+                    keep[key] = record
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                for record in keep.values():
+                    f.write((json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp, self.path)
+            self._file = None
+
+    def _run(self):
+        while True:
+            time.sleep(JOURNAL_INTERVAL)
+            try:
+                self.write_pending()
+            except Exception as e:
+                print(f"[JOURNAL] append failed: {e}")
+
+
+def read_records(path=JOURNAL_PATH):
+    """Yield the journal records in order, stops at a torn last line (crash mid-append)."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"[JOURNAL] Ignoring torn record at the end of {path}")
+                return
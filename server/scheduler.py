@@ -1,17 +1,24 @@
-import glob
-import json
-import os
 import random
 import threading
 import time
-import heapq
-
-from accounts import load_characters, save_characters, CHAR_SAVE_DIR
-from constants import class_111, class_16
+from collections import deque
+from queue import SimpleQueue
+
+from accounts import save_characters, iter_saves, user_lock
+from char_repo import char_repo
+from timer_store import TimerStore
+from timing_wheel import TimingWheel, TimerHeap, TimerHandle
+from constants import class_111
 from globals import send_skill_complete_packet, send_building_complete_packet, send_forge_reroll_packet, \
-    send_talent_point_research_complete, all_sessions, build_hatchery_notify_packet, send_pet_training_complete, \
+    send_talent_point_research_complete, find_session_by_char, build_hatchery_notify_packet, send_pet_training_complete, \
     send_egg_hatch_start
 
+SCHEDULER_QUEUE = "wheel"  # "wheel" (timing_wheel.TimingWheel) or "heap" (the previous heapq queue)
+TIMER_BOOT_SCAN = False   # rebuild the timers by parsing every save at boot (repair), else load timer_store
+SCHEDULER_WORKERS = 4      # threads running due callbacks, 0 runs them on the scheduler thread
+SCHEDULER_LAG_WINDOW = 1024  # recent callbacks kept for lag_stats()
+SCHEDULER_LAG_WARN = 5.0   # log (at most every 10 s) callbacks starting this many seconds after their time
+
 active_session_resolver = None
 
 def is_ready(ready_ts: int) -> bool:
@@ -25,43 +32,226 @@ def set_active_session_resolver(fn):
     active_session_resolver = fn
 
 class TaskScheduler:
-    def __init__(self):
+    """
+    Runs callbacks at a unix time (whole seconds).
+
+    schedule() returns a TimerHandle for cancel() / reschedule(), timers given
+    an owner (e.g. (user_id, char_name)) can all be cancelled at once with
+    cancel_owner(). The queue is a timing_wheel.TimingWheel, or the previous
+    heap with SCHEDULER_QUEUE = "heap".
+
+    The scheduler thread only takes the due timers out of the queue, a pool of
+    `workers` threads runs them. Callbacks of the same user (first item of an
+    owner tuple, else the owner) run one after the other in due order, never
+    at the same time, other users' callbacks run alongside. lag_stats() gives
+    how late the recent callbacks started.
+    """
+    def __init__(self, queue=None, start=True, workers=None):
         self._lock = threading.Lock()
-        self._queue = []
-        self._next_id = 0
+        if queue is None:
+            queue = TimingWheel(time.time()) if SCHEDULER_QUEUE == "wheel" else TimerHeap()
+        self._queue = queue
+        self._by_owner = {}     # owner -> set of pending handles
         self._new_event = threading.Event()
-        threading.Thread(target=self._run_loop, daemon=True).start()
-
-    def schedule(self, run_at: int, callback: callable):
+        self._ready = SimpleQueue()                 # (serial key, handle) for the workers
+        self._serial = {}       # serial key -> handles waiting behind the one being run
+        self._serial_lock = threading.Lock()
+        self._lags = deque(maxlen=SCHEDULER_LAG_WINDOW)
+        self._stats_lock = threading.Lock()
+        self._last_warn = 0.0
+        self.stats = {"run": 0, "errors": 0, "lag_max": 0.0}
+        self.workers = SCHEDULER_WORKERS if workers is None else workers
+        if start:
+            for _ in range(self.workers):
+                threading.Thread(target=self._worker, daemon=True).start()
+            threading.Thread(target=self._run_loop, daemon=True).start()
+
+    def schedule(self, run_at: int, callback: callable, owner=None) -> TimerHandle:
+        handle = TimerHandle(run_at, callback, owner)
+        with self._lock:
+            self._queue.add(handle)
+            if owner is not None:
+                self._by_owner.setdefault(owner, set()).add(handle)
+            if not self._new_event.is_set():
+                self._new_event.set()
+        return handle
+
+    def _forget_owner(self, handle):
+        handles = self._by_owner.get(handle.owner)
+        if handles is not None:
+            handles.discard(handle)
+            if not handles:
+                del self._by_owner[handle.owner]
+
+    def cancel(self, handle: TimerHandle) -> bool:
+        """False when the timer already ran or was cancelled."""
+        if handle is None:
+            return False
+        with self._lock:
+            if not self._queue.cancel(handle):
+                return False
+            if handle.owner is not None:
+                self._forget_owner(handle)
+            return True
+
+    def reschedule(self, handle: TimerHandle, run_at: int) -> bool:
+        """Move a pending timer to run_at, False when it already ran or was cancelled."""
+        if handle is None:
+            return False
         with self._lock:
-            heapq.heappush(self._queue, (run_at, self._next_id, callback))
-            self._next_id += 1
+            if not self._queue.cancel(handle):
+                return False
+            handle.run_at = int(run_at)
+            self._queue.add(handle)
             self._new_event.set()
+            return True
+
+    def cancel_owner(self, owner) -> list:
+        """Cancel every pending timer of owner, returns their handles."""
+        with self._lock:
+            handles = self._by_owner.pop(owner, ())
+            for handle in handles:
+                self._queue.cancel(handle)
+            return list(handles)
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def run_due(self, now: int) -> int:
+        """
+        Hand the callbacks due at `now` to the workers (the run loop, or a
+        caller driving the clock), or run them here when there are no workers.
+        """
+        with self._lock:
+            to_run = self._queue.expire(now)
+            for handle in to_run:
+                if handle.owner is not None:
+                    self._forget_owner(handle)
+        for handle in to_run:
+            if self.workers:
+                self._dispatch(handle)
+            else:
+                self._run_handle(handle)
+        return len(to_run)
+
+    def _dispatch(self, handle):
+        owner = handle.owner
+        key = owner[0] if type(owner) is tuple else owner
+        if key is None:
+            key = handle
+        with self._serial_lock:
+            waiting = self._serial.get(key)
+            if waiting is not None:
+                waiting.append(handle)  # a worker is on this user, it runs it next
+                return
+            self._serial[key] = deque()
+        self._ready.put((key, handle))
+
+    def _worker(self):
+        while True:
+            key, handle = self._ready.get()
+            while handle is not None:
+                self._run_handle(handle)
+                with self._serial_lock:
+                    waiting = self._serial[key]
+                    if waiting:
+                        handle = waiting.popleft()
+                    else:
+                        del self._serial[key]
+                        handle = None
+
+    def _run_handle(self, handle):
+        lag = max(0.0, time.time() - handle.run_at)
+        with self._stats_lock:
+            self._lags.append(lag)
+            self.stats["run"] += 1
+            if lag > self.stats["lag_max"]:
+                self.stats["lag_max"] = lag
+        if lag >= SCHEDULER_LAG_WARN and time.monotonic() - self._last_warn >= 10:
+            self._last_warn = time.monotonic()
+            print(f"[Scheduler] callback started {lag:.1f}s late ({self._ready.qsize()} waiting)")
+        try:
+            handle.callback()
+        except Exception as e:
+            with self._stats_lock:
+                self.stats["errors"] += 1
+            print(f"[Scheduler] callback error: {e}")
+
+    def lag_stats(self) -> dict:
+        """Seconds between due time and start of the last SCHEDULER_LAG_WINDOW callbacks."""
+        with self._stats_lock:
+            lags = sorted(self._lags)
+            result = dict(self.stats)
+        result.update(pending=self.pending(), waiting=self._ready.qsize(), recent=len(lags))
+        if lags:
+            result.update(mean=sum(lags) / len(lags), p50=lags[len(lags) // 2],
+                          p99=lags[min(len(lags) - 1, int(len(lags) * 0.99))], max=lags[-1])
+        return result
 
     def _run_loop(self):
         while True:
             with self._lock:
-                if not self._queue:
-                    timeout = None
-                else:
-                    run_at, _, _ = self._queue[0]
-                    timeout = max(0, run_at - int(time.time()))
+                due_at = self._queue.next_due()
+            timeout = None if due_at is None else max(0, due_at - time.time())
             self._new_event.wait(timeout=timeout)
             self._new_event.clear()
-
-            now = int(time.time())
-            to_run = []
-            with self._lock:
-                while self._queue and self._queue[0][0] <= now:
-                    _, _, cb = heapq.heappop(self._queue)
-                    to_run.append(cb)
-            for cb in to_run:
-                try:
-                    cb()
-                except Exception as e:
-                    print(f"[Scheduler] callback error: {e}")
+            self.run_due(int(time.time()))
 
 scheduler = TaskScheduler()
+timer_store = TimerStore()
+
+#### Persistent timers ####
+
+# kind -> (callback(user_id, char_name, *args), persist)
+# persist : recorded in timer_store and loaded back at boot, else the timer
+# only lives while its player is online (hatchery notify)
+_TIMER_KINDS = {}
+
+# (str(user_id), char_name, kind) -> (handle, timer_store id), one timer per kind per character
+_timers = {}
+_timers_lock = threading.Lock()
+
+
+def _schedule_timer(kind: str, user_id, char_name: str, run_at: int, *args, timer_id=None):
+    """
+    Schedule a character timer and record it in timer_store until it has fired.
+    Replaces the pending timer of the same kind for that character.
+    """
+    callback, persist = _TIMER_KINDS[kind]
+    if timer_id is None and persist:
+        timer_id = timer_store.add(kind, user_id, char_name, run_at, args)
+    key = (str(user_id), char_name, kind)
+
+    def fire():
+        try:
+            with user_lock(user_id):
+                callback(user_id, char_name, *args)
+        finally:
+            with _timers_lock:
+                if _timers.get(key, (None,))[0] is handle:
+                    del _timers[key]
+            if timer_id is not None:
+                timer_store.remove(timer_id)
+
+    with _timers_lock:
+        handle = scheduler.schedule(run_at, fire, owner=key[:2])
+        old = _timers.get(key)
+        _timers[key] = (handle, timer_id)
+    if old is not None and scheduler.cancel(old[0]) and old[1] is not None:
+        timer_store.remove(old[1])
+    return handle
+
+
+def cancel_timer(user_id, char_name: str, kind: str) -> bool:
+    """Cancel the pending timer of `kind` for a character (cancel, speed-up, claim)."""
+    with _timers_lock:
+        entry = _timers.pop((str(user_id), char_name, kind), None)
+    if entry is None or not scheduler.cancel(entry[0]):
+        return False
+    if entry[1] is not None:
+        timer_store.remove(entry[1])
+    return True
+
 
 def _on_research_done_for(user_id: str, char_name: str):
     if not active_session_resolver:
@@ -88,14 +278,10 @@ def _on_research_done_for(user_id: str, char_name: str):
 
 
 def schedule_research(user_id: str, char_name: str, ready_ts: int):
-    handle = scheduler.schedule(
-        run_at=ready_ts,
-        callback=lambda uid=user_id, cn=char_name: _on_research_done_for(uid, cn)
-    )
-    return handle
+    return _schedule_timer("research", user_id, char_name, ready_ts)
 
 def _on_building_done_for(user_id: str, char_name: str):
-    chars = load_characters(user_id)
+    chars = char_repo.get(user_id)
     char = next((c for c in chars if c.get("name") == char_name), None)
     if not char:
         return
@@ -130,27 +316,15 @@ def _on_building_done_for(user_id: str, char_name: str):
     if not (session and session.authenticated):
         return
 
-    mem_char = next((c for c in session.char_list if c.get("name") == char_name), None)
-    if mem_char:
-        mem_mf = mem_char.setdefault("magicForge", {})
-        mem_stats = mem_mf.setdefault("stats_by_building", {})
-        if building_id and new_rank:
-            mem_stats[str(building_id)] = new_rank
-        mem_char["buildingUpgrade"] = char["buildingUpgrade"].copy()
-
-        send_building_complete_packet(session, building_id, new_rank)
-        print(f"[{session.addr}] Sent building-complete (0xD8) ID={building_id}, rank={new_rank}")
+    send_building_complete_packet(session, building_id, new_rank)
+    print(f"[{session.addr}] Sent building-complete (0xD8) ID={building_id}, rank={new_rank}")
 
 
 def schedule_building_upgrade(user_id: str, char_name: str, ready_ts: int):
-    handle = scheduler.schedule(
-        run_at=ready_ts,
-        callback=lambda uid=user_id, cn=char_name: _on_building_done_for(uid, cn)
-    )
-    return handle
+    return _schedule_timer("building", user_id, char_name, ready_ts)
 
 def _on_forge_done_for(user_id: str, char_name: str, primary: int, secondary: int):
-    chars = load_characters(user_id)
+    chars = char_repo.get(user_id)
     char = next((c for c in chars if c.get("name") == char_name), None)
     if not char or "magicForge" not in char:
         return
@@ -172,12 +346,6 @@ def _on_forge_done_for(user_id: str, char_name: str, primary: int, secondary: in
     if active_session_resolver:
         session = active_session_resolver(user_id, char_name)
         if session and session.authenticated:
-
-            mem_char = next((c for c in session.char_list if c.get("name") == char_name), None)
-            if mem_char:
-                mem_mf = mem_char.setdefault("magicForge", {})
-                mem_mf.update(mf)
-
             send_forge_reroll_packet(
                 session=session,
                 primary=primary,
@@ -191,11 +359,7 @@ def _on_forge_done_for(user_id: str, char_name: str, primary: int, secondary: in
             print(f"[{session.addr}] Sent forge-complete packet → primary={primary}, secondary={secondary}, tier={tier}")
 
 def schedule_forge(user_id: str, char_name: str, run_at: int, primary: int, secondary: int):
-    scheduler.schedule(
-        run_at=run_at,
-        callback=lambda uid=user_id, cn=char_name, p=primary, s=secondary:
-            _on_forge_done_for(uid, cn, p, s)
-    )
+    return _schedule_timer("forge", user_id, char_name, run_at, primary, secondary)
 
 def _on_talent_done_for(user_id: str, char_name: str):
     if not active_session_resolver:
@@ -223,34 +387,32 @@ def _on_talent_done_for(user_id: str, char_name: str):
 
 
 def schedule_Talent_point_research(user_id: str, char_name: str, run_at: int):
-    handle = scheduler.schedule(
-        run_at=run_at,
-        callback=lambda uid=user_id, cn=char_name: _on_talent_done_for(uid, cn)
-    )
-    return handle
+    return _schedule_timer("talent", user_id, char_name, run_at)
 
 def _on_hatchery_refresh(user_id: str, char_name: str):
-    chars = load_characters(user_id)
-    char = next((c for c in chars if c["name"] == char_name), None)
-    if not char:
+    # the new eggs themselves are rolled by handle_request_hatchery_eggs when
+    # the barn is opened, this only tells an online player they are waiting.
+    # Once per set : the timer is armed again on every zone change, the barn
+    # clears EggNotifySent when it rolls the next set.
+    sess = find_session_by_char(user_id, char_name)
+    char = char_repo.find(user_id, char_name)
+    if not (sess and char) or char.get("EggNotifySent"):
         return
-
-    for sess in all_sessions:
-        if sess.user_id == user_id and sess.current_character == char_name:
-            sess.conn.sendall(build_hatchery_notify_packet())
-            break
-
-    # schedule next refresh
-    next_time = int(time.time()) + class_16.new_egg_set_time
-    scheduler.schedule(next_time, lambda: _on_hatchery_refresh(user_id, char_name))
+    sess.conn.sendall(build_hatchery_notify_packet())
+    char["EggNotifySent"] = True
+    save_characters(user_id, char_repo.get(user_id))
 
 
 def schedule_hatchery_refresh(user_id: str, char_name: str, run_at: int):
-    scheduler.schedule(run_at, lambda: _on_hatchery_refresh(user_id, char_name))
+    """
+    Notify timer for the next egg set (EggResetTime), only held while the
+    character is online : set at game server login and when the barn rolls a
+    new set, cancelled on disconnect. Not persisted.
+    """
+    return _schedule_timer("hatchery", user_id, char_name, run_at)
 
 def _on_pet_training_done(user_id: str, char_name: str):
-    chars = load_characters(user_id)
-    char = next((c for c in chars if c.get("name") == char_name), None)
+    char = char_repo.find(user_id, char_name)
     if not char:
         return
 
@@ -264,8 +426,6 @@ def _on_pet_training_done(user_id: str, char_name: str):
     if ready_ts > now:
         return  # not ready
 
-    save_characters(user_id, chars)
-
     if active_session_resolver:
         session = active_session_resolver(user_id, char_name)
         if session and session.authenticated:
@@ -273,11 +433,10 @@ def _on_pet_training_done(user_id: str, char_name: str):
             send_pet_training_complete(session, pet_type)
 
 def schedule_pet_training(user_id: str, char_name: str, ready_ts: int):
-    scheduler.schedule(run_at=ready_ts,callback=lambda uid=user_id, cn=char_name:_on_pet_training_done(uid, cn))
+    return _schedule_timer("pet_training", user_id, char_name, ready_ts)
 
 def _on_egg_hatch_done(user_id: str, char_name: str):
-    chars = load_characters(user_id)
-    char = next((c for c in chars if c.get("name") == char_name), None)
+    char = char_repo.find(user_id, char_name)
     if not char:
         return
 
@@ -291,7 +450,6 @@ def _on_egg_hatch_done(user_id: str, char_name: str):
     # Still not finished? (scheduler may fire early)
     if ready_ts > now:
         return
-    save_characters(user_id, chars)
 
     # Notify if the player is online
     if active_session_resolver:
@@ -301,14 +459,46 @@ def _on_egg_hatch_done(user_id: str, char_name: str):
 
 
 def schedule_egg_hatch(user_id: str, char_name: str, ready_ts: int):
-    scheduler.schedule(run_at=ready_ts,callback=lambda uid=user_id, cn=char_name:_on_egg_hatch_done(uid, cn))
+    return _schedule_timer("egg_hatch", user_id, char_name, ready_ts)
 
-def boot_scan_all_saves():
+
+_TIMER_KINDS.update({
+    "research": (_on_research_done_for, True),
+    "building": (_on_building_done_for, True),
+    "forge": (_on_forge_done_for, True),
+    "talent": (_on_talent_done_for, True),
+    "hatchery": (_on_hatchery_refresh, False),
+    "pet_training": (_on_pet_training_done, True),
+    "egg_hatch": (_on_egg_hatch_done, True),
+})
+
+
+def boot_load_timers():
+    """
+    Boot : schedule the pending timers from timer_store. The first boot (no
+    store yet) or TIMER_BOOT_SCAN falls back to parsing every save, which
+    rebuilds the store.
+    """
+    records = None if TIMER_BOOT_SCAN else timer_store.load()
+    if records is None:
+        timer_store.reset()
+        boot_scan_all_saves()
+        print(f"[SCHEDULER] Scanned the saves : {len(timer_store)} pending timers")
+        return
     now = int(time.time())
-    for path in glob.glob(os.path.join(CHAR_SAVE_DIR, "*.json")):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    for r in records:
+        kind = _TIMER_KINDS.get(r["kind"])
+        # timers that came due while the server was down have nothing left to do,
+        # their handlers check ReadyTime when the player comes back
+        if kind is None or not kind[1] or r["run_at"] <= now:
+            timer_store.remove(r["id"])
+            continue
+        _schedule_timer(r["kind"], r["user_id"], r["char"], r["run_at"], *r["args"], timer_id=r["id"])
+    print(f"[SCHEDULER] Loaded {len(timer_store)} pending timers")
 
+def boot_scan_all_saves():
+    now = int(time.time())
+    for data in iter_saves():
         chars = data.get("characters", [])
         user_id = data.get("user_id")
 
@@ -354,13 +544,6 @@ def boot_scan_all_saves():
                 if rt > now:
                     schedule_Talent_point_research(user_id, cname, rt)
 
-            # ─── Egg rotation ───
-            egg_rt = char.get("EggResetTime")
-            if not egg_rt:
-                char["EggResetTime"] = now + class_16.new_egg_set_time
-                egg_rt = char["EggResetTime"]
-            schedule_hatchery_refresh(user_id, cname, egg_rt)
-
             # ─── Pet training ───
             tp = char.get("trainingPet", [])
             if tp:
@@ -5,26 +5,34 @@ import sys
 import threading
 import time
 
+import interest
+import movement_batch
 from PKTTYPES import PACKET_HANDLERS
 from PolicyServer import start_policy_server
-from globals import HOST, PORTS, handle_entity_destroy_server, GS
-from scheduler import set_active_session_resolver
+from globals import HOST, PORTS, handle_entity_destroy_server, GS, level_leave, index_session, unindex_session, \
+    find_session_by_char
+from scheduler import set_active_session_resolver, boot_load_timers, cancel_timer
 from static_server import start_static_server
-from accounts import save_characters
+from char_repo import char_repo
+from data_bundle import refresh_bundle
+from accounts import save_characters, flush_saves, user_lock, replay_save_journal, load_name_index, load_account_index
 from level_config import LEVEL_CONFIG
+from outbound import BufferedConnection
+from framing import PacketFramer
 
 
 #===========#
 
 ENABLE_ADMIN_PANEL = False
+USE_ASYNCIO = False # run the game ports on one asyncio event loop instead of one thread per client
 
 #===========#
 
 def _level_remove(level, session):
     # Remove from registry
-    s = GS.level_registry.get(level)
-    if s and session in s:
-        s.remove(session)
+    interest.leave(session, level)
+    movement_batch.discard(session, level)
+    level_leave(session)
 
     # Remove all entities owned by this session from the level
     level_map = GS.level_entities.get(level)
@@ -45,13 +53,13 @@ def new_transfer_token():
     """Allocate a persistent 16-bit token not in use."""
     while True:
         t = secrets.randbits(16)
-        if t not in GS.session_by_token:
+        if t not in GS.session_by_token and t not in GS.token_char:
            return t
 
 def find_active_session(user_id, char_name):
-    for s in GS.all_sessions:
-        if getattr(s, 'user_id', None) == user_id and getattr(s, 'current_character', None) == char_name and s.authenticated:
-            return s
+    s = find_session_by_char(user_id, char_name)
+    if s and s.authenticated:
+        return s
     return None
 
 # register resolver
@@ -73,8 +81,11 @@ class ClientSession:
         # world and  level
         self.current_level = None
         self.entry_level = None
-        self.player_spawned = False
+        self.player_spawned = False   # kept in sync with GS.level_registry by level_join / level_leave
+        self.indexed_level = None     # level this session is listed under in GS.level_registry
         self.clientEntID = None       # entity ID assigned to the player
+        self.interest = frozenset()   # players close enough to see this one (interest.py)
+        self.index_keys = None        # keys this session is registered under (globals.index_session)
 
         #  entity tracking
         self.entities = {}  # authoritative movement cache
@@ -103,7 +114,7 @@ class ClientSession:
 
         # Store session mapping
         self.clientEntID = tk
-        GS.session_by_token[tk] = self
+        index_session(self)
 
         return tk
 
@@ -142,10 +153,16 @@ class ClientSession:
 
     def close_connection(self):
 
-        self.save_player_position()
+        if self.user_id:
+            with user_lock(self.user_id):
+                self.save_player_position()
+        else:
+            self.save_player_position()
+        if self.user_id:
+            flush_saves(self.user_id)
 
         if self.player_spawned and self.clientEntID is not None:
-            handle_entity_destroy_server(self, self.clientEntID, all_sessions=GS.all_sessions)
+            handle_entity_destroy_server(self, self.clientEntID)
             #print("destroyed entity removal")
 
         try:
@@ -160,43 +177,43 @@ class ClientSession:
         if self.player_spawned and self.current_level:
             _level_remove(self.current_level, self)
 
+        unindex_session(self)
+        if self.user_id:
+            char_repo.detach(self)
+            # hatchery notify is only held while online, unless a newer session took over (level transfer)
+            if self.current_character and not find_session_by_char(self.user_id, self.current_character):
+                cancel_timer(self.user_id, self.current_character, "hatchery")
         if self in GS.all_sessions:
             GS.all_sessions.remove(self)
 
 
+def dispatch_packet(session, pkt, data):
+    """Shared by the threaded engine below and the asyncio engine (async_server.py)."""
+    handler = PACKET_HANDLERS.get(pkt)
+
+    if handler:
+        if session.user_id:
+            # the save writer copies the user's characters under the same lock
+            with user_lock(session.user_id):
+                handler(session, data)
+        else:
+            handler(session, data)
+    else:
+        print(f"[{session.addr}] Unhandled packet type: 0x{pkt:02X}, raw payload = {data.hex()}")
+
 def handle_client(session: ClientSession):
     conn = session.conn
     addr = session.addr
     print("Connected:", addr)
     conn.settimeout(300)
-    buffer = bytearray()
+    framer = PacketFramer()
     try:
         while True:
-            chunk = conn.recv(4096)
-            if not chunk:
+            if not framer.recv_into(conn):
                 print(f"[{addr}] Connection closed by client")
                 break
-            buffer.extend(chunk)
-            while len(buffer) >= 4:
-                pkt    = int.from_bytes(buffer[0:2], byteorder='big')
-                length = int.from_bytes(buffer[2:4], byteorder='big')
-                total  = 4 + length
-                if len(buffer) < total:
-                    break
-                data    = bytes(buffer[:total])
-                payload = data[4:]
-                del buffer[:total]
-
-                # Sanity check
-                if len(payload) != length:
-                    print(f"[{addr}] Length mismatch: header says {length} but payload is {len(payload)}")
-
-                handler = PACKET_HANDLERS.get(pkt)
-
-                if handler:
-                    handler(session, data)
-                else:
-                    print(f"[{session.addr}] Unhandled packet type: 0x{pkt:02X}, raw payload = {data.hex()}")
+            for pkt, data in framer.packets():
+                dispatch_packet(session, pkt, data)
 
     except Exception as e:
         print("Session error:", e)
@@ -221,7 +238,7 @@ def start_server(port):
 def accept_connections(s, port):
     while True:
         conn, addr = s.accept()
-        session = ClientSession(conn, addr)
+        session = ClientSession(BufferedConnection(conn, addr), addr)
         GS.all_sessions.append(session)
         threading.Thread(target=handle_client, args=(session,), daemon=True).start()
 
@@ -235,9 +252,18 @@ def start_servers():
     return servers
 
 if __name__ == "__main__":
+    refresh_bundle()
+    replay_save_journal()
+    load_account_index()
+    load_name_index()
+    boot_load_timers()
     start_policy_server(host="127.0.0.1", port=843)
     start_static_server(host="127.0.0.1", port=80, directory="content/localhost")
-    servers = start_servers()
+    if USE_ASYNCIO:
+        from async_server import start_async_servers
+        servers = start_async_servers(ClientSession, dispatch_packet)
+    else:
+        servers = start_servers()
     print("For Browser running on : http://localhost/index.html")
     print("For Flash Projector running on : http://localhost/p/cbv/DungeonBlitz.swf?fv=cbq&gv=cbv")
 
@@ -268,4 +294,5 @@ if __name__ == "__main__":
         print("Shutting down servers...")
         for server, port in servers:
             server.close()
+        flush_saves()
         sys.exit(0)
\ No newline at end of file
@@ -4,7 +4,7 @@ from accounts import save_characters
 from bitreader import BitReader
 from constants import get_ability_info
 from globals import send_premium_purchase, send_skill_complete_packet
-from scheduler import scheduler, _on_research_done_for
+from scheduler import schedule_research, cancel_timer
 
 def handle_skill_trained_claim(session, data):
     char = next((c for c in session.char_list if c.get("name") == session.current_character), None)
@@ -36,6 +36,7 @@ def handle_skill_research_cancel_request(session, data):
         print(f"[{session.addr}] [0xDD] No active character")
         return
 
+    cancel_timer(session.user_id, session.current_character, "research")
     char["SkillResearch"] = {"abilityID": 0, "ReadyTime": 0}
     save_characters(session.user_id, session.char_list)
 
@@ -56,11 +57,12 @@ def handle_skill_speed_up_request(session, data):
         print(f"[{session.addr}] [0xDE] Deducted {idol_cost} idols")
 
     research.update({"ReadyTime": 0})
+    cancel_timer(session.user_id, session.current_character, "research")
     save_characters(session.user_id, session.char_list)
     send_skill_complete_packet(session, research["abilityID"])
 
 def handle_start_skill_training(session, data):
-    br = BitReader(data[4:], debug=True)
+    br = BitReader(data[4:])
     ability_id = br.read_method_20(7)
     rank       = br.read_method_20(4)
     use_idols  = bool(br.read_method_15())
@@ -84,9 +86,7 @@ def handle_start_skill_training(session, data):
         print(f"[{session.addr}] Deducted {gold_cost} gold")
 
     ready_ts = int(time.time()) + upgrade_time
-    scheduler.schedule(run_at=ready_ts,
-                       callback=lambda uid=session.user_id, cname=char["name"]:
-                                 _on_research_done_for(uid, cname))
+    schedule_research(session.user_id, char["name"], ready_ts)
 
     char["SkillResearch"] = {"abilityID": ability_id, "ReadyTime": ready_ts}
     save_characters(session.user_id, session.char_list)
@@ -2,31 +2,28 @@ import secrets
 import struct
 
 from BitBuffer import BitBuffer
-from accounts import load_characters
+from char_repo import char_repo
 from GameState import state
 from bitreader import BitReader
 from constants import Entity
-from globals import get_active_character_name, build_room_thought_packet, send_chat_status, build_empty_group_packet, build_group_chat_packet, build_groupmate_map_packet, GS
+from globals import get_active_character_name, build_room_thought_packet, send_chat_status, build_empty_group_packet, build_group_chat_packet, build_groupmate_map_packet, GS, broadcast_to_level, level_sessions, \
+    find_session_by_name, find_session_by_token
+from interest import broadcast_to_interest
 
 
 # Helpers
 ############################################################
 
-def find_online_session(all_sessions, name):
+def find_online_session(name):
     """Return session if player is online."""
-    name = name.lower()
-    for s in all_sessions:
-        if getattr(s, "current_character", "").lower() == name:
-            return s
-    return None
+    return find_session_by_name(name)
 
 def find_char_data_from_server_memory(name):
     """Returns the character save dict (already loaded on boot)."""
     for uid, current_char_name in GS.current_characters.items():
         if current_char_name.lower() == name.lower():
 
-            chars = load_characters(uid)
-            for c in chars:
+            for c in char_repo.get(uid):
                 if c["name"].lower() == name.lower():
                     return c
     return {}  # offline or unknown → dummy fallback
@@ -98,14 +95,14 @@ def get_group_for_session(session):
         return None, None
     return state.get_group_for_name(name)
 
-def online_group_members(group, all_sessions):
+def online_group_members(group):
     if not group:
         return []
 
     members = []
     for name_key in group["members"]:
         # stored as lowercase, but find_online_session already lowercases
-        sess = find_online_session(all_sessions, name_key)
+        sess = find_online_session(name_key)
         if not sess:
             continue
         is_leader = (name_key == group["leader"])
@@ -137,15 +134,7 @@ def handle_public_chat(session, data):
     print(f"[{get_active_character_name(session)}] Says : \"{message}\"")
 
     # Forward raw unmodified packet to other players in the same level
-    for other in GS.all_sessions:
-        if other is session:
-            continue
-        if not other.player_spawned:
-            continue
-        if other.current_level != session.current_level:
-            continue
-
-        other.conn.sendall(data)
+    broadcast_to_level(session.current_level, data, exclude=session)
 
 
 def handle_private_message(session, data):
@@ -154,13 +143,9 @@ def handle_private_message(session, data):
     message        = br.read_method_13()
 
     # --- Find recipient session ---
-    recipient_session = next(
-        (s for s in GS.all_sessions
-         if s.authenticated
-         and s.current_character
-         and s.current_character.lower() == recipient_name.lower()),
-        None
-    )
+    recipient_session = find_session_by_name(recipient_name)
+    if recipient_session and not recipient_session.authenticated:
+        recipient_session = None
 
     def make_packet(pkt_id, name, msg):
         bb = BitBuffer()
@@ -199,12 +184,11 @@ def handle_room_thought(session, data):
 
     pkt = build_room_thought_packet(entity_id, text)
 
-    for s in GS.all_sessions:
-        if s.player_spawned and s.current_level == level:
-            try:
-                s.conn.sendall(pkt)
-            except:
-                pass
+    for s in level_sessions(level):
+        try:
+            s.conn.sendall(pkt)
+        except:
+            pass
 
 def handle_start_skit(session, data):
     br = BitReader(data[4:])
@@ -215,12 +199,11 @@ def handle_start_skit(session, data):
 
     pkt = build_room_thought_packet(entity_id, text)
 
-    for other in GS.all_sessions:
-        if other.player_spawned and other.current_level == session.current_level:
-            try:
-                other.conn.sendall(pkt)
-            except:
-                pass
+    for other in level_sessions(session.current_level):
+        try:
+            other.conn.sendall(pkt)
+        except:
+            pass
 
     #print(f"[SKIT] Entity {entity_id} says: '{text}'")
 
@@ -231,23 +214,16 @@ def handle_emote_begin(session, data):
     entity_id = br.read_method_4()
     emote = br.read_method_13()
 
-    for other in GS.all_sessions:
-        if (other is not session
-            and other.player_spawned
-            and other.current_level == session.current_level):
-            other.conn.sendall(data)
+    broadcast_to_interest(session, data)
 
 
 def handle_group_invite(session, data):
     br = BitReader(data[4:])
     invitee_name = br.read_method_13()
 
-    invitee = next((
-        s for s in GS.all_sessions
-        if s.authenticated
-        and s.current_character
-        and s.current_character.lower() == invitee_name.lower()
-    ), None)
+    invitee = find_session_by_name(invitee_name)
+    if invitee and not invitee.authenticated:
+        invitee = None
 
     if not invitee:
         send_chat_status(session, f"Player {invitee_name} not found")
@@ -343,7 +319,7 @@ def handle_query_message_answer(session, data):
     accepted = br.read_method_15()
 
     # Find inviter by entity ID
-    inviter = next((s for s in GS.all_sessions if s.clientEntID == token), None)
+    inviter = find_session_by_token(token)
     if not inviter:
         return
 
@@ -368,7 +344,7 @@ def handle_query_message_answer(session, data):
     state.add_member(gid, invitee_name)
 
     # Build full party list for packet
-    members = online_group_members(group, GS.all_sessions)
+    members = online_group_members(group)
     update_session_group_cache(gid, members)
 
     packet = build_group_update_packet(members)
@@ -391,7 +367,7 @@ def handle_map_location_update(session, data):
         return
 
     # Broadcast to GROUP only
-    for member, _ in online_group_members(group, GS.all_sessions):
+    for member, _ in online_group_members(group):
         if member is session:
             continue  # skip sender
 
@@ -417,7 +393,7 @@ def handle_group_kick(session, data):
     state.remove_member(target_name)
 
     # Find target session (if online)
-    target_sess = find_online_session(GS.all_sessions, target_name)
+    target_sess = find_online_session(target_name)
 
     send_chat_status(target_sess, "You have been removed from the party.") if target_sess else None
     send_chat_status(session, f"You removed {target_name} from the party.")
@@ -430,7 +406,7 @@ def handle_group_kick(session, data):
         if group:
             # there is exactly one member left
             remaining_name = group["members"][0]
-            remaining_sess = find_online_session(GS.all_sessions, remaining_name)
+            remaining_sess = find_online_session(remaining_name)
 
             state.disband_group(gid)
 
@@ -448,7 +424,7 @@ def handle_group_kick(session, data):
         return
 
     # Group still has >= 2 members
-    members = online_group_members(group, GS.all_sessions)
+    members = online_group_members(group)
     update_session_group_cache(gid, members)
 
     pkt = build_group_update_packet(members)
@@ -511,7 +487,7 @@ def handle_group_leave(session, data):
             state.disband_group(remaining_gid)
 
             for name in names:
-                s = find_online_session(GS.all_sessions, name)
+                s = find_online_session(name)
                 if not s:
                     continue
                 s.group_id = None
@@ -521,7 +497,7 @@ def handle_group_leave(session, data):
         return
 
     # Party still has 2+ members
-    members = online_group_members(remaining_group, GS.all_sessions)
+    members = online_group_members(remaining_group)
     update_session_group_cache(remaining_gid, members)
 
     for m, _ in members:
@@ -546,14 +522,14 @@ def handle_group_leader(session, data):
     state.set_leader(gid, target_name)
 
     # Notify members
-    target_sess = find_online_session(GS.all_sessions, target_name)
+    target_sess = find_online_session(target_name)
     send_chat_status(session, f"You made {target_name} the party leader.")
     if target_sess:
         send_chat_status(target_sess, "You are now the party leader.")
 
     # Notify others
     gid, group = get_group_for_session(session)
-    members = online_group_members(group, GS.all_sessions)
+    members = online_group_members(group)
     for m, _ in members:
         if m not in (session, target_sess):
             send_chat_status(m, f"{target_name} is now the party leader.")
@@ -583,5 +559,5 @@ def handle_send_group_chat(session, data):
     print(f" [Group chat] {sender_name} Says : {message}")
 
     # Send to ALL ONLINE members including sender
-    for m, _ in online_group_members(group, GS.all_sessions):
+    for m, _ in online_group_members(group):
         m.conn.sendall(pkt)
\ No newline at end of file
@@ -0,0 +1,350 @@
+"""
+Storage backends for accounts and character saves (accounts.STORAGE_BACKEND).
+
+accounts.py keeps the public functions (find_user_id, get_or_create_user_id,
+load_characters, save_characters, ...) and the write-behind / journal layers,
+the backend only stores and fetches :
+
+  json   : Accounts.json + one save file per user (the original layout),
+           new accounts are appended to Accounts.log and folded into
+           Accounts.json on the next boot. save_format picks the save files :
+           "json" saves/{user_id}.json indented (original), "compact" the
+           same without indentation, "binary" saves/{user_id}.sav
+           (save_codec.py). Files of the other formats are still read.
+  sqlite : one SQLite database in WAL mode, accounts(email UNIQUE) and
+           saves(user_id), a save is written in a single row
+
+The first time the sqlite backend opens an empty database it imports the json
+layout (migrate_from), the json files are left untouched.
+
+A save is a dict {"user_id", "characters"[, "journal_seq"]} like the json files.
+"""
+
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+
+from threading import Lock, get_ident
+from save_codec import encode_save, decode_save
+
+ACCOUNTS_PATH = "Accounts.json"
+CHAR_SAVE_DIR = "saves"
+SQLITE_PATH = "saves/dungeonblitz.db"
+SQLITE_SYNCHRONOUS = "NORMAL"   # WAL + NORMAL : a commit survives a crash of the server, FULL for power loss too
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """
+    Crash safe write : write to a temp file next to the target, fsync it, then
+    rename it over the target. A crash leaves either the old or the new file,
+    never a truncated one.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _write_json(path: str, data, indent=2) -> None:
+    separators = None if indent is not None else (",", ":")
+    _write_atomic(path, json.dumps(data, ensure_ascii=False, indent=indent, separators=separators).encode("utf-8"))
+
+
+class Storage(ABC):
+    """What accounts.py needs from a backend."""
+
+    @abstractmethod
+    def load_accounts(self) -> dict[str, int]:
+        """email -> user_id of every account (read once at boot by accounts.AccountIndex)."""
+
+    @abstractmethod
+    def add_account(self, email: str, user_id: int) -> None:
+        """Persist one new account, durable when it returns."""
+
+    def compact_accounts(self, accounts: dict[str, int]) -> None:
+        pass
+
+    @abstractmethod
+    def load_save(self, user_id) -> dict | None:
+        pass
+
+    @abstractmethod
+    def write_save(self, user_id, char_list: list[dict], journal_seq=None) -> None:
+        pass
+
+    @abstractmethod
+    def iter_saves(self):
+        """Yield every save (boot scans)."""
+
+    def iter_character_names(self):
+        """Yield (name, user_id) for every stored character (builds name_index)."""
+        for data in self.iter_saves():
+            for char in data.get("characters", []):
+                if isinstance(char, dict):
+                    yield char.get("name", ""), data.get("user_id")
+
+    def close(self):
+        pass
+
+
+#### JSON files ####
+
+_SAVE_EXT = {"json": ".json", "compact": ".json", "binary": ".sav"}
+
+
+class JsonStorage(Storage):
+    def __init__(self, accounts_path=ACCOUNTS_PATH, save_dir=CHAR_SAVE_DIR, save_format="json"):
+        if save_format not in _SAVE_EXT:
+            raise ValueError(f"Unknown save format {save_format!r}")
+        self.accounts_path = accounts_path
+        self.accounts_log_path = os.path.splitext(accounts_path)[0] + ".log"
+        self.save_dir = save_dir
+        self.save_format = save_format
+        self._ext = _SAVE_EXT[save_format]
+        self._other_ext = ".sav" if self._ext == ".json" else ".json"
+        self._lock = Lock()
+        self._log = None
+
+    def _save_path(self, user_id, ext=None):
+        return os.path.join(self.save_dir, f"{user_id}{ext or self._ext}")
+
+    @staticmethod
+    def _read_save_file(path):
+        with open(path, "rb") as f:
+            raw = f.read()
+        if path.endswith(".sav"):
+            return decode_save(raw)
+        return json.loads(raw)
+
+    def load_accounts(self) -> dict[str, int]:
+        accounts = {}
+        if os.path.exists(self.accounts_path):
+            with open(self.accounts_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            accounts = {e["email"]: int(e["user_id"]) for e in entries}
+
+        if os.path.exists(self.accounts_log_path):
+            with open(self.accounts_log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        break   # torn last append
+                    accounts[e["email"]] = int(e["user_id"])
+        return accounts
+
+    def add_account(self, email: str, user_id: int) -> None:
+        line = json.dumps({"email": email, "user_id": user_id}, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._log is None:
+                self._log = open(self.accounts_log_path, "a", encoding="utf-8")
+            self._log.write(line)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+    def save_accounts_index(self, index: dict[str, int]) -> None:
+        entries = [
+            {"email": email, "user_id": uid}
+            for email, uid in index.items()
+        ]
+        _write_json(self.accounts_path, entries)
+
+    def compact_accounts(self, accounts: dict[str, int]) -> None:
+        """Fold Accounts.log into Accounts.json (boot), a crash in between only replays the log again."""
+        with self._lock:
+            if not os.path.exists(self.accounts_log_path) and os.path.exists(self.accounts_path):
+                return
+            self.save_accounts_index(accounts)
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if os.path.exists(self.accounts_log_path):
+                os.remove(self.accounts_log_path)
+
+    def load_save(self, user_id) -> dict | None:
+        for ext in (self._ext, self._other_ext):
+            path = self._save_path(user_id, ext)
+            if os.path.exists(path):
+                return self._read_save_file(path)
+        return None
+
+    def write_save(self, user_id, char_list: list[dict], journal_seq=None) -> None:
+        data = {
+            "user_id": user_id,
+            "characters": char_list
+        }
+        if journal_seq is not None:
+            data["journal_seq"] = journal_seq
+        if self.save_format == "binary":
+            _write_atomic(self._save_path(user_id), encode_save(data))
+        else:
+            _write_json(self._save_path(user_id), data, indent=2 if self.save_format == "json" else None)
+        # the file of the previous format is now stale
+        stale = self._save_path(user_id, self._other_ext)
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    def _save_files(self):
+        """Path of the file to read for every user (current format first, like load_save)."""
+        if not os.path.isdir(self.save_dir):
+            return {}
+        files = {}
+        for entry in os.scandir(self.save_dir):
+            stem, ext = os.path.splitext(entry.name)
+            if ext not in (".json", ".sav"):
+                continue
+            if ext == self._ext or stem not in files:
+                files[stem] = entry.path
+        return files
+
+    def iter_saves(self):
+        for path in self._save_files().values():
+            try:
+                yield self._read_save_file(path)
+            except (OSError, ValueError) as e:
+                print(f"[STORAGE] Skipping unreadable save {path}: {e}")
+
+    def saves_size(self) -> int:
+        return sum(os.path.getsize(path) for path in self._save_files().values())
+
+
+#### SQLite ####
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    user_id INTEGER PRIMARY KEY,
+    email   TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS saves (
+    user_id     INTEGER PRIMARY KEY,
+    characters  TEXT NOT NULL,
+    journal_seq INTEGER
+);
+"""
+_SCHEMA_VERSION = 1
+
+
+class SqliteStorage(Storage):
+    """
+    One connection shared by every thread behind a lock : statements are short
+    (single row by primary key / unique index) so there is little to gain from
+    a connection per client thread.
+    """
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        self._db.executescript(_SCHEMA)
+        self.fresh = self._db.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION
+
+    def _write_save_locked(self, user_id, characters_json, journal_seq):
+        self._db.execute(
+            "INSERT OR REPLACE INTO saves (user_id, characters, journal_seq) VALUES (?, ?, ?)",
+            (int(user_id), characters_json, journal_seq),
+        )
+
+    def migrate_from(self, source: Storage):
+        """One-shot import of another backend (the json files) into an empty database."""
+        accounts = source.load_accounts()
+        saves = 0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO accounts (user_id, email) VALUES (?, ?)",
+                    [(uid, email) for email, uid in accounts.items()],
+                )
+                for data in source.iter_saves():
+                    user_id = data.get("user_id")
+                    if user_id is None:
+                        continue
+                    self._write_save_locked(
+                        user_id,
+                        json.dumps(data.get("characters", []), ensure_ascii=False, separators=(",", ":")),
+                        data.get("journal_seq"),
+                    )
+                    saves += 1
+                self._db.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self.fresh = False
+        print(f"[STORAGE] Imported {len(accounts)} accounts and {saves} saves into {self.path}")
+
+    def mark_initialized(self):
+        with self._lock:
+            self._db.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+        self.fresh = False
+
+    def load_accounts(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT email, user_id FROM accounts"))
+
+    def add_account(self, email: str, user_id: int) -> None:
+        with self._lock:
+            self._db.execute("INSERT INTO accounts (user_id, email) VALUES (?, ?)", (user_id, email))
+
+    def load_save(self, user_id) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT characters, journal_seq FROM saves WHERE user_id = ?", (int(user_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        data = {"user_id": user_id, "characters": json.loads(row[0])}
+        if row[1] is not None:
+            data["journal_seq"] = row[1]
+        return data
+
+    def write_save(self, user_id, char_list: list[dict], journal_seq=None) -> None:
+        characters_json = json.dumps(char_list, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_save_locked(user_id, characters_json, journal_seq)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def iter_saves(self):
+        with self._lock:
+            rows = self._db.execute("SELECT user_id, characters, journal_seq FROM saves").fetchall()
+        for user_id, characters, journal_seq in rows:
+            data = {"user_id": user_id, "characters": json.loads(characters)}
+            if journal_seq is not None:
+                data["journal_seq"] = journal_seq
+            yield data
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_storage(backend="json", save_format="json") -> Storage:
+    if backend == "json":
+        return JsonStorage(save_format=save_format)
+    if backend == "sqlite":
+        db = SqliteStorage()
+        if db.fresh:
+            if os.path.exists(ACCOUNTS_PATH):
+                db.migrate_from(JsonStorage())
+            else:
+                db.mark_initialized()
+        return db
+    raise ValueError(f"Unknown storage backend {backend!r}")
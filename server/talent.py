@@ -6,7 +6,7 @@ from accounts import save_characters
 from bitreader import BitReader
 from constants import index_to_node_id, class_118, method_277, class_66, Game
 from globals import send_premium_purchase, send_talent_point_research_complete
-from scheduler import scheduler, schedule_Talent_point_research, _on_talent_done_for
+from scheduler import schedule_Talent_point_research, _on_talent_done_for, cancel_timer
 
 def handle_respec_talent_tree(session, data):
     char = next((c for c in session.char_list
@@ -37,7 +37,7 @@ def handle_respec_talent_tree(session, data):
 
 def handle_allocate_talent_tree_points(session, data):
     payload = data[4:]
-    br = BitReader(payload, debug=True)
+    br = BitReader(payload)
 
     char = next((c for c in session.char_list if c["name"] == session.current_character), None)
 
@@ -108,12 +108,7 @@ def handle_talent_claim(session, data):
     pts = char.setdefault("talentPoints", {})
     pts[str(class_idx)] = pts.get(str(class_idx), 0) + 1
 
-    sched_id = tr.pop("schedule_id", None)
-    if sched_id:
-        try:
-            scheduler.cancel(sched_id)
-        except:
-            pass
+    cancel_timer(session.user_id, session.current_character, "talent")
 
     char["talentResearch"] = {
         "classIndex": None,
@@ -154,12 +149,7 @@ def handle_talent_speedup(session, data):
         char["mammothIdols"] = current_idols - idol_cost
         send_premium_purchase(session, "TalentSpeedup", idol_cost)
 
-    sched_id = tr.pop("schedule_id", None)
-    if sched_id:
-        try:
-            scheduler.cancel(sched_id)
-        except:
-            pass
+    cancel_timer(session.user_id, session.current_character, "talent")
 
     tr["ReadyTime"] = 0
     char["talentResearch"] = tr
@@ -254,12 +244,7 @@ def handle_clear_talent_research(session, data):
         return
 
     tr = char.get("talentResearch", {})
-    sched_id = tr.pop("schedule_id", None)
-    if sched_id:
-        try:
-            scheduler.cancel(sched_id)
-        except:
-            pass
+    cancel_timer(session.user_id, session.current_character, "talent")
 
     char["talentResearch"] = {
         "classIndex": None,
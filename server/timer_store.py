@@ -0,0 +1,110 @@
+"""
+On-disk index of the pending TaskScheduler timers (scheduler.py).
+
+Without it the only way to know which research / building / forge / talent /
+pet training / egg hatch timers are pending after a restart is to parse every
+save (boot_scan_all_saves). With it every timer is appended here
+when it is scheduled and removed when it fires, so boot only reads the pending
+ones.
+
+The file is a log of JSON lines :
+    {"id": 12, "run_at": 1765074372, "kind": "forge", "user_id": 3, "char": "Name", "args": [1, 0]}
+    {"del": 12}
+On load it is replayed and rewritten sorted by run_at (the next timers to fire
+first), and again when removed timers make up most of it. Appends are flushed
+to the OS but not fsynced : a server crash loses nothing, a power loss can
+lose the last timers, which the full scan (scheduler.TIMER_BOOT_SCAN) repairs.
+"""
+
+import json
+import os
+import threading
+
+TIMER_STORE_PATH = "saves/timers.log"
+TIMER_COMPACT_MIN = 4096   # appended lines before the log may be compacted
+
+
+class TimerStore:
+    def __init__(self, path=TIMER_STORE_PATH):
+        self.path = path
+        self._timers = {}       # id -> record
+        self._next_id = 1
+        self._appended = 0      # lines in the file
+        self._lock = threading.Lock()
+        self._file = None           # open for appends once the store was loaded
+
+    def load(self):
+        """Pending timers sorted by run_at, None when there is no store yet (first boot)."""
+        with self._lock:
+            if not os.path.exists(self.path):
+                return None
+            self._load()
+            return sorted(self._timers.values(), key=lambda r: r["run_at"])
+
+    def _load(self):
+        timers = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break   # torn last append
+                    if "del" in record:
+                        timers.pop(record["del"], None)
+                    else:
+                        timers[record["id"]] = record
+        self._timers = timers
+        self._next_id = max(timers, default=0) + 1
+        self._rewrite()
+
+    def reset(self):
+        """Start an empty store (before a full scan re-adds every timer)."""
+        with self._lock:
+            self._timers = {}
+            self._rewrite()
+
+    def _rewrite(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in sorted(self._timers.values(), key=lambda r: r["run_at"]):
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._appended = len(self._timers)
+
+    def _append(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._appended += 1
+
+    def add(self, kind, user_id, char_name, run_at, args=()):
+        with self._lock:
+            if self._file is None:
+                self._load()
+            timer_id = self._next_id
+            self._next_id += 1
+            record = {"id": timer_id, "run_at": run_at, "kind": kind,
+                      "user_id": user_id, "char": char_name, "args": list(args)}
+            self._timers[timer_id] = record
+            self._append(record)
+            return timer_id
+
+    def remove(self, timer_id):
+        with self._lock:
+            if self._file is None:
+                self._load()
+            if self._timers.pop(timer_id, None) is None:
+                return
+            if self._appended >= TIMER_COMPACT_MIN and self._appended > 4 * len(self._timers):
+                self._rewrite()
+            else:
+                self._append({"del": timer_id})
+
+    def __len__(self):
+        return len(self._timers)
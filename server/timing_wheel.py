@@ -0,0 +1,196 @@
+"""
+Timer queues for scheduler.TaskScheduler, times are whole seconds (time.time()).
+
+TimingWheel : hierarchical timing wheel, O(1) add and cancel.
+
+    level 0 : 256 slots of 1 s          (timers due within 256 s)
+    level 1 :  64 slots of 256 s        (~4.5 h)
+    level 2 :  64 slots of 16384 s      (~12 days)
+    level 3 :  64 slots of 1048576 s    (~2 years)
+    level 4 :  64 slots of 67108864 s   (~136 years, enough for a ReadyTime)
+
+A timer is put in the lowest level whose range covers its delay, in the slot
+of its due time. Every 256 s the next level 1 slot is emptied into level 0
+(and so on up the levels), so a timer moves down at most 4 times. Each slot
+is a set, a handle knows its slot, cancelling removes it from there.
+
+TimerHeap : the previous single heap (O(log n) add, cancelled handles stay in
+the heap until they come due). Kept for comparison (benchmarks/bench_scheduler).
+
+Both take TimerHandles and give back the due ones from expire(now).
+"""
+
+import heapq
+
+_LEVEL_BITS = (8, 6, 6, 6, 6)
+
+
+class TimerHandle:
+    """Returned by TaskScheduler.schedule, pass it to cancel / reschedule."""
+    __slots__ = ("run_at", "callback", "owner", "slot", "cancelled")
+
+    def __init__(self, run_at, callback, owner=None):
+        self.run_at = int(run_at)
+        self.callback = callback
+        self.owner = owner
+        self.slot = None          # the wheel slot (set) holding it, None once expired / cancelled
+        self.cancelled = False
+
+    @property
+    def pending(self):
+        return self.slot is not None and not self.cancelled
+
+
+class TimingWheel:
+    def __init__(self, now):
+        self.now = int(now)       # every timer due before `now` has been expired
+        self.levels = [[set() for _ in range(1 << bits)] for bits in _LEVEL_BITS]
+        self.shifts = []
+        shift = 0
+        for bits in _LEVEL_BITS:
+            self.shifts.append(shift)
+            shift += bits
+        self.overflow = set()     # beyond the last level
+        self.count = 0
+        # (delay limit, shift, mask, slots) per level above 0
+        self._upper = [(1 << (self.shifts[lvl] + bits), self.shifts[lvl], (1 << bits) - 1, self.levels[lvl])
+                       for lvl, bits in enumerate(_LEVEL_BITS) if lvl]
+
+    def _place(self, handle):
+        run_at = handle.run_at
+        now = self.now
+        if run_at < now:
+            run_at = now
+        delta = run_at - now
+        if delta < 256:
+            slot = self.levels[0][run_at & 255]
+        else:
+            for limit, shift, mask, slots in self._upper:
+                if delta < limit:
+                    slot = slots[(run_at >> shift) & mask]
+                    break
+            else:
+                slot = self.overflow
+        slot.add(handle)
+        handle.slot = slot
+
+    def add(self, handle):
+        handle.cancelled = False
+        self._place(handle)
+        self.count += 1
+
+    def cancel(self, handle):
+        slot = handle.slot
+        if slot is None:
+            return False
+        slot.discard(handle)
+        handle.slot = None
+        handle.cancelled = True
+        self.count -= 1
+        return True
+
+    def _cascade(self, t):
+        """t is a multiple of 256 : move the timers of the slots starting at t one level down."""
+        level = 1
+        while level < len(_LEVEL_BITS) and t & ((1 << self.shifts[level]) - 1) == 0:
+            level += 1
+        # highest level first, its timers may land in a lower slot cascaded right after
+        if level == len(_LEVEL_BITS) and self.overflow:
+            moved, self.overflow = self.overflow, set()
+            for handle in moved:
+                self._place(handle)
+        for lvl in range(level - 1, 0, -1):
+            bits = _LEVEL_BITS[lvl]
+            index = (t >> self.shifts[lvl]) & ((1 << bits) - 1)
+            slot = self.levels[lvl][index]
+            if slot:
+                self.levels[lvl][index] = set()
+                for handle in slot:
+                    self._place(handle)
+
+    def expire(self, now):
+        """Remove and return the handles due at or before `now`."""
+        now = int(now)
+        due = []
+        level0 = self.levels[0]
+        mask = (1 << _LEVEL_BITS[0]) - 1
+        while self.now <= now:
+            t = self.now
+            if t & mask == 0:
+                self._cascade(t)
+            slot = level0[t & mask]
+            if slot:
+                level0[t & mask] = set()
+                for handle in slot:
+                    handle.slot = None
+                due.extend(slot)
+            self.now = t + 1
+            if not self.count - len(due):
+                # nothing else pending, jump straight to `now`
+                self.now = now + 1
+                break
+        self.count -= len(due)
+        due.sort(key=lambda h: h.run_at)
+        return due
+
+    def next_due(self):
+        """
+        Earliest time something may be due (a level 0 timer, or the next
+        cascade), None when empty. Never later than the real next timer.
+        """
+        if not self.count:
+            return None
+        level0 = self.levels[0]
+        size = 1 << _LEVEL_BITS[0]
+        if not self.now & (size - 1):
+            return self.now     # a cascade is due now
+        for t in range(self.now, (self.now | (size - 1)) + 1):
+            if level0[t & (size - 1)]:
+                return t
+        return (self.now | (size - 1)) + 1
+
+    def __len__(self):
+        return self.count
+
+
+class TimerHeap:
+    def __init__(self, now=None):
+        self._heap = []
+        self._seq = 0
+        self.count = 0
+
+    def add(self, handle):
+        handle.cancelled = False
+        handle.slot = self._seq    # its live heap entry, older entries (rescheduled) are skipped
+        heapq.heappush(self._heap, (handle.run_at, self._seq, handle))
+        self._seq += 1
+        self.count += 1
+
+    def cancel(self, handle):
+        if handle.slot is None:
+            return False
+        handle.slot = None
+        handle.cancelled = True
+        self.count -= 1
+        return True
+
+    def expire(self, now):
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, seq, handle = heapq.heappop(heap)
+            if handle.slot != seq:
+                continue
+            handle.slot = None
+            due.append(handle)
+        self.count -= len(due)
+        return due
+
+    def next_due(self):
+        heap = self._heap
+        while heap and heap[0][2].slot != heap[0][1]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def __len__(self):
+        return self.count